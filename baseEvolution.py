@@ -1,9 +1,18 @@
+import functools
+import multiprocessing
+import queue
+import random
+
+import fitness
+import selection
+from populationMatrix import matrixIndividual
+
 class baseEvolutionPopulation():
 	def __init__(self, individual_class, mu, num_children, mutation_rate,
 				 parent_selection, survival_selection,
 				 initialization_kwargs=dict(), parent_selection_kwargs=dict(),
 				 recombination_kwargs = dict(), mutation_kwargs = dict(),
-				 survival_selection_kwargs=dict(), **kwargs):
+				 survival_selection_kwargs=dict(), incremental_repair=False, **kwargs):
 		self.mu = mu
 		self.num_children = num_children
 		self.mutation_rate = mutation_rate
@@ -13,6 +22,8 @@ class baseEvolutionPopulation():
 		self.recombination_kwargs = recombination_kwargs
 		self.mutation_kwargs = mutation_kwargs
 		self.survival_selection_kwargs = survival_selection_kwargs
+		# label each child's map from its parent's when evaluating (see fitness.evaluate_population)
+		self.incremental_repair = incremental_repair
 
 		self.population = individual_class.initialization(self.mu, **initialization_kwargs)
 
@@ -35,3 +46,107 @@ class baseEvolutionPopulation():
 
 	def survival(self):
 		self.population = self.survival_selection(self.population, self.mu, **self.survival_selection_kwargs)
+
+
+class matrixEvolutionPopulation(baseEvolutionPopulation):
+	'''Generational EA whose population is a populationMatrix. Children of all selected parent pairs are recombined
+	   and mutated as whole-matrix operations and survival keeps the selected rows. The individual_class argument
+	   is ignored; genes of length initialization_kwargs['length'] are initialized at random.'''
+	def __init__(self, individual_class=matrixIndividual, *args, **kwargs):
+		super().__init__(matrixIndividual, *args, **kwargs)
+
+	def generate_children(self):
+		parents = self.select(self.parent_selection, 2*self.num_children, self.parent_selection_kwargs)
+		children = self.population.recombine(parents[0::2], parents[1::2], **self.recombination_kwargs)
+		children.mutate(self.mutation_rate, **self.mutation_kwargs)
+		return children
+
+	def select(self, method, n, kwargs):
+		'''Returns the row indices chosen by a selection function, through its index counterpart when it has one.'''
+		if method in selection.index_selections:
+			return selection.index_selections[method](self.population.fitnesses, n, **kwargs)
+		return self.population.indices(method(self.population, n, **kwargs))
+
+	def survival(self):
+		self.population = self.population.take(self.select(self.survival_selection, self.mu, self.survival_selection_kwargs))
+
+
+def evolve_generation(ea, fitness_kwargs):
+	'''Runs one generation of a generational EA the way the notebook does: breeds and evaluates children, adds
+	   them to the population and applies survival selection. Counts the evaluations in ea.evaluations.'''
+	children = ea.generate_children()
+	assert len(children) > 0, 'ERROR: generate_children RETURNED NO CHILDREN'
+	fitness.evaluate_population(children, fitness_kwargs, incremental=getattr(ea, 'incremental_repair', False))
+	ea.evaluations += len(children)
+	ea.population += children
+	ea.survival()
+
+
+class asyncSteadyStateEvolution(baseEvolutionPopulation):
+	'''Steady-state EA that overlaps evaluation with breeding. A fixed number of children are under evaluation at
+	   all times and, as soon as any of them returns a fitness, it is inserted into the population by survival
+	   selection and a new child is bred and submitted, so no worker waits on the slowest game of a batch.'''
+	def __init__(self, *args, fitness_kwargs=dict(), workers=1, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.fitness_kwargs = fitness_kwargs
+		# None uses one worker per core, as evaluate_population does
+		self.workers = workers or multiprocessing.cpu_count()
+		self.evaluations = 0
+
+	def breed_child(self):
+		'''Breeds one child from two parents picked by parent selection and mutates it with probability
+		   mutation_rate.'''
+		mother, father = self.parent_selection(self.population, 2, **self.parent_selection_kwargs)
+		child = mother.recombine(father, **self.recombination_kwargs)
+		if random.random() < self.mutation_rate:
+			child = child.mutate(**self.mutation_kwargs)
+		return child
+
+	def insert(self, child):
+		self.population.append(child)
+		self.population = self.survival_selection(self.population, self.mu, **self.survival_selection_kwargs)
+
+	def run(self, number_evaluations, in_flight=None):
+		'''Evaluates any unevaluated members of the population and then breeds, evaluates and inserts children
+		   until number_evaluations fitness evaluations (counting the initial population) have been spent. With
+		   more than one worker, in_flight children (two per worker by default) are evaluated concurrently in the
+		   warm process pool of fitness.evaluate_population.
+
+		   Returns the final population.'''
+		unevaluated = [individual for individual in self.population if individual.fitness is None]
+		fitness.evaluate_population(unevaluated, self.fitness_kwargs, workers=self.workers, incremental=self.incremental_repair)
+		self.evaluations += len(unevaluated)
+		if self.workers == 1:
+			while self.evaluations < number_evaluations:
+				child = self.breed_child()
+				fitness.evaluate_population([child], self.fitness_kwargs, incremental=self.incremental_repair)
+				self.evaluations += 1
+				self.insert(child)
+			return self.population
+
+		pool = fitness.get_pool(self.workers)
+		evaluate = functools.partial(fitness.evaluate_gene, self.fitness_kwargs)
+		completed = queue.Queue()
+		def submit(child):
+			genotype = child.gene
+			if self.incremental_repair:
+				genotype, = fitness.map_connectivities([child], self.fitness_kwargs['height'], self.fitness_kwargs['width'])
+			pool.apply_async(evaluate, (genotype,), callback=lambda result: completed.put((child, result)), error_callback=lambda error: completed.put((None, error)))
+		in_flight = 2*self.workers if in_flight is None else in_flight
+		submitted = pending = 0
+		while pending < in_flight and self.evaluations+submitted < number_evaluations:
+			submit(self.breed_child())
+			submitted += 1
+			pending += 1
+		while pending > 0:
+			child, result = completed.get()
+			pending -= 1
+			if child is None:
+				raise result
+			child.fitness, child.log, child.games = result
+			self.evaluations += 1
+			self.insert(child)
+			if self.evaluations+pending < number_evaluations:
+				submit(self.breed_child())
+				pending += 1
+		return self.population
@@ -0,0 +1,247 @@
+import numpy as np
+
+import gpac
+
+# actions are encoded as indices into this list in every action array
+ACTIONS = list(gpac.PAC_ACTIONS)
+HOLD = ACTIONS.index('hold')
+UNREACHABLE = np.iinfo(np.int32).max // 2
+
+class BatchedGPacGame():
+	'''Lockstep simulator of many GPac games held in NumPy arrays. Every game shares the same dimensions but may
+	   use its own map. Cells are indexed by x*height+y and players by column: pacs first, then ghosts, in the
+	   same order as the players of gpac.GPacGame. Actions are integer indices into ACTIONS.
+
+	   Scores follow the rules of gpac.GPacGame. Games are not logged.'''
+	def __init__(self, game_maps, num_games=None, pill_density=0.1, fruit_prob=0.2, fruit_score=10, time_multiplier=2, num_ghosts=3, num_pacs=1, pill_spawn='stochastic', seed=None, **kwargs):
+		maps = np.asarray(game_maps, dtype=np.uint8)
+		assert maps.ndim in {2, 3} and maps.shape[-1] > 0 and maps.shape[-2] > 0, "ERROR: MAP MUST BE 2 DIMENSIONAL"
+		if maps.ndim == 2:
+			# one map shared by every game
+			maps = np.broadcast_to(maps, (1 if num_games is None else num_games,)+maps.shape)
+		assert num_games is None or num_games == len(maps), f"ERROR: EXPECTED {num_games} MAPS BUT GOT {len(maps)}"
+		self.num_games, self.width, self.height = maps.shape
+		self.num_cells = self.width*self.height
+		self.walls = maps.reshape(self.num_games, self.num_cells).astype(bool)
+		self.num_pacs = num_pacs
+		self.num_ghosts = num_ghosts
+		self.player_names = ['m']+[f'm{pac}' for pac in range(num_pacs-1)]+[f'{ghost}' for ghost in range(num_ghosts)]
+		self.pill_density = pill_density
+		self.fruit_prob = fruit_prob
+		self.fruit_score = fruit_score
+		self.time_multiplier = time_multiplier
+		self.pill_spawn = pill_spawn
+		self.rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+		# static tables: cell coordinates, action shifts and the legal actions from every cell of every map
+		self.cell_x, self.cell_y = np.divmod(np.arange(self.num_cells), self.height)
+		self.shifts = np.array([x_shift*self.height+y_shift for x_shift, y_shift in gpac.PAC_ACTIONS.values()])
+		self.pac_legal = np.zeros((self.num_games, self.num_cells, len(ACTIONS)), dtype=bool)
+		for action, (x_shift, y_shift) in enumerate(gpac.PAC_ACTIONS.values()):
+			x, y = self.cell_x+x_shift, self.cell_y+y_shift
+			inside = (0 <= x) & (x < self.width) & (0 <= y) & (y < self.height)
+			target = np.where(inside, x*self.height+y, 0)
+			self.pac_legal[:, :, action] = inside & ~self.walls[:, target]
+		self.ghost_legal = self.pac_legal.copy()
+		self.ghost_legal[:, :, HOLD] = False
+		self.pac_spawn = maps.shape[2]-1
+		self.ghost_spawn = (self.width-1)*self.height
+		self.total_time = int(self.width*self.height*self.time_multiplier)
+		self.games = np.arange(self.num_games)
+		self.reset()
+
+	def reset(self):
+		placement_strategies = {'stochastic', 'linear', 'manhattan'}
+		assert self.pill_spawn in placement_strategies, f"ERROR: UNRECOGNIZED PILL SPAWN STRATEGY {self.pill_spawn} BUT EXPECTED {placement_strategies}"
+		# spawn players
+		self.positions = np.empty((self.num_games, self.num_pacs+self.num_ghosts), dtype=np.int64)
+		self.positions[:, :self.num_pacs] = self.pac_spawn
+		self.positions[:, self.num_pacs:] = self.ghost_spawn
+		self.alive = np.ones((self.num_games, self.num_pacs), dtype=bool)
+
+		# generate pill placement on open cells other than spawn locations
+		available = ~self.walls
+		available[:, [self.pac_spawn, self.ghost_spawn]] = False
+		if self.pill_spawn.casefold() == 'stochastic':
+			self.pills = available & (self.rng.random(available.shape) <= self.pill_density)
+			empty = ~self.pills.any(axis=1)
+			if empty.any(): # failsafe logic to guarantee pill placement
+				assert available[empty].any(axis=1).all(), "ERROR: NO VALID PILL LOCATIONS"
+				self.pills[self.games[empty], random_cells(available[empty], self.rng)] = True
+		else:
+			assert available.any(axis=1).all(), "ERROR: NO VALID PILL LOCATIONS"
+			pill_freq = max(1,int(round(1/self.pill_density)))
+			if self.pill_spawn.casefold() == 'manhattan':
+				# stable sort of available cells by x+y, unavailable cells last
+				key = np.where(available, (self.cell_x+self.cell_y)*self.num_cells+np.arange(self.num_cells), UNREACHABLE)
+				order = np.argsort(key, axis=1)
+			else:
+				order = np.broadcast_to(np.arange(self.num_cells), available.shape)
+			ordered = np.take_along_axis(available, order, axis=1)
+			rank = np.cumsum(ordered, axis=1)-1
+			self.pills = np.zeros_like(available)
+			np.put_along_axis(self.pills, order, ordered & (rank % pill_freq == 0), axis=1)
+		self.num_pills = self.pills.sum(axis=1)
+
+		self.pills_consumed = np.zeros(self.num_games, dtype=np.int64)
+		self.fruit = np.full(self.num_games, -1, dtype=np.int64)
+		self.fruit_consumed = np.zeros(self.num_games, dtype=np.int64)
+		self.time = np.full(self.num_games, self.total_time, dtype=np.int64)
+		self.score = np.zeros(self.num_games, dtype=np.int64)
+		self.bonus = np.zeros(self.num_games, dtype=np.int64)
+		self.gameover = np.zeros(self.num_games, dtype=bool)
+		self.pill_distance = None
+
+	def legal_actions(self):
+		'''Returns a boolean array of shape (num_games, num_players, len(ACTIONS)) marking legal actions.'''
+		games = self.games[:, None]
+		return np.concatenate((self.pac_legal[games, self.positions[:, :self.num_pacs]],
+							   self.ghost_legal[games, self.positions[:, self.num_pacs:]]), axis=1)
+
+	def distance_to_pills(self):
+		'''Maze distance from every cell to the nearest pill of each game, recomputed only for games whose pills
+		   changed since the last call.'''
+		if self.pill_distance is None:
+			self.pill_distance = np.empty((self.num_games, self.num_cells), dtype=np.int32)
+			self.pill_distance_stale = np.ones(self.num_games, dtype=bool)
+		stale = self.games[self.pill_distance_stale]
+		if len(stale) > 0:
+			self.pill_distance[stale] = flood_distances(self.pills[stale], self.walls[stale], self.width, self.height)
+			self.pill_distance_stale[stale] = False
+		return self.pill_distance
+
+	def step(self, actions, validate=True):
+		'''Advances every unfinished game by one turn using an integer action array of shape
+		   (num_games, num_players).'''
+		actions = np.asarray(actions)
+		active = ~self.gameover
+		self.time[active] -= 1
+		moving = np.concatenate((self.alive, np.ones((self.num_games, self.num_ghosts), dtype=bool)), axis=1) & active[:, None]
+		if validate:
+			legal = np.take_along_axis(self.legal_actions(), actions[:, :, None], axis=2)[:, :, 0]
+			assert (legal | ~moving).all(), 'ERROR: INVALID ACTION IN BATCH'
+		old_positions = self.positions
+		self.positions = np.where(moving, old_positions+self.shifts[actions], old_positions)
+
+		# detect collsions between pacs and ghosts, directly or via trading locations
+		pacs, ghosts = self.positions[:, :self.num_pacs, None], self.positions[:, None, self.num_pacs:]
+		old_pacs, old_ghosts = old_positions[:, :self.num_pacs, None], old_positions[:, None, self.num_pacs:]
+		collided = ((pacs == ghosts) | ((pacs == old_ghosts) & (old_pacs == ghosts))).any(axis=2)
+		self.alive &= ~(collided & moving[:, :self.num_pacs])
+		self.gameover |= active & ~self.alive.any(axis=1)
+		playing = active & ~self.gameover
+
+		# consume pills and fruit touched by pacs that moved this turn
+		pac_moved = moving[:, :self.num_pacs] & playing[:, None]
+		eaters = np.nonzero(pac_moved)
+		eaten = self.positions[:, :self.num_pacs][eaters]
+		if len(eaten) > 0:
+			self.pills[eaters[0], eaten] = False
+			num_pills = self.pills.sum(axis=1)
+			self.pills_consumed += self.num_pills-num_pills
+			if self.pill_distance is not None:
+				self.pill_distance_stale |= num_pills != self.num_pills
+			self.num_pills = num_pills
+		touched_fruit = ((self.positions[:, :self.num_pacs] == self.fruit[:, None]) & pac_moved).any(axis=1)
+		self.fruit[touched_fruit] = -1
+		self.fruit_consumed += touched_fruit
+		self.bonus += self.fruit_score*touched_fruit
+		cleared = playing & (self.num_pills == 0)
+		self.bonus[cleared] += 100*self.time[cleared]//self.total_time
+		self.gameover |= cleared | (playing & (self.time <= 0))
+		self.score = 100*self.pills_consumed//(self.pills_consumed+self.num_pills)+self.bonus
+
+		self.manage_fruit(active)
+
+	def manage_fruit(self, active):
+		# spawn fruit in games without one on open cells free of pills and pacs
+		spawning = active & (self.fruit == -1) & (self.rng.random(self.num_games) <= self.fruit_prob)
+		if spawning.any():
+			spawning = self.games[spawning]
+			available = ~(self.walls[spawning] | self.pills[spawning])
+			rows = np.arange(len(spawning))[:, None]
+			available[rows, self.positions[spawning, :self.num_pacs]] = False
+			has_cell = available.any(axis=1)
+			self.fruit[spawning[has_cell]] = random_cells(available[has_cell], self.rng)
+
+def random_cells(mask, rng):
+	'''Uniform random choice of one True column from each row of a boolean array.'''
+	keys = rng.random(mask.shape)
+	keys[~mask] = -1
+	return keys.argmax(axis=1)
+
+def random_choice(legal, rng):
+	'''Uniform random choice among legal actions for every (game, player) row of a legal action array.'''
+	keys = rng.random(legal.shape)
+	keys[~legal] = -1
+	return keys.argmax(axis=-1)
+
+def flood_distances(sources, walls, width, height):
+	'''Multi-source breadth-first distances over open cells for a batch of flat maps, computed by repeatedly
+	   relaxing the four neighbors of every cell. Unreachable cells are set to UNREACHABLE.'''
+	count = len(sources)
+	padded = np.full((count, width+2, height+2), UNREACHABLE, dtype=np.int32)
+	distance = padded[:, 1:-1, 1:-1]
+	distance[sources.reshape(count, width, height)] = 0
+	wall_penalty = np.where(walls.reshape(count, width, height), UNREACHABLE, 0).astype(np.int32)
+	nearest = np.empty_like(distance)
+	while True:
+		np.minimum(padded[:, :-2, 1:-1], padded[:, 2:, 1:-1], out=nearest)
+		np.minimum(nearest, padded[:, 1:-1, :-2], out=nearest)
+		np.minimum(nearest, padded[:, 1:-1, 2:], out=nearest)
+		nearest += 1
+		np.maximum(nearest, wall_penalty, out=nearest)
+		if not (nearest < distance).any():
+			return distance.reshape(count, width*height)
+		np.minimum(distance, nearest, out=distance)
+
+def greedy_pill_actions(game, rng):
+	'''Pac policy that steps towards the nearest pill by maze distance every turn, breaking ties at random. Unlike
+	   staticAgents.shortestPathPillAgent it never commits to a planned path, so the two play different games.'''
+	legal = game.legal_actions()[:, :game.num_pacs]
+	targets = game.positions[:, :game.num_pacs, None]+game.shifts
+	distance = np.take_along_axis(game.distance_to_pills(), targets.reshape(game.num_games, -1) % game.num_cells, axis=1).reshape(legal.shape)
+	distance = np.where(legal, distance, UNREACHABLE+1)
+	return random_choice(distance == distance.min(axis=2, keepdims=True), rng)
+
+def random_pac_actions(game, rng):
+	'''Pac policy that picks a legal action uniformly at random.'''
+	return random_choice(game.legal_actions()[:, :game.num_pacs], rng)
+
+def random_ghost_actions(game, rng):
+	'''Ghost policy that picks a legal action uniformly at random.'''
+	return random_choice(game.legal_actions()[:, game.num_pacs:], rng)
+
+def distance_to_pac(game):
+	'''Maze distance from every cell to pac-man 'm' in each unfinished game, UNREACHABLE in finished games.'''
+	distance = np.full((game.num_games, game.num_cells), UNREACHABLE, dtype=np.int32)
+	playing = game.games[~game.gameover]
+	if len(playing) > 0:
+		sources = np.zeros((len(playing), game.num_cells), dtype=bool)
+		sources[np.arange(len(playing)), game.positions[playing, 0]] = True
+		distance[playing] = flood_distances(sources, game.walls[playing], game.width, game.height)
+	return distance
+
+def chasing_ghost_actions(game, rng, random_wander_chance=0.25):
+	'''Ghost policy that steps along a shortest maze path to pac-man, as staticAgents.ChasingGhostAgent does,
+	   breaking ties at random and wandering at random some of the time.'''
+	legal = game.legal_actions()[:, game.num_pacs:]
+	targets = game.positions[:, game.num_pacs:, None]+game.shifts
+	distance = np.take_along_axis(distance_to_pac(game), targets.reshape(game.num_games, -1) % game.num_cells, axis=1).reshape(legal.shape)
+	distance = np.where(legal, distance, UNREACHABLE+1)
+	chase = random_choice(distance == distance.min(axis=2, keepdims=True), rng)
+	wander = rng.random(chase.shape) < random_wander_chance
+	return np.where(wander, random_choice(legal, rng), chase)
+
+# named after their own strategies rather than the staticAgents agents, which they do not reproduce
+PAC_POLICIES = {'greedy_pill': greedy_pill_actions, 'random': random_pac_actions}
+GHOST_POLICIES = {'wander': random_ghost_actions, 'chase': chasing_ghost_actions}
+
+def play(game, pac_policy, ghost_policy, validate=False):
+	'''Plays every game of a batch to completion with vectorized policies and returns the final scores.'''
+	actions = np.empty((game.num_games, game.num_pacs+game.num_ghosts), dtype=np.int64)
+	while not game.gameover.all():
+		actions[:, :game.num_pacs] = pac_policy(game, game.rng)
+		actions[:, game.num_pacs:] = ghost_policy(game, game.rng)
+		game.step(actions, validate=validate)
+	return game.score
@@ -0,0 +1,73 @@
+'''Measures simulation throughput of the GPac engines in turns per second, and the cost of forking and
+   snapshotting a game for lookahead.
+
+   Players follow a cheap deterministic policy so the measurement is dominated by the game itself rather than
+   by agents. Run from the repository root with `python benchmarks/bench_gpac.py`.'''
+import argparse, os, sys, inspect, random, time
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+import gpac
+from fitness import translate_gene, repair_map
+
+def random_maps(count, height, width, density=0.3, seed=0):
+	rng = random.Random(seed)
+	return [repair_map(translate_gene([1 if rng.random() < density else 0 for _ in range(height*width)], height, width))[0] for _ in range(count)]
+
+def turns_per_second(game_class, maps, samples, **kwargs):
+	turns = 0
+	start = time.process_time()
+	for game_map in maps:
+		game = game_class(game_map, **kwargs)
+		for sample in range(samples):
+			if sample > 0:
+				game.reset()
+			while not game.gameover:
+				for player in game.players:
+					actions = game.get_actions(player)
+					game.register_action(actions[turns % len(actions)], player)
+				game.step()
+				turns += 1
+	return turns/(time.process_time()-start)
+
+def microseconds_per_branch(game_class, maps, method, branches=1000, **kwargs):
+	'''Times method ('fork' or 'snapshot') on a game of every map, a few turns in.'''
+	seconds = 0
+	for game_map in maps:
+		game = game_class(game_map, **kwargs)
+		for turn in range(5):
+			for player in game.players:
+				actions = game.get_actions(player)
+				game.register_action(actions[turn % len(actions)], player)
+			game.step()
+		branch = getattr(game, method)
+		start = time.process_time()
+		for _ in range(branches):
+			branch()
+		seconds += time.process_time()-start
+	return 1e6*seconds/(branches*len(maps))
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--maps', type=int, default=20)
+	parser.add_argument('--samples', type=int, default=5)
+	parser.add_argument('--height', type=int, default=20)
+	parser.add_argument('--width', type=int, default=35)
+	parser.add_argument('--repeat', type=int, default=3, help='report the best of this many measurements')
+	args = parser.parse_args()
+
+	maps = random_maps(args.maps, args.height, args.width)
+	settings = {'pill_spawn': 'linear', 'pill_density': 0.05, 'fruit_prob': 0.1}
+	for game_class in (gpac.GPacGame, gpac.ArrayGPacGame):
+		for log_level in ('memory', 'off'):
+			for validate in (True, False):
+				rates = list()
+				for _ in range(args.repeat):
+					random.seed(0)
+					rates.append(turns_per_second(game_class, maps, args.samples, log_level=log_level, validate=validate, **settings))
+				rate = max(rates)
+				print(f'{game_class.__name__:14} log_level={log_level:6} validate={str(validate):5} {rate:10.0f} turns/s')
+	for game_class in (gpac.GPacGame, gpac.ArrayGPacGame):
+		for method in ('fork', 'snapshot'):
+			cost = min(microseconds_per_branch(game_class, maps, method, **settings) for _ in range(args.repeat))
+			print(f'{game_class.__name__:14} {method:8} {cost:10.1f} us')
@@ -0,0 +1,65 @@
+'''Measures how map repair scales with map size.
+
+   Every map is random noise split into two halves by a band of walls, so each repair has to find the nearest
+   pair of points between the pac-man and ghost regions and dig a tunnel. Repairing and labeling single-locus
+   mutants of each map from its MapConnectivity is timed next to doing so from scratch. Run from the repository root with
+   `python benchmarks/bench_repair.py`.'''
+import argparse, os, sys, inspect, time
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+import numpy as np
+from fitness import MapConnectivity, repair_map_array
+
+def split_maps(count, height, width, density=0.3, seed=0):
+	rng = np.random.default_rng(seed)
+	maps = (rng.random((count, width, height)) < density).astype(np.uint8)
+	band = max(1, width//10)
+	maps[:, (width-band)//2:(width+band)//2, :] = 1
+	return maps
+
+def seconds_per_repair(maps):
+	start = time.perf_counter()
+	for game_map in maps:
+		repair_map_array(game_map.copy())
+	return (time.perf_counter()-start)/len(maps)
+
+def mutants(maps, seed=1):
+	'''returns a copy of every map with one random cell flipped'''
+	rng = np.random.default_rng(seed)
+	mutated = maps.copy()
+	for game_map in mutated:
+		game_map[rng.integers(game_map.shape[0]), rng.integers(game_map.shape[1])] ^= 1
+	return mutated
+
+def seconds_per_labeling(maps, mutated):
+	'''returns the seconds per map spent labeling mutants from scratch and from the parent's MapConnectivity'''
+	parents = [MapConnectivity.from_grid(game_map) for game_map in maps]
+	parents[0].update(mutated[0]) # the first split check in a process pays a one-off setup cost
+	start = time.perf_counter()
+	for game_map in mutated:
+		MapConnectivity.from_grid(game_map)
+	middle = time.perf_counter()
+	for parent, game_map in zip(parents, mutated):
+		parent.update(game_map)
+	return (middle-start)/len(maps), (time.perf_counter()-middle)/len(maps)
+
+def seconds_per_incremental_repair(maps, mutated):
+	parents = [MapConnectivity.from_grid(game_map) for game_map in maps]
+	start = time.perf_counter()
+	for parent, game_map in zip(parents, mutated):
+		parent.update(game_map).repair()
+	return (time.perf_counter()-start)/len(maps)
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--maps', type=int, default=20)
+	parser.add_argument('--sizes', type=int, nargs='+', default=[20, 40, 80, 160, 320, 640], help='map heights; widths are 7/4 of each height')
+	args = parser.parse_args()
+
+	for height in args.sizes:
+		width = height*7//4
+		maps = split_maps(args.maps, height, width)
+		mutated = mutants(maps)
+		labeling, incremental_labeling = seconds_per_labeling(maps, mutated)
+		print(f'{width:5}x{height:<5} {seconds_per_repair(maps)*1e3:10.3f} ms/repair {seconds_per_repair(mutated)*1e3:10.3f} ms/mutant repair {seconds_per_incremental_repair(maps, mutated)*1e3:10.3f} ms/incremental mutant repair {labeling*1e3:10.3f} ms/mutant labeling {incremental_labeling*1e3:10.3f} ms/incremental mutant labeling')
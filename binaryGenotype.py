@@ -1,46 +1,153 @@
+import math
+import random
+
+import numpy as np
+
+def pack_bits(gene):
+	'''packs a sequence of 0/1 loci into an int whose bit i is locus i'''
+	return int.from_bytes(np.packbits(np.asarray(gene, dtype=np.uint8), bitorder='little').tobytes(), 'little')
+
+def unpack_bits(bits, length):
+	'''unpacks an int into a uint8 array of its first length bits'''
+	return np.unpackbits(np.frombuffer(bits.to_bytes(-(-length//8), 'little'), dtype=np.uint8), count=length, bitorder='little')
+
+def unpack_list(bits, length):
+	return unpack_bits(bits, length).tolist()
+
+def random_mask(length, rate):
+	'''returns a mask with each of its length bits set independently with probability rate, skipping from one set
+	   bit to the next with geometric gaps so the cost grows with the number of set bits'''
+	if rate >= 1:
+		return (1 << length)-1
+	if rate <= 0:
+		return 0
+	if rate == 0.5:
+		return random.getrandbits(length)
+	log_keep = math.log(1.0-rate)
+	mask = 0
+	i = int(math.log(1.0-random.random())/log_keep)
+	while i < length:
+		mask |= 1 << i
+		i += 1+int(math.log(1.0-random.random())/log_keep)
+	return mask
+
+class packedGene():
+	'''List-like view of the loci of a binaryGenotype. Reads and writes go to the packed bits of the genotype and a
+	   pickled view arrives as a plain list, so pool workers get a gene repair_and_test_map can use directly.'''
+	__slots__ = ('genotype',)
+
+	def __init__(self, genotype):
+		self.genotype = genotype
+
+	def __len__(self):
+		return self.genotype.length
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return self.tolist()[index]
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError('gene index out of range')
+		return (self.genotype.bits >> index) & 1
+
+	def __setitem__(self, index, value):
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError('gene index out of range')
+		if value:
+			self.genotype.bits |= 1 << index
+		else:
+			self.genotype.bits &= ~(1 << index)
+
+	def __iter__(self):
+		return iter(self.tolist())
+
+	def __eq__(self, other):
+		return self.tolist() == list(other)
+
+	def __array__(self, dtype=None, copy=None):
+		array = unpack_bits(self.genotype.bits, self.genotype.length)
+		return array if dtype is None else array.astype(dtype)
+
+	def __reduce__(self):
+		return unpack_list, (self.genotype.bits, self.genotype.length)
+
+	def __repr__(self):
+		return repr(self.tolist())
+
+	def tolist(self):
+		return unpack_list(self.genotype.bits, self.genotype.length)
+
+	def copy(self):
+		return self.tolist()
+
 class binaryGenotype():
+	'''Fixed-length binary genotype stored as the bits of one int (bit i is locus i), about 1/50 of the memory of a
+	   list of ints. Mutation is an XOR with a random mask and recombination blends the parents' bits through a
+	   mask. The gene attribute reads and accepts lists of 0/1 loci as before. The connectivity attribute holds
+	   the fitness.MapConnectivity of the map of the individual or of its nearest ancestor, which children inherit
+	   so fitness.evaluate_population with incremental can label their maps from it.'''
 	def __init__(self):
 		self.fitness = None
 		self.gene = None
+		self.connectivity = None
+
+	@property
+	def gene(self):
+		return None if self.bits is None else packedGene(self)
+
+	@gene.setter
+	def gene(self, gene):
+		if gene is None:
+			self.bits, self.length = None, 0
+		else:
+			self.bits, self.length = pack_bits(gene), len(gene)
+
+	def child(self, bits, connectivity=None):
+		child = binaryGenotype()
+		child.bits, child.length = bits, self.length
+		child.connectivity = connectivity
+		return child
 
 	def randomInitialization(self, length):
-		# TODO: Add random initialization of fixed-length binary gene
-		pass
+		self.bits, self.length = random.getrandbits(length), length
 
 	def recombine(self, mate, method, **kwargs):
-		child = binaryGenotype()
-		
-		# TODO: Recombine genes of self with mate and assign to child's gene member variable
 		assert method.casefold() in {'uniform', '1-point crossover', 'multi-dimensional'}
 		if method.casefold() == 'uniform':
-			# perform uniform recombination
-			pass
+			# each locus comes from self where the mask is set
+			mask = random.getrandbits(self.length)
 		elif method.casefold() == '1-point crossover':
-			# perform 1-point crossover
-			pass
+			# loci before the crossover point come from self
+			mask = (1 << random.randrange(1, self.length))-1
 		elif method.casefold() == 'multi-dimensional':
-			# this is a red deliverable (i.e., bonus for anyone)
-			
+			# a random rectangle of the 2D map comes from self, the rest from mate
 			height, width = kwargs['height'], kwargs['width']
-			# transform the linear gene of both parents to a 2-dimensional representation.
-			# Recombine 2D parent genes into 2D child gene using the method of your choice.
-			# Convert child gene back down to 1-dimension.
-			pass
-
-		return child
-
-	def mutate(self, **kwargs):
-		copy = binaryGenotype()
-		copy.gene = self.gene.copy()
-		
-		# TODO: mutate gene of copy
-		pass
+			top, bottom = sorted(random.sample(range(height+1), 2))
+			left, right = sorted(random.sample(range(width+1), 2))
+			row = ((1 << (right-left))-1) << left
+			mask = 0
+			for y in range(top, bottom):
+				mask |= row << (y*width)
+		bits = (self.bits & mask) | (mate.bits & ~mask & ((1 << self.length)-1))
+		# the child's map is labeled from the map of the parent it differs from least
+		nearest = self if (bits ^ self.bits).bit_count() <= (bits ^ mate.bits).bit_count() else mate
+		return self.child(bits, nearest.connectivity)
 
-		return copy
+	def mutate(self, mutation_rate=None, **kwargs):
+		'''Flips each locus with probability mutation_rate. By default the rate is 1/length and a mutant that would
+		   equal its parent has one uniformly chosen locus flipped instead.'''
+		if mutation_rate is None:
+			mask = random_mask(self.length, 1/self.length) or 1 << random.randrange(self.length)
+		else:
+			mask = random_mask(self.length, mutation_rate)
+		return self.child(self.bits ^ mask, self.connectivity)
 
 	@classmethod
 	def initialization(cls, mu, *args, **kwargs):
 		population = [cls() for _ in range(mu)]
 		for i in range(len(population)):
 			population[i].randomInitialization(*args, **kwargs)
-		return population
\ No newline at end of file
+		return population
@@ -0,0 +1,198 @@
+'''Runs a multi-run EA experiment from a config file, one run per process.
+
+Every run appends its per-generation statistics to a JSON lines file and checkpoints its EA after each generation,
+so a crashed or interrupted experiment loses at most one generation and is resumed by running the same command
+again. Random search baseline runs log and checkpoint the same way after every num_children evaluations. Run from
+the repository root with e.g.
+`python experiment.py configs/green1b_config.txt --runs 30 --evaluations 2000 --output data/green1b`.'''
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import random
+import statistics
+
+import fitness
+import selection
+from baseEvolution import baseEvolutionPopulation, matrixEvolutionPopulation, asyncSteadyStateEvolution, evolve_generation
+from binaryGenotype import binaryGenotype
+from snakeeyes import readConfig
+
+# EA drivers the command line can run, by name
+EA_CLASSES = {'matrix': matrixEvolutionPopulation, 'steady': asyncSteadyStateEvolution, 'base': baseEvolutionPopulation}
+
+def default_namespace():
+	'''Names a config file may refer to, as the notebook sees them after `from selection import *`.'''
+	namespace = {name: value for name, value in vars(selection).items() if not name.startswith('_')}
+	namespace['binaryGenotype'] = binaryGenotype
+	return namespace
+
+def run_paths(output, run):
+	return os.path.join(output, f'run{run}.jsonl'), os.path.join(output, f'run{run}.pkl')
+
+def append_record(path, record):
+	'''Appends one JSON record and forces it to disk.'''
+	with open(path, 'a') as f:
+		f.write(json.dumps(record)+'\n')
+		f.flush()
+		os.fsync(f.fileno())
+
+def read_records(path):
+	'''Returns the complete records of a JSON lines file, ignoring a line cut short by a crash.'''
+	records = list()
+	if os.path.exists(path):
+		with open(path) as f:
+			for line in f:
+				try:
+					records.append(json.loads(line))
+				except json.JSONDecodeError:
+					break
+	return records
+
+def write_records(path, records):
+	with open(path, 'w') as f:
+		f.writelines(json.dumps(record)+'\n' for record in records)
+
+def save_checkpoint(path, state):
+	'''Pickles state next to path and renames it into place, so a crash never leaves a partial checkpoint.'''
+	with open(path+'.tmp', 'wb') as f:
+		pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(path+'.tmp', path)
+
+def generation_record(population, evaluations):
+	fitnesses = [individual.fitness for individual in population]
+	return {'evaluations': evaluations, 'mean': statistics.mean(fitnesses), 'best': max(fitnesses)}
+
+def final_record(best, evaluations):
+	return {'final': True, 'evaluations': evaluations, 'best': best.fitness, 'gene': [int(locus) for locus in best.gene]}
+
+def check_ea_class(ea_class):
+	'''Raises ValueError for an EA class that cannot breed children, such as the baseEvolutionPopulation template.'''
+	if not issubclass(ea_class, asyncSteadyStateEvolution) and ea_class.generate_children is baseEvolutionPopulation.generate_children:
+		raise ValueError(f"{ea_class.__name__} does not implement generate_children.")
+
+def evolve_step(ea, fitness_kwargs, number_evaluations):
+	'''Runs one generation of a generational EA, or num_children evaluations of a steady-state EA, without going
+	   past number_evaluations for the latter.'''
+	if isinstance(ea, asyncSteadyStateEvolution):
+		ea.fitness_kwargs = fitness_kwargs
+		ea.run(min(ea.evaluations+ea.num_children, number_evaluations))
+	else:
+		evolve_generation(ea, fitness_kwargs)
+
+def run_ea(config, number_evaluations, output, run, seed, ea_class=matrixEvolutionPopulation):
+	'''Runs or resumes one EA run of an experiment. Evaluations are seeded from the run seed, so an uninterrupted
+	   run and a resumed one give the same results.
+
+	   Returns the final record of the run.'''
+	check_ea_class(ea_class)
+	log_path, checkpoint_path = run_paths(output, run)
+	records = read_records(log_path)
+	if records and records[-1].get('final'):
+		return records[-1]
+	fitness_kwargs = dict(config['fitness_kwargs'], return_log=False)
+	if os.path.exists(checkpoint_path):
+		with open(checkpoint_path, 'rb') as f:
+			ea, state = pickle.load(f)
+		random.setstate(state)
+		# drop records written after the checkpoint by the generation that was cut short
+		write_records(log_path, [record for record in records if record['evaluations'] <= ea.evaluations])
+	else:
+		random.seed(seed)
+		write_records(log_path, list())
+		ea = ea_class(**config['EA_configs'], **config)
+		fitness.evaluate_population(ea.population, fitness_kwargs, incremental=getattr(ea, 'incremental_repair', False))
+		ea.evaluations = len(ea.population)
+		append_record(log_path, generation_record(ea.population, ea.evaluations))
+		save_checkpoint(checkpoint_path, (ea, random.getstate()))
+	while ea.evaluations < number_evaluations:
+		evolve_step(ea, fitness_kwargs, number_evaluations)
+		append_record(log_path, generation_record(ea.population, ea.evaluations))
+		save_checkpoint(checkpoint_path, (ea, random.getstate()))
+	record = final_record(max(ea.population, key=lambda individual: individual.fitness), ea.evaluations)
+	append_record(log_path, record)
+	os.remove(checkpoint_path)
+	return record
+
+def run_random_search(config, number_evaluations, output, run, seed, individual_class=None):
+	'''Runs or resumes one random search baseline run that evaluates number_evaluations random individuals in
+	   chunks of num_children. After each chunk it appends a record of the chunk's mean and the best fitness so far
+	   and checkpoints the best individual, so like run_ea it loses at most one chunk when interrupted.
+
+	   Returns the final record of the run.'''
+	log_path, checkpoint_path = run_paths(output, run)
+	records = read_records(log_path)
+	if records and records[-1].get('final'):
+		return records[-1]
+	individual_class = individual_class or config['EA_configs']['individual_class']
+	chunk = config['EA_configs']['num_children']
+	fitness_kwargs = dict(config['fitness_kwargs'], return_log=False)
+	if os.path.exists(checkpoint_path):
+		with open(checkpoint_path, 'rb') as f:
+			best, evaluations, state = pickle.load(f)
+		random.setstate(state)
+		write_records(log_path, [record for record in records if record['evaluations'] <= evaluations])
+	else:
+		random.seed(seed)
+		write_records(log_path, list())
+		best, evaluations = None, 0
+	while evaluations < number_evaluations:
+		population = individual_class.initialization(min(chunk, number_evaluations-evaluations), **config['initialization_kwargs'])
+		fitness.evaluate_population(population, fitness_kwargs)
+		evaluations += len(population)
+		best = max(population+[best] if best is not None else population, key=lambda individual: individual.fitness)
+		append_record(log_path, dict(generation_record(population, evaluations), best=best.fitness))
+		save_checkpoint(checkpoint_path, (best, evaluations, random.getstate()))
+	record = final_record(best, evaluations)
+	append_record(log_path, record)
+	os.remove(checkpoint_path)
+	return record
+
+def run_task(task):
+	method, args, kwargs = task
+	return args[3], method(*args, **kwargs)
+
+def run_experiment(config_path, number_runs, number_evaluations, output, workers=None, seed=0, random_search=False, namespace=None, ea_class=matrixEvolutionPopulation):
+	'''Runs number_runs independent runs of the EA configured in config_path across workers processes (one per
+	   core by default), resuming any runs an earlier call left unfinished. Run i is seeded with seed+i. Progress
+	   of run i streams to output/run{i}.jsonl and the best fitness of every run is written, in run order, to
+	   output/results.txt once all runs have finished. With random_search, the runs are the random search
+	   baseline instead of the EA, otherwise ea_class is the EA driver. namespace maps the names used in the config file to objects and defaults to
+	   the selection functions and binaryGenotype.
+
+	   Returns the list of best fitnesses in run order.'''
+	if not random_search:
+		check_ea_class(ea_class)
+	config = readConfig(config_path, globalVars=default_namespace() if namespace is None else namespace, localVars=dict())
+	os.makedirs(output, exist_ok=True)
+	if random_search:
+		tasks = [(run_random_search, (config, number_evaluations, output, run, seed+run), dict()) for run in range(number_runs)]
+	else:
+		tasks = [(run_ea, (config, number_evaluations, output, run, seed+run), {'ea_class': ea_class}) for run in range(number_runs)]
+	workers = min(workers or multiprocessing.cpu_count(), number_runs)
+	if workers > 1:
+		with multiprocessing.Pool(workers) as pool:
+			finished = dict(pool.imap_unordered(run_task, tasks))
+	else:
+		finished = dict(map(run_task, tasks))
+	bests = [finished[run]['best'] for run in range(number_runs)]
+	with open(os.path.join(output, 'results.txt'), 'w') as f:
+		f.writelines(f'{best}\n' for best in bests)
+	return bests
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('config')
+	parser.add_argument('--runs', type=int, default=30)
+	parser.add_argument('--evaluations', type=int, default=2000)
+	parser.add_argument('--output', required=True, help='directory for the run logs and results.txt')
+	parser.add_argument('--workers', type=int, default=None)
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--random-search', action='store_true', help='run the random search baseline instead of the EA')
+	parser.add_argument('--ea', choices=sorted(EA_CLASSES), default='matrix', help='EA driver to run (default: matrix)')
+	args = parser.parse_args()
+	bests = run_experiment(args.config, args.runs, args.evaluations, args.output, args.workers, args.seed, args.random_search, ea_class=EA_CLASSES[args.ea])
+	print(f'best fitness: mean {statistics.mean(bests)} max {max(bests)} over {len(bests)} runs')
@@ -1,6 +1,16 @@
 import time
-from collections import deque
+import atexit
+import functools
+import hashlib
+import inspect
+import multiprocessing
+import numbers
+import shelve
+from multiprocessing import shared_memory
+from collections import deque, OrderedDict
 import gpac
+import batchedGpac
+import numpy as np
 import random
 import statistics
 import staticAgents
@@ -9,14 +19,14 @@ def manhattan_distance(location0, location1):
 	'''calculate the Manhattan distance between two input points'''
 	return sum([abs(coord[0]-coord[1]) for coord in zip(list(location0),list(location1))]) # overkill
 
+def translate_gene_array(genotype, height, width):
+	'''translate the input 1 dimensional genotype into a 2 dimensional (width, height) uint8 array'''
+	assert len(genotype) == height*width, f'ERROR: EXPECTED GENOTYPE OF LENGTH {height*width} BUT GOT {len(genotype)}'
+	return np.array(genotype, dtype=np.uint8).reshape(height, width).T.copy()
+
 def translate_gene(genotype, height, width):
 	'''translate the input 1 dimensional genotype into a 2 dimensional map'''
-	assert len(genotype) == height*width, f'ERROR: EXPECTED GENOTYPE OF LENGTH {height*width} BUT GOT {len(genotype)}'
-	maze = [[0 for __ in range(height)] for _ in range(width)]
-	for i in range(len(genotype)):
-		x, y = i%width, i//width
-		maze[x][y] = genotype[i]
-	return maze
+	return translate_gene_array(genotype, height, width).tolist()
 
 def reachable_cells(maze, start):
 	'''Form a set of all reachable cells from a starting location using breadth-first graph search.
@@ -35,6 +45,35 @@ def reachable_cells(maze, start):
 				visited.add((x,y))
 	return visited
 
+def label_components(open_cells):
+	'''Label the 4-connected components of the open cells of a 2 dimensional boolean array using vectorized
+	   union-find: every pass hooks the larger root of each edge that spans two trees onto a smaller root and then
+	   compresses paths by pointer jumping until every cell points at its root.
+
+	   Returns an integer array of the same shape holding the smallest flat index of each open cell's component
+	   and -1 for closed cells.'''
+	index = np.arange(open_cells.size).reshape(open_cells.shape)
+	# edges between horizontally and vertically adjacent open cells
+	right = open_cells[:-1, :] & open_cells[1:, :]
+	up = open_cells[:, :-1] & open_cells[:, 1:]
+	source = np.concatenate((index[:-1, :][right], index[:, :-1][up]))
+	target = np.concatenate((index[1:, :][right], index[:, 1:][up]))
+	parent = index.ravel().copy()
+	while True:
+		source_root, target_root = parent[source], parent[target]
+		linked = source_root != target_root
+		if not linked.any():
+			break
+		source_root, target_root = source_root[linked], target_root[linked]
+		# a root spanning several edges keeps one of its smaller roots and the rest merge on later passes
+		parent[np.maximum(source_root, target_root)] = np.minimum(source_root, target_root)
+		while True:
+			jumped = parent[parent]
+			if np.array_equal(jumped, parent):
+				break
+			parent = jumped
+	return np.where(open_cells.ravel(), parent, -1).reshape(open_cells.shape)
+
 def repair_unreachable_cells(maze, start):
 	'''Make all unreachable cells walls so pills and fruit aren't erroneously spawned.
 
@@ -48,65 +87,294 @@ def repair_unreachable_cells(maze, start):
 				repairs += 1
 	return maze, repairs
 
+def distance_transform(region):
+	'''Manhattan distance from every cell of a 2 dimensional boolean array to the nearest True cell, ignoring walls.
+	   The distance is separable, so it is computed by one forward and one backward minimum scan along each axis
+	   using d[i] = min(i + min_{j<=i}(f[j]-j), min_{j>=i}(f[j]+j) - i).
+
+	   Returns an integer array of the same shape.'''
+	distance = np.where(region, 0, sum(region.shape)).astype(np.int64) # larger than any distance on the map
+	for axis in (0, 1):
+		distance = np.moveaxis(distance, axis, -1)
+		i = np.arange(distance.shape[-1])
+		forward = np.minimum.accumulate(distance-i, axis=-1)+i
+		backward = np.flip(np.minimum.accumulate(np.flip(distance+i, axis=-1), axis=-1), axis=-1)-i
+		distance = np.moveaxis(np.minimum(forward, backward), -1, axis)
+	return distance
+
+def nearest_points(region0, region1):
+	'''Find a pair of cells, one from each of two regions given as 2 dimensional boolean arrays, with the smallest
+	   Manhattan distance between them in time linear in the size of the map. Ties are broken by the lowest flat
+	   index of the point in region1 and then of the point in region0.
+
+	   Returns the point from region0 and the point from region1.'''
+	distance = np.where(region1, distance_transform(region0), np.iinfo(np.int64).max)
+	x1, y1 = np.unravel_index(np.argmin(distance), region1.shape)
+	xs, ys = np.nonzero(region0)
+	nearest = np.argmin(np.abs(xs-x1)+np.abs(ys-y1))
+	return (int(xs[nearest]), int(ys[nearest])), (int(x1), int(y1))
+
+def connect_regions(grid, region0, region1):
+	'''Connect two regions of a map array in place with a rectangular tunnel between their nearest points.
+
+	   Returns the number of walls removed.'''
+	(x0, y0), (x1, y1) = nearest_points(region0, region1)
+	# remove walls to form a rectangular tunnel between two nearest reachable points
+	tunnel = np.zeros(grid.shape, dtype=bool)
+	xs, ys = slice(min(x0, x1), max(x0, x1)+1), slice(min(y0, y1), max(y0, y1)+1)
+	tunnel[xs, y0] = tunnel[xs, y1] = True
+	tunnel[x0, ys] = tunnel[x1, ys] = True
+	walls = tunnel & (grid == 1)
+	grid[walls] = 0
+	return int(np.count_nonzero(walls))
+
+def open_spawns(grid):
+	'''Open the player spawn locations of a map array in place.
+
+	   Returns the number of walls removed.'''
+	width, height = grid.shape
+	repairs = 0
+	for spawn in ((0, height-1), (width-1, 0)):
+		if grid[spawn] == 1:
+			grid[spawn] = 0
+			repairs += 1
+	return repairs
+
+class MapConnectivity():
+	'''A map array with its spawns opened and the 4-connected components of its open cells, from which the repaired
+	   map follows without labeling again. Every open cell holds a component id and ids of merged components are
+	   aliased to one root id, so update() derives the connectivity of a map that differs in a few cells, such as
+	   a mutant's, from the changed cells alone: an opened cell merges the ids around it and a closed cell only
+	   labels a box around itself, grown until the box shows whether its component split.'''
+	# the 8 cells around a cell in cyclic order; odd positions are its 4-neighbors
+	RING = ((-1,-1), (0,-1), (1,-1), (1,0), (1,1), (0,1), (-1,1), (-1,0))
+
+	# beyond this many changed cells, labeling the whole map is cheaper
+	MAX_UPDATES = 16
+
+	# beyond this many aliases, ids are replaced by their roots
+	MAX_ALIASES = 64
+
+	def __init__(self, grid, labels, spawn_repairs, aliases=None, next_id=None):
+		self.grid = grid
+		self.labels = labels
+		self.spawn_repairs = spawn_repairs
+		self.aliases = dict() if aliases is None else aliases
+		# label_components labels with flat indices, so new ids start past them
+		self.next_id = labels.size if next_id is None else next_id
+
+	@classmethod
+	def from_grid(cls, grid):
+		'''Labels a translated (width, height) map array, which is left unmodified.'''
+		grid = grid.copy()
+		spawn_repairs = open_spawns(grid)
+		return cls(grid, label_components(grid == 0), spawn_repairs)
+
+	def update(self, grid):
+		'''Returns the MapConnectivity of another translated map array of the same shape, opening and closing its
+		   changed cells one at a time. Apart from finding the changed cells and copying the arrays once, the work
+		   grows with the number of changed cells and the size of the boxes their closing needs, not with the map.'''
+		assert grid.shape == self.grid.shape, f'ERROR: EXPECTED A MAP OF SHAPE {self.grid.shape} BUT GOT {grid.shape}'
+		grid = grid.copy()
+		spawn_repairs = open_spawns(grid)
+		xs, ys = np.nonzero(grid != self.grid)
+		if len(xs) == 0:
+			# only find() writes to a finished MapConnectivity, compressing its aliases, so the labels can be shared
+			return MapConnectivity(grid, self.labels, spawn_repairs, dict(self.aliases), self.next_id)
+		if len(xs) > self.MAX_UPDATES:
+			return MapConnectivity(grid, label_components(grid == 0), spawn_repairs)
+		connectivity = MapConnectivity(self.grid.copy(), self.labels.copy(), spawn_repairs, dict(self.aliases), self.next_id)
+		for x, y in zip(xs.tolist(), ys.tolist()):
+			if grid[x, y] == 0:
+				connectivity.open_cell(x, y)
+			else:
+				connectivity.close_cell(x, y)
+		if len(connectivity.aliases) > self.MAX_ALIASES:
+			connectivity.labels = connectivity.root_labels()
+			connectivity.aliases = dict()
+		return connectivity
+
+	def find(self, label):
+		'''Returns the root id of a component id, compressing the alias chain it followed.'''
+		root = label
+		while root in self.aliases:
+			root = self.aliases[root]
+		while label != root:
+			self.aliases[label], label = root, self.aliases[label]
+		return root
+
+	def new_id(self):
+		self.next_id += 1
+		return self.next_id-1
+
+	def open_neighbors(self, x, y, offsets):
+		width, height = self.grid.shape
+		return [0 <= x+dx < width and 0 <= y+dy < height and self.grid[x+dx, y+dy] == 0 for dx, dy in offsets]
+
+	def open_cell(self, x, y):
+		'''Opens a cell, giving it the root id of the components next to it and aliasing their other roots to it.'''
+		self.grid[x, y] = 0
+		neighbors = zip(self.RING[1::2], self.open_neighbors(x, y, self.RING[1::2]))
+		roots = {self.find(int(self.labels[x+dx, y+dy])) for (dx, dy), is_open in neighbors if is_open}
+		root = min(roots) if roots else self.new_id()
+		for other in roots-{root}:
+			self.aliases[other] = root
+		self.labels[x, y] = root
+
+	def close_cell(self, x, y):
+		'''Closes a cell and gives new ids to any pieces its component split into.'''
+		self.grid[x, y] = 1
+		self.labels[x, y] = -1
+		around = self.open_neighbors(x, y, self.RING)
+		if sum(around[1::2]) <= 1 or all(around):
+			return
+		# the open neighbors are linked around the cell if they share one run of open ring cells
+		start = around.index(False)
+		runs = 0
+		in_run = False
+		for i in range(start, start+8):
+			if around[i%8] and not in_run:
+				in_run, linked = True, False
+			elif not around[i%8] and in_run:
+				in_run = False
+				runs += linked
+			if around[i%8] and i%2:
+				linked = True
+		runs += in_run and linked
+		if runs > 1:
+			self.split(x, y)
+
+	def split(self, x, y):
+		'''Labels boxes of growing size around a closed cell until at most one group of its open neighbors that are
+		   linked inside the box reaches the edge of the box. The others are whole components and get new ids.'''
+		width, height = self.grid.shape
+		neighbors = [(x+dx, y+dy) for (dx, dy), is_open in zip(self.RING[1::2], self.open_neighbors(x, y, self.RING[1::2])) if is_open]
+		reach = 4
+		while True:
+			left, right = max(x-reach, 0), min(x+reach+1, width)
+			bottom, top = max(y-reach, 0), min(y+reach+1, height)
+			local = label_components(self.grid[left:right, bottom:top] == 0)
+			groups = {int(local[nx-left, ny-bottom]) for nx, ny in neighbors}
+			if len(groups) == 1:
+				return
+			# edges of the box inside the map, through which a group may continue
+			edge = np.zeros(local.shape, dtype=bool)
+			edge[0, :] |= left > 0
+			edge[-1, :] |= right < width
+			edge[:, 0] |= bottom > 0
+			edge[:, -1] |= top < height
+			leaving = groups & set(np.unique(local[edge]).tolist())
+			if len(leaving) <= 1:
+				# the group that may continue outside the box, or any group once the box is the whole map, keeps its id
+				kept = leaving.pop() if leaving else min(groups)
+				box = self.labels[left:right, bottom:top]
+				for group in groups-{kept}:
+					box[local == group] = self.new_id()
+				return
+			reach *= 2
+
+	def component(self, roots):
+		'''Returns a boolean array marking the cells of the components with the given root ids.'''
+		ids = set(roots) | {label for label in list(self.aliases) if self.find(label) in roots}
+		return np.isin(self.labels, list(ids))
+
+	def root_labels(self):
+		'''Returns the labels with every id replaced by the root id of its component.'''
+		if not self.aliases:
+			return self.labels
+		ids = np.array(sorted(self.aliases))
+		roots = np.array([self.find(label) for label in ids.tolist()])
+		found = np.minimum(ids.searchsorted(self.labels), len(ids)-1)
+		return np.where(ids[found] == self.labels, roots[found], self.labels)
+
+	def repair(self):
+		'''Connects the spawns and walls off unreachable cells exactly as repair_map_array does.
+
+		   Returns the repaired copy of the map array and the number of repair operations performed.'''
+		width, height = self.grid.shape
+		grid = self.grid.copy()
+		pac_root, ghost_root = self.find(int(self.labels[0, height-1])), self.find(int(self.labels[width-1, 0]))
+		repairs = self.spawn_repairs
+		reachable = self.component({pac_root})
+		if ghost_root != pac_root:
+			repairs += connect_regions(grid, reachable, self.component({ghost_root}))
+			# the tunnel joins both regions and every component it touches
+			tunnel = (grid == 0) & (self.grid == 1)
+			touching = tunnel.copy()
+			touching[1:, :] |= tunnel[:-1, :]
+			touching[:-1, :] |= tunnel[1:, :]
+			touching[:, 1:] |= tunnel[:, :-1]
+			touching[:, :-1] |= tunnel[:, 1:]
+			joined = {self.find(label) for label in np.unique(self.labels[touching]).tolist() if label >= 0}
+			reachable = self.component(joined | {pac_root, ghost_root}) | tunnel
+		# repair unreachable cells (given existing modifications)
+		unreachable = (grid == 0) & ~reachable
+		grid[unreachable] = 1
+		repairs += int(np.count_nonzero(unreachable))
+		return grid, repairs
+
+def repair_map_array(grid):
+	'''Repair a (width, height) uint8 map array in place by connecting player spawn locations and filling in
+	   unreachable cells, which are found by connected-component labeling and walled off in one masked assignment.
+
+	   Returns the modified array and the number of repair operations performed.'''
+	repaired, repairs = MapConnectivity.from_grid(grid).repair()
+	grid[:] = repaired
+	return grid, repairs
+
 def repair_map(maze):
 	'''Repair map by connecting player spawn locations and filling in unreachable cells.
 	   
 	   Returns a modified map and the number of repair operations performed.'''
-	pac_spawn = (0, len(maze[0])-1)
-	ghost_spawn = (len(maze)-1, 0)
-	repairs = 0
-	# repair if walls are in spawn locations
-	if maze[pac_spawn[0]][pac_spawn[1]] == 1:
-		maze[pac_spawn[0]][pac_spawn[1]] = 0
-		repairs += 1
-	if maze[ghost_spawn[0]][ghost_spawn[1]] == 1:
-		maze[ghost_spawn[0]][ghost_spawn[1]] = 0
-		repairs += 1
-	
-	# identify if ghost spawn is reachable from pac-man spawn
-	pac_reachable = reachable_cells(maze, pac_spawn)
-	if ghost_spawn not in pac_reachable:
-		# calculate nearest points reachable from both pac-man and ghost spawns
-		ghost_reachable = reachable_cells(maze, ghost_spawn)
-		nearest_points = (pac_spawn, ghost_spawn)
-		shortest_distance = manhattan_distance(*nearest_points)
-		for pac_point in list(pac_reachable):
-			for ghost_point in list(ghost_reachable):
-				distance = manhattan_distance(pac_point, ghost_point)
-				if distance < shortest_distance:
-					nearest_points = (pac_point, ghost_point)
-		point0, point1 = nearest_points
-		x0, y0 = point0
-		x1, y1 = point1
-		# remove walls to form a rectangular tunnel between two nearest reachable points
-		for x in range(min(x0, x1), max(x0, x1)+1):
-			if maze[x][y0] == 1:
-				maze[x][y0] = 0
-				repairs += 1
-			if maze[x][y1] == 1:
-				maze[x][y1] = 0
-				repairs += 1
-		for y in range(min(y0, y1), max(y0, y1)+1):
-			if maze[x0][y] == 1:
-				maze[x0][y] = 0
-				repairs += 1
-			if maze[x1][y] == 1:
-				maze[x1][y] = 0
-				repairs += 1
-	# repair unreachable cells (given existing modifications)
-	maze, access_repairs = repair_unreachable_cells(maze, pac_spawn)
-	repairs += access_repairs
+	grid, repairs = repair_map_array(np.array(maze, dtype=np.uint8))
+	maze[:] = grid.tolist()
 	return maze, repairs
 
-def repair_and_test_map(genotype, height, width, return_repair_count = False, agent_type='pill', ghost_type='wander', samples=5, **kwargs):
+def repair_genotype(genotype, height, width):
+	'''Repairs the map of a linear genotype, or of a MapConnectivity whose components are already labeled.
+
+	   Returns the repaired (width, height) map array and the number of repair operations performed.'''
+	if isinstance(genotype, MapConnectivity):
+		assert genotype.grid.shape == (width, height), f'ERROR: EXPECTED A MAP OF SHAPE {(width, height)} BUT GOT {genotype.grid.shape}'
+		return genotype.repair()
+	return repair_map_array(translate_gene_array(genotype, height, width))
+
+def repair_and_test_map(genotype, height, width, return_repair_count = False, agent_type='pill', ghost_type='wander', samples=5, engine='list', return_log=True, seed=None, seeds=None, threshold=None, min_samples=3, max_samples=None, confidence=0.95, return_sample_count=False, **kwargs):
 	'''Fitness function that takes a linear map description, translates it into 2D, repairs the map, and plays
-	   and plays a configurable number of games with a static agent strategy. 
+	   and plays a configurable number of games with a static agent strategy. The engine argument selects the
+	   game implementation: 'list' for gpac.GPacGame or 'array' for the array-backed gpac.ArrayGPacGame.
+	   Games are played without logging when return_log is False. The seed (an int, random.Random or NumPy
+	   Generator) drives pill placement, fruit spawns and agent randomness, so a seeded evaluation gives the same
+	   result in any process; the global random module is used if it is None.
+
+	   For common random numbers, seeds gives one seed per game (at least as many as games played) and replaces
+	   seed. Each game then draws pill placement, fruit spawns and every agent's moves from separate streams
+	   derived from its seed, so individuals evaluated with the same seeds face the same luck and differences in
+	   fitness come from their maps.
 
-	   Returns negative average pac-man score, the log of the game with the score nearest the mean, and 
-	   (optionally) the number of repairs made.'''
-	game_map = translate_gene(genotype, height, width)
-	game_map, num_repairs = repair_map(game_map)
-	game = gpac.GPacGame(game_map, **kwargs)
+	   Given a fitness threshold (such as the fitness of the worst survivor), games are raced: after min_samples
+	   games, play stops as soon as a one-sided normal bound at the given confidence shows the fitness cannot
+	   reach the threshold, and games beyond samples (up to max_samples, twice samples by default) are only
+	   played while the bound cannot tell whether it does.
+
+	   The genotype may also be the MapConnectivity of its translated map, as evaluate_population passes with
+	   incremental, which gives the same map and repair count without labeling the map again.
+
+	   Returns negative average pac-man score, the log of the game with the score nearest the mean (None if
+	   return_log is False), and (optionally) the number of repairs made and the number of games played.'''
+	game_map, num_repairs = repair_genotype(genotype, height, width)
+	game_map = game_map.tolist()
+	# select game engine
+	if engine == 'list':
+		game_class = gpac.GPacGame
+	elif engine == 'array':
+		game_class = gpac.ArrayGPacGame
+	else:
+		raise ValueError(f"{engine} is not a known type of game engine.")
+	if not return_log:
+		kwargs['log_level'] = 'off'
+	rng = gpac.make_rng(seed)
+	game = game_class(game_map, seed=rng, **kwargs)
 	scores = list()
 	logs = list()
 	# select agent strategy
@@ -125,11 +393,24 @@ def repair_and_test_map(genotype, height, width, return_repair_count = False, ag
 		ghost_class = staticAgents.ChasingGhostAgent
 	else:
 		raise ValueError(f"{ghost_type} is not a known type of ghost agent.")
+	if threshold is None:
+		min_samples = max_samples = samples
+	elif max_samples is None:
+		max_samples = 2*samples
+	z = statistics.NormalDist().inv_cdf(confidence)
+	assert seeds is None or len(seeds) >= max_samples, f'ERROR: EXPECTED AT LEAST {max_samples} SEEDS BUT GOT {len(seeds)}'
 	# play multiple games against agent
-	for i in range(samples):
-		agent = agent_class()
-		ghosts = {player: ghost_class() for player in game.players if 'm' not in player}
-		if i > 0:
+	for i in range(max_samples):
+		agent_rngs = {player: rng for player in game.players}
+		if seeds is not None:
+			# common random numbers: independent streams for pills, fruit and each agent
+			streams = random.Random(seeds[i])
+			game.pill_rng = random.Random(streams.getrandbits(64))
+			game.rng = random.Random(streams.getrandbits(64))
+			agent_rngs = {player: random.Random(streams.getrandbits(64)) for player in game.players}
+		agent = agent_class(rng=agent_rngs['m'])
+		ghosts = {player: ghost_class(rng=agent_rngs[player]) for player in game.players if 'm' not in player}
+		if i > 0 or seeds is not None:
 			game.reset()
 		
 		while not game.gameover:
@@ -142,6 +423,14 @@ def repair_and_test_map(genotype, height, width, return_repair_count = False, ag
 			game.step()
 		scores.append(game.score)
 		logs.append(game.log)
+		# race the fitness bound against the threshold
+		if threshold is not None and len(scores) >= max(min_samples, 2):
+			fitness = -statistics.mean(scores)
+			bound = z*statistics.stdev(scores)/len(scores)**0.5
+			if fitness+bound < threshold:
+				break # cannot reach the threshold
+			if len(scores) >= samples and fitness-bound >= threshold:
+				break # clearly reaches the threshold
 	average_score = statistics.mean(scores)
 	
 	# calculate deviation from mean for all games
@@ -152,8 +441,284 @@ def repair_and_test_map(genotype, height, width, return_repair_count = False, ag
 		# get log of game with score nearest the mean
 		if score_variances[sample] == representative_score:
 			representative_log = logs[sample]
+	# optionally return number of repairs and games played
+	result = (-average_score, representative_log)
+	if return_repair_count:
+		result += (num_repairs,)
+	if return_sample_count:
+		result += (len(scores),)
+	return result
+
+
+def batch_repair_and_test_maps(genotypes, height, width, return_repair_count = False, agent_type='greedy_pill', ghost_type='wander', samples=5, seed=None, **kwargs):
+	'''Batched counterpart of repair_and_test_map that repairs every map and then plays all samples of all maps in
+	   lockstep with batchedGpac.BatchedGPacGame, using vectorized agent policies. Games are not logged.
+	   agent_type and ghost_type name batchedGpac.PAC_POLICIES and batchedGpac.GHOST_POLICIES, which play
+	   differently from the staticAgents agents, so these fitnesses are not comparable with repair_and_test_map.
+
+	   Returns a list with the negative average pac-man score of each genotype and (optionally) a list with the
+	   number of repairs made to each map.'''
+	if agent_type not in batchedGpac.PAC_POLICIES:
+		raise ValueError(f"{agent_type} is not a known type of batched Pac-man agent, choose one of {', '.join(batchedGpac.PAC_POLICIES)}.")
+	if ghost_type not in batchedGpac.GHOST_POLICIES:
+		raise ValueError(f"{ghost_type} is not a known type of batched ghost agent, choose one of {', '.join(batchedGpac.GHOST_POLICIES)}.")
+	game_maps = list()
+	repair_counts = list()
+	for genotype in genotypes:
+		game_map, num_repairs = repair_map_array(translate_gene_array(genotype, height, width))
+		game_maps.append(game_map)
+		repair_counts.append(num_repairs)
+	game = batchedGpac.BatchedGPacGame(np.repeat(np.array(game_maps), samples, axis=0), seed=seed, **kwargs)
+	scores = batchedGpac.play(game, batchedGpac.PAC_POLICIES[agent_type], batchedGpac.GHOST_POLICIES[ghost_type])
+	fitnesses = [-float(average_score) for average_score in scores.reshape(len(genotypes), samples).mean(axis=1)]
 	# optionally return number of repairs
 	if return_repair_count:
-		return -average_score, representative_log, num_repairs
+		return fitnesses, repair_counts
 	else:
-		return -average_score, representative_log
+		return fitnesses
+
+
+# warm worker pools keyed by number of workers, reused across generations and closed at exit
+pools = dict()
+
+def get_pool(workers):
+	'''Returns a process pool with the requested number of workers, starting it on first use.'''
+	if workers not in pools:
+		pools[workers] = multiprocessing.Pool(workers)
+	return pools[workers]
+
+@atexit.register
+def shutdown_pools():
+	'''Terminates every warm worker pool.'''
+	for pool in pools.values():
+		pool.terminate()
+		pool.join()
+	pools.clear()
+
+def evaluate_gene(fitness_kwargs, genotype):
+	'''Evaluates one gene with repair_and_test_map in a worker. Returns the fitness, the log (None when it is not
+	   requested) and the number of games played.'''
+	fitness, log, *_, games = repair_and_test_map(genotype, **dict(fitness_kwargs, return_sample_count=True))
+	return fitness, log, games
+
+class FitnessCache():
+	'''LRU cache of fitness results keyed on a hash of the repaired map and the fitness kwargs, so genotypes that
+	   repair to the same map are only simulated once. With a path the cache is backed by a shelve file that keeps
+	   every result for later runs. Unseeded evaluations are noisy and a hit returns the stored sample, while
+	   seeded evaluations return exactly what re-simulating would. A random.Random or NumPy Generator seed gives
+	   a different result on every call, so such evaluations are not cached.'''
+	# arguments of repair_and_test_map that do not change its result
+	IGNORED_KWARGS = {'genotype', 'return_repair_count', 'return_sample_count', 'engine'}
+
+	def __init__(self, maxsize=10000, path=None):
+		self.maxsize = maxsize
+		self.entries = OrderedDict()
+		self.store = None if path is None else shelve.open(path)
+		self.hits = 0
+		self.misses = 0
+
+	@staticmethod
+	def cacheable(fitness_kwargs):
+		'''Returns whether evaluations with fitness_kwargs are unseeded or seeded with an int.'''
+		seed = fitness_kwargs.get('seed')
+		return seed is None or isinstance(seed, numbers.Integral)
+
+	def key(self, game_map, fitness_kwargs):
+		'''Returns the hex digest identifying a repaired map evaluated with the given fitness kwargs.'''
+		if not self.cacheable(fitness_kwargs):
+			raise ValueError(f'ERROR: CANNOT CACHE EVALUATIONS SEEDED WITH A {type(fitness_kwargs["seed"]).__name__}')
+		arguments = inspect.signature(repair_and_test_map).bind(None, **fitness_kwargs)
+		arguments.apply_defaults()
+		settings = {name: value for name, value in arguments.arguments.items() if name not in self.IGNORED_KWARGS}
+		settings.update(settings.pop('kwargs'))
+		# NumPy integers repr differently from equal ints
+		if settings['seed'] is not None:
+			settings['seed'] = int(settings['seed'])
+		if settings['seeds'] is not None:
+			settings['seeds'] = [int(seed) if isinstance(seed, numbers.Integral) else seed for seed in settings['seeds']]
+		digest = hashlib.blake2b(repr(sorted(settings.items())).encode())
+		digest.update(np.asarray(game_map, dtype=np.uint8).tobytes())
+		return digest.hexdigest()
+
+	def get(self, key):
+		'''Returns the stored (fitness, log) of a key, or None on a miss.'''
+		if key in self.entries:
+			self.entries.move_to_end(key)
+		elif self.store is not None and key in self.store:
+			self.put(key, self.store[key], persist=False)
+		else:
+			self.misses += 1
+			return None
+		self.hits += 1
+		return self.entries[key]
+
+	def put(self, key, result, persist=True):
+		self.entries[key] = result
+		self.entries.move_to_end(key)
+		if len(self.entries) > self.maxsize:
+			self.entries.popitem(last=False)
+		if persist and self.store is not None:
+			self.store[key] = result
+
+	def stats(self):
+		'''Returns the hit and miss counts, the hit rate and the number of results held in memory.'''
+		lookups = self.hits+self.misses
+		return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits/lookups if lookups else 0.0, 'size': len(self.entries)}
+
+	def close(self):
+		if self.store is not None:
+			self.store.close()
+			self.store = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def __len__(self):
+		return len(self.entries)
+
+def map_connectivities(population, height, width):
+	'''Labels the map of every individual from the MapConnectivity in its connectivity attribute, which children
+	   inherit from a parent, or from scratch if it has none. Each individual keeps the MapConnectivity of its own
+	   map in that attribute for its children.
+
+	   Returns the list of MapConnectivity objects in population order.'''
+	connectivities = list()
+	for individual in population:
+		grid = translate_gene_array(individual.gene, height, width)
+		inherited = getattr(individual, 'connectivity', None)
+		individual.connectivity = MapConnectivity.from_grid(grid) if inherited is None else inherited.update(grid)
+		connectivities.append(individual.connectivity)
+	return connectivities
+
+def evaluate_population(population, fitness_kwargs, workers=1, chunksize=None, cache=None, server=None, shared=None, incremental=False):
+	'''Evaluates every individual of a population with repair_and_test_map and assigns its fitness, its log
+	   (None when fitness_kwargs sets return_log to False) and the number of games behind its fitness, which
+	   varies when fitness_kwargs sets a racing threshold. With more than one worker the genes are sent to a
+	   process pool that stays warm for later calls with the same number of workers; chunksize defaults to an
+	   even split into four chunks per worker. With a FitnessCache, only genes whose repaired map and kwargs miss
+	   the cache are simulated, once per distinct key, and their results are added to the cache, unless the seed
+	   is a generator, which bypasses the cache. With a
+	   remoteEvaluation.EvaluationServer, genes are evaluated by its connected workers instead of locally. With a
+	   SharedPopulation, pool workers read the genes from its shared memory block and write their fitnesses back
+	   into it, so only row indices are pickled. With incremental, maps are labeled in the calling process by
+	   map_connectivities, so a mutant's map is labeled from its parent's, and the labeled maps are evaluated in
+	   place of the genes.
+
+	   Returns the list of fitnesses in population order.'''
+	height, width = fitness_kwargs['height'], fitness_kwargs['width']
+	if incremental:
+		assert shared is None, 'ERROR: A SHARED POPULATION HOLDS GENES, NOT LABELED MAPS'
+		genes = map_connectivities(population, height, width)
+	else:
+		genes = [individual.gene for individual in population]
+	if cache is not None and cache.cacheable(fitness_kwargs):
+		keys = [cache.key(repair_genotype(gene, height, width)[0], fitness_kwargs) for gene in genes]
+		first = dict() # index of the first gene with each key
+		for i, key in enumerate(keys):
+			first.setdefault(key, i)
+		cached = {key: cache.get(key) for key in first}
+		cache.hits += len(keys)-len(first) # repeated keys share one result
+		misses = [key for key, result in cached.items() if result is None]
+		evaluated = evaluate_genes(fitness_kwargs, [genes[first[key]] for key in misses], workers, chunksize, server, shared)
+		for key, result in zip(misses, evaluated):
+			cache.put(key, result)
+			cached[key] = result
+		results = [cached[key] for key in keys]
+	else:
+		results = evaluate_genes(fitness_kwargs, genes, workers, chunksize, server, shared)
+	fitnesses = list()
+	for individual, result in zip(population, results):
+		individual.fitness, individual.log, individual.games = result
+		fitnesses.append(individual.fitness)
+	return fitnesses
+
+def evaluate_genes(fitness_kwargs, genes, workers, chunksize, server=None, shared=None):
+	'''Evaluates genes with evaluate_gene serially, in a warm process pool or on the workers of a server.'''
+	if server is not None:
+		return server.map(fitness_kwargs, genes)
+	evaluate = functools.partial(evaluate_gene, fitness_kwargs)
+	if workers is None or workers > 1:
+		workers = workers or multiprocessing.cpu_count()
+		if chunksize is None:
+			chunksize = max(1, len(genes)//(4*workers))
+		if shared is not None:
+			shared.load(genes)
+			evaluate = functools.partial(evaluate_shared_gene, shared.name, shared.capacity, shared.length, fitness_kwargs)
+			logs = get_pool(workers).map(evaluate, range(len(genes)), chunksize)
+			fitnesses, games = shared.fitnesses[:len(genes)].tolist(), shared.games[:len(genes)].tolist()
+			return list(zip(fitnesses, logs, games))
+		results = get_pool(workers).map(evaluate, genes, chunksize)
+	else:
+		results = [evaluate(gene) for gene in genes]
+	return results
+
+def shared_arrays(buffer, capacity, length):
+	'''Returns the (capacity, length) gene, fitness and game count arrays laid out in a shared memory buffer.'''
+	offset = -(-capacity*length//8)*8 # keep the float array aligned
+	genes = np.ndarray((capacity, length), dtype=np.uint8, buffer=buffer)
+	fitnesses = np.ndarray(capacity, dtype=np.float64, buffer=buffer, offset=offset)
+	games = np.ndarray(capacity, dtype=np.int64, buffer=buffer, offset=offset+8*capacity)
+	return genes, fitnesses, games
+
+class SharedPopulation():
+	'''Shared memory block holding the genes of a population as uint8 rows next to a fitness and a game count per
+	   row. Pool workers attach to it once by name, so a generation sent through evaluate_population costs one row
+	   index per gene instead of a pickled gene list. The block grows when a larger population is loaded and is
+	   unlinked by close().'''
+	def __init__(self, length, capacity=1):
+		self.length = length
+		self.memory = None
+		self.allocate(capacity)
+
+	def allocate(self, capacity):
+		self.close()
+		self.capacity = capacity
+		offset = -(-capacity*self.length//8)*8
+		self.memory = shared_memory.SharedMemory(create=True, size=offset+16*capacity)
+		self.genes, self.fitnesses, self.games = shared_arrays(self.memory.buf, capacity, self.length)
+
+	@property
+	def name(self):
+		return self.memory.name
+
+	def load(self, genes):
+		'''Writes genes into the first rows of the block, growing it if needed, and clears their results.'''
+		if len(genes) > self.capacity:
+			self.allocate(max(len(genes), 2*self.capacity))
+		if len(genes):
+			self.genes[:len(genes)] = np.asarray(genes, dtype=np.uint8).reshape(len(genes), self.length)
+		self.fitnesses[:] = np.nan
+		self.games[:] = 0
+
+	def close(self):
+		if self.memory is not None:
+			self.genes = self.fitnesses = self.games = None
+			self.memory.close()
+			self.memory.unlink()
+			self.memory = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+# the shared memory block a pool worker is attached to
+attached = dict()
+
+def evaluate_shared_gene(name, capacity, length, fitness_kwargs, index):
+	'''Evaluates one row of a SharedPopulation in a worker and stores its fitness and game count in the block.
+	   Returns the log, which is None when it is not requested.'''
+	if attached.get('name') != name:
+		memory = attached.pop('memory', None)
+		attached.clear() # drop the array views before closing the old block
+		if memory is not None:
+			memory.close()
+		memory = shared_memory.SharedMemory(name=name)
+		attached.update(name=name, memory=memory, arrays=shared_arrays(memory.buf, capacity, length))
+	genes, fitnesses, games = attached['arrays']
+	fitnesses[index], log, games[index] = evaluate_gene(fitness_kwargs, genes[index])
+	return log
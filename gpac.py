@@ -1,27 +1,394 @@
+import copy
 import random
+from array import array
+from collections import deque
+from collections.abc import Mapping, Set
 
 GHOST_ACTIONS = {'up':(0,1), 'right':(1,0), 'down':(0,-1), 'left':(-1,0)}
 PAC_ACTIONS = {'hold':(0,0)}
 PAC_ACTIONS.update(GHOST_ACTIONS)
+OPPOSITE_ACTIONS = {'up':'down', 'right':'left', 'down':'up', 'left':'right', 'hold':'hold'}
+
+class CellPool():
+	'''Unordered collection of cells with O(1) insertion, removal and uniform random choice.'''
+	def __init__(self, cells=()):
+		self.cells = list(cells)
+		self.index = {cell: i for i, cell in enumerate(self.cells)}
+
+	def add(self, cell):
+		if cell not in self.index:
+			self.index[cell] = len(self.cells)
+			self.cells.append(cell)
+
+	def discard(self, cell):
+		i = self.index.pop(cell, None)
+		if i is not None:
+			last = self.cells.pop()
+			if i < len(self.cells):
+				# move the last cell into the vacated slot
+				self.cells[i] = last
+				self.index[last] = i
+
+	def choice(self, rng=random):
+		return rng.choice(self.cells)
+
+	def copy(self):
+		pool = CellPool.__new__(CellPool)
+		pool.cells = self.cells.copy()
+		pool.index = self.index.copy()
+		return pool
+
+	def __contains__(self, cell):
+		return cell in self.index
+
+	def __len__(self):
+		return len(self.cells)
+
+	def __iter__(self):
+		return iter(self.cells)
+
+class GameLog():
+	'''Compact world file log of a GPac game. Events are stored as (code, a, b) integer records and are only
+	   formatted into world file lines when the log is iterated, rendered or written.'''
+	WALLS, PILL, FRUIT, TIME = -1, -2, -3, -4
+
+	def __init__(self, width, height, player_names, walls):
+		self.width = width
+		self.height = height
+		self.player_names = player_names
+		self.walls = walls # shared by every log of the same map
+		self.records = array('i')
+		self.wall_blocks = 0
+
+	def record_player(self, index, x, y):
+		self.records.extend((index, x, y))
+
+	def record_walls(self):
+		self.records.extend((GameLog.WALLS, 0, 0))
+		self.wall_blocks += 1
+
+	def record_pill(self, x, y):
+		self.records.extend((GameLog.PILL, x, y))
+
+	def record_fruit(self, x, y):
+		self.records.extend((GameLog.FRUIT, x, y))
+
+	def record_time(self, time, score):
+		self.records.extend((GameLog.TIME, time, score))
+
+	def __iter__(self):
+		yield f'{self.width}'
+		yield f'{self.height}'
+		records = self.records
+		for i in range(0, len(records), 3):
+			code, a, b = records[i], records[i+1], records[i+2]
+			if code >= 0:
+				yield f'{self.player_names[code]} {a} {b}'
+			elif code == GameLog.TIME:
+				yield f't {a} {b}'
+			elif code == GameLog.PILL:
+				yield f'p {a} {b}'
+			elif code == GameLog.FRUIT:
+				yield f'f {a} {b}'
+			else:
+				for x, y in self.walls:
+					yield f'w {x} {y}'
+
+	def __len__(self):
+		return 2 + len(self.records)//3 + self.wall_blocks*(len(self.walls)-1)
+
+	def __eq__(self, other):
+		if isinstance(other, (GameLog, list)):
+			return list(self) == list(other)
+		return NotImplemented
+
+	def render(self):
+		'''Returns the log as a list of world file lines.'''
+		return list(self)
+
+	def write(self, file):
+		'''Writes the log in world file format to a path or an open text file.'''
+		if isinstance(file, str):
+			with open(file, 'w') as f:
+				self.write(f)
+		else:
+			for line in self:
+				file.write(f'{line}\n')
+
+class StreamLog():
+	'''Game log that formats each event as it happens and passes the line straight to a sink instead of keeping
+	   it. The sink is either an open text file (or any object with a write method) or a callable taking a line.'''
+	def __init__(self, width, height, player_names, walls, sink):
+		assert sink is not None, "ERROR: STREAMED LOGS REQUIRE A SINK"
+		self.player_names = player_names
+		self.walls = walls
+		if hasattr(sink, 'write'):
+			self.emit = lambda line: sink.write(f'{line}\n')
+		else:
+			self.emit = sink
+		self.lines = 0
+		self.emit(f'{width}')
+		self.emit(f'{height}')
+		self.lines += 2
+
+	def record_player(self, index, x, y):
+		self.emit(f'{self.player_names[index]} {x} {y}')
+		self.lines += 1
+
+	def record_walls(self):
+		for x, y in self.walls:
+			self.emit(f'w {x} {y}')
+		self.lines += len(self.walls)
+
+	def record_pill(self, x, y):
+		self.emit(f'p {x} {y}')
+		self.lines += 1
+
+	def record_fruit(self, x, y):
+		self.emit(f'f {x} {y}')
+		self.lines += 1
+
+	def record_time(self, time, score):
+		self.emit(f't {time} {score}')
+		self.lines += 1
+
+	def __len__(self):
+		return self.lines
+
+LOG_LEVELS = {'off', 'stream', 'memory'}
+
+def make_rng(seed=None):
+	'''Returns the random number generator for a seed: None gives the global random module, an int seeds a private
+	   random.Random, a random.Random is used as is and a NumPy Generator seeds a private random.Random from its
+	   stream.'''
+	if seed is None or seed is random:
+		return random
+	if isinstance(seed, random.Random):
+		return seed
+	if hasattr(seed, 'integers'): # NumPy Generator
+		return random.Random(int(seed.integers(2**63)))
+	return random.Random(seed)
+
+def game_rng(seed=None):
+	'''Returns the generator a game draws from: make_rng(seed), except that the global random module is replaced by
+	   a random.Random seeded once from its stream, so snapshot() and restore() only save and rewind the game's own
+	   random state.'''
+	rng = make_rng(seed)
+	return random.Random(random.getrandbits(64)) if rng is random else rng
+
+class SetView(Set):
+	'''Read-only view of a set that shares its storage.'''
+	def __init__(self, items):
+		self.items = items
+
+	def __contains__(self, item):
+		return item in self.items
+
+	def __iter__(self):
+		return iter(self.items)
+
+	def __len__(self):
+		return len(self.items)
+
+class PlayersView(Mapping):
+	'''Read-only view of a players dict with one player moved to a hypothetical location.'''
+	def __init__(self, players, player, location):
+		self.players = players
+		self.player = player
+		self.location = location
+
+	def __getitem__(self, player):
+		if player == self.player:
+			return self.location
+		return self.players[player]
+
+	def __iter__(self):
+		return iter(self.players)
+
+	def __len__(self):
+		return len(self.players)
+
+class StateView(Mapping):
+	'''Read-only observation with the keys 'walls', 'pills', 'fruit' and 'players'. The map and pills are shared
+	   with the game and only the hypothetical move of one player is overlaid, so an observation is only valid
+	   until the game next steps.'''
+	FIELDS = ('walls', 'pills', 'fruit', 'players')
+
+	def __init__(self, walls, pills, fruit, players):
+		self.walls = walls
+		self.pills = pills
+		self.fruit = fruit
+		self.players = players
+
+	def __getitem__(self, key):
+		if key not in StateView.FIELDS:
+			raise KeyError(key)
+		return getattr(self, key)
+
+	def __iter__(self):
+		return iter(StateView.FIELDS)
+
+	def __len__(self):
+		return len(StateView.FIELDS)
+
+class MapAnalysis():
+	'''Static analysis of a map shared by a game and its agents: the open cells, the legal actions and their
+	   destinations from every location, and shortest-path distances that are found by breadth-first search the
+	   first time a source is asked for and cached for the lifetime of the map.'''
+	UNREACHABLE = -1
+
+	def __init__(self, game_map):
+		self.map = game_map
+		self.width = len(game_map)
+		self.height = max([len(col) for col in game_map])
+		self.open_cells = [(x, y) for x in range(self.width) for y in range(len(game_map[x])) if game_map[x][y] == 0]
+		self.pac_action_table = dict()
+		self.ghost_action_table = dict()
+		self.pac_moves = dict()
+		self.ghost_moves = dict()
+		locations = {(x, y): (x, y) for x in range(self.width) for y in range(len(game_map[x]))}
+		for x, y in locations:
+			actions = [action for action, (x_shift, y_shift) in PAC_ACTIONS.items() if (x+x_shift, y+y_shift) in locations and game_map[x+x_shift][y+y_shift] == 0]
+			self.pac_action_table[(x, y)] = actions
+			self.ghost_action_table[(x, y)] = [action for action in actions if action in GHOST_ACTIONS]
+			# destination of every legal action, reusing one tuple per location
+			self.pac_moves[(x, y)] = {action: locations[(x+PAC_ACTIONS[action][0], y+PAC_ACTIONS[action][1])] for action in actions}
+			self.ghost_moves[(x, y)] = {action: self.pac_moves[(x, y)][action] for action in self.ghost_action_table[(x, y)]}
+		# (action, neighbor) pairs of every open location
+		self.neighbors = {location: tuple(self.ghost_moves[location].items()) for location in self.open_cells}
+		# neighboring cells of every cell indexed by x*height+y
+		self.adjacency = [()]*(self.width*self.height)
+		for (x, y), neighbors in self.neighbors.items():
+			self.adjacency[x*self.height+y] = tuple(x_next*self.height+y_next for _, (x_next, y_next) in neighbors)
+		self.distance_tables = dict()
+
+	def distances(self, source):
+		'''Returns a list indexed by x*height+y with the number of moves from source to every location, or
+		   UNREACHABLE for walls and cut-off cells.'''
+		table = self.distance_tables.get(source)
+		if table is None:
+			table = self.distance_tables[source] = self.distances_to((source,))
+		return table
+
+	def distances_to(self, ends):
+		'''Returns a list indexed by x*height+y with the number of moves from every location to the nearest of
+		   several ends, found by one multi-source breadth-first search and not cached.'''
+		height, adjacency = self.height, self.adjacency
+		table = [MapAnalysis.UNREACHABLE]*(self.width*height)
+		frontier = list()
+		for x, y in ends:
+			if table[x*height+y] == MapAnalysis.UNREACHABLE:
+				table[x*height+y] = 0
+				frontier.append(x*height+y)
+		distance = 0
+		while frontier:
+			# expand one whole layer at a time
+			distance += 1
+			layer = frontier
+			frontier = list()
+			for cell in layer:
+				for neighbor in adjacency[cell]:
+					if table[neighbor] == MapAnalysis.UNREACHABLE:
+						table[neighbor] = distance
+						frontier.append(neighbor)
+		return table
+
+	def distance(self, start, end):
+		return self.distances(start)[end[0]*self.height+end[1]]
+
+	def nearest(self, start, ends):
+		'''Returns the reachable end nearest to start, breaking ties by location, or None if none is reachable.'''
+		table, height = self.distances(start), self.height
+		nearest = None
+		for end in ends:
+			distance = table[end[0]*height+end[1]]
+			if distance != MapAnalysis.UNREACHABLE and (nearest is None or (distance, end) < nearest):
+				nearest = (distance, end)
+		return None if nearest is None else nearest[1]
+
+	def path(self, start, end):
+		'''Returns a deque of actions along a shortest path from start to end, or None if end is unreachable. The
+		   path follows the cached distance table of end if there is one and is otherwise traced back from end over
+		   the distance table of start, so a query costs at most one search.'''
+		height = self.height
+		path = deque()
+		if end in self.distance_tables:
+			table = self.distance_tables[end]
+			distance = table[start[0]*height+start[1]]
+			if distance == MapAnalysis.UNREACHABLE:
+				return None
+			location = start
+			while distance > 0:
+				distance -= 1
+				for action, (x, y) in self.neighbors[location]:
+					if table[x*height+y] == distance:
+						path.append(action)
+						location = (x, y)
+						break
+		else:
+			table = self.distances(start)
+			distance = table[end[0]*height+end[1]]
+			if distance == MapAnalysis.UNREACHABLE:
+				return None
+			location = end
+			while distance > 0:
+				distance -= 1
+				for action, (x, y) in self.neighbors[location]:
+					if table[x*height+y] == distance:
+						path.appendleft(OPPOSITE_ACTIONS[action])
+						location = (x, y)
+						break
+		return path
 
 class GPacGame():
-	def __init__(self, game_map, pill_density=0.1, fruit_prob=0.2, fruit_score=10, time_multiplier=2, num_ghosts=3, num_pacs=1, pill_spawn = 'stochastic', **kwargs):
+	# mutable state captured by snapshot(); containers in COPIED_STATE are copied while pills, fruit cells and the
+	# random generator are copied on write
+	SNAPSHOT_STATE = ('players', 'pills', 'fruit_cells', 'fruit_location', 'pills_consumed', 'fruit_consumed', 'time', 'score', 'bonus', 'gameover', 'graveyard', 'registered_actions')
+	COPIED_STATE = ('players', 'graveyard', 'registered_actions')
+
+	def __init__(self, game_map, pill_density=0.1, fruit_prob=0.2, fruit_score=10, time_multiplier=2, num_ghosts=3, num_pacs=1, pill_spawn = 'stochastic', log_level='memory', log_sink=None, validate=True, seed=None, analysis=None, **kwargs):
 		assert len(game_map) > 0 and min([len(col) for col in game_map]) > 0, "ERROR: MAP MUST BE 2 DIMENSIONAL"
 		self.map = game_map[:][:]
 		self.width = len(self.map)
 		self.height = max([len(col) for col in self.map])
+		# static index of the map: open cells and the legal actions from every cell, shared with agents
+		self.analysis = MapAnalysis(self.map) if analysis is None else analysis
+		self.open_cells = self.analysis.open_cells
+		self.pac_action_table = self.analysis.pac_action_table
+		self.ghost_action_table = self.analysis.ghost_action_table
+		self.pac_moves = self.analysis.pac_moves
+		self.ghost_moves = self.analysis.ghost_moves
 		self.players = {'m': ()}
 		for pac in range(num_pacs-1):
 			self.players[f'm{pac}'] =  ()
 		for ghost in range(num_ghosts):
 			self.players[f'{ghost}'] = ()
+		self.player_names = list(self.players)
+		# player roles are fixed for the lifetime of the game
+		self.pac_names = tuple(player for player in self.player_names if 'm' in player)
+		self.ghost_names = tuple(player for player in self.player_names if 'm' not in player)
+		self.is_pac = {player: player in self.pac_names for player in self.player_names}
+		self.walls = [(x, y) for x in range(self.width) for y in range(len(self.map[x])) if self.map[x][y] == 1]
 		self.pill_density = pill_density
 		self.fruit_prob = fruit_prob
 		self.fruit_score = fruit_score
 		self.time_multiplier = time_multiplier
 		self.pill_spawn = pill_spawn
+		assert log_level in LOG_LEVELS, f"ERROR: UNRECOGNIZED LOG LEVEL {log_level} BUT EXPECTED {LOG_LEVELS}"
+		self.log_level = log_level
+		self.log_sink = log_sink
+		self.validate = validate
+		self.rng = game_rng(seed)
+		self.pill_rng = None # separate generator for pill placement, self.rng if None
+		self.allocate_buffers()
 		self.reset()
 
+	def allocate_buffers(self):
+		'''Allocates the scratch buffers reused by every call to step().'''
+		self.old_locations = dict(self.players)
+		self.ghost_locations = [None for _ in self.ghost_names]
+		self.touched_pills = list()
+
 	def reset(self):
 		# spawn players
 		for player in self.players:
@@ -31,34 +398,23 @@ class GPacGame():
 				self.players[player] = (len(self.map)-1,0)
 		self.pills_consumed = 0
 		self.pills = set()
+		self.pills_shared = False
 
 		placement_strategies = {'stochastic', 'linear', 'manhattan'}
 		assert self.pill_spawn in placement_strategies, f"ERROR: UNRECOGNIZED PILL SPAWN STRATEGY {self.pill_spawn} BUT EXPECTED {placement_strategies}"
+		# skip spawning locations of pac-man and ghosts
+		forbidden_locations = set(self.players.values())
+		available_locations = [location for location in self.open_cells if location not in forbidden_locations]
 		# generate pill placement
+		rng = self.rng if self.pill_rng is None else self.pill_rng
 		if self.pill_spawn.casefold() == 'stochastic':
-			for x in range(len(self.map)):
-				for y in range(len(self.map[x])):
-					# skip spawning location of pac-man and ghosts
-					if (x,y) in self.players.values():
-						continue
-					if self.map[x][y] == 0 and random.random() <= self.pill_density:
-						self.pills.add((x,y))
+			for location in available_locations:
+				if rng.random() <= self.pill_density:
+					self.pills.add(location)
 			if len(self.pills) == 0: # failsafe logic to guarantee pill placement
-				forbidden_locations = {self.players[player] for player in self.players}
-				available_locations = list()
-				for x in range(len(self.map)):
-					for y in range(len(self.map[x])):
-						if self.map[x][y] == 0 and (x, y) not in forbidden_locations:
-							available_locations.append((x, y))
 				assert len(available_locations) > 0, "ERROR: NO VALID PILL LOCATIONS"
-				self.pills.add(random.choice(available_locations))
+				self.pills.add(rng.choice(available_locations))
 		elif self.pill_spawn.casefold() == 'linear' or self.pill_spawn.casefold() == 'manhattan':
-			forbidden_locations = {self.players[player] for player in self.players}
-			available_locations = list()
-			for x in range(len(self.map)):
-				for y in range(len(self.map[x])):
-					if self.map[x][y] == 0 and (x, y) not in forbidden_locations:
-						available_locations.append((x, y))
 			assert len(available_locations) > 0, "ERROR: NO VALID PILL LOCATIONS"
 			# TODO: finish deterministic pill generation algorithm
 			pill_freq = max(1,int(round(1/self.pill_density)))
@@ -68,6 +424,10 @@ class GPacGame():
 				if i%pill_freq==0:
 					self.pills.add(available_locations[i])
 
+		# cells where fruit may spawn, kept up to date as pills are eaten and pacs move
+		pac_locations = {self.players[player] for player in self.players if 'm' in player}
+		self.fruit_cells = CellPool(location for location in self.open_cells if location not in self.pills and location not in pac_locations)
+		self.fruit_cells_shared = False
 		self.fruit_consumed = 0
 		self.fruit_location = None
 		self.time = int(self.width*self.height*self.time_multiplier)
@@ -76,116 +436,164 @@ class GPacGame():
 		self.gameover = False
 		self.graveyard = set()
 		self.registered_actions = dict()
-		self.possible_actions = dict()
 
-		# initialize new world file log
-		self.log = [f'{self.width}', f'{self.height}']
-		for player, location in self.players.items():
-			self.log.append(f'{player} {location[0]} {location[1]}')
-		for x in range(len(self.map)):
-			for y in range(len(self.map[x])):
-				if self.map[x][y] == 1:
-					self.log.append(f'w {x} {y}')
-		for x, y in self.pills:
-			self.log.append(f'p {x} {y}')
-		self.log.append(f't {self.time} {self.score}')
+		self.start_log()
+
+	def start_log(self):
+		'''Initializes a new world file log for the configured log level: 'off' keeps no log (self.log is None),
+		   'stream' writes lines to self.log_sink as they happen and 'memory' keeps a GameLog.'''
+		if self.log_level == 'off':
+			self.log = None
+			return
+		elif self.log_level == 'stream':
+			self.log = StreamLog(self.width, self.height, self.player_names, self.walls, self.log_sink)
+		else:
+			self.log = GameLog(self.width, self.height, self.player_names, self.walls)
+		for index, (x, y) in enumerate(self.players.values()):
+			self.log.record_player(index, x, y)
+		self.log.record_walls()
+		for x, y in sorted(self.pills):
+			self.log.record_pill(x, y)
+		self.log.record_time(self.time, self.score)
 
 	def update_score(self):
 		self.score = int(100*self.pills_consumed/(self.pills_consumed+len(self.pills))) + self.bonus
 
 	def manage_fruit(self):
 		# check if fruit already exists and whether or not one should spawn this turn
-		if self.fruit_location == None and random.random() <= self.fruit_prob:
-			forbidden_locations = self.pills | {self.players[player] for player in self.players if 'm' in player}
-			available_locations = list()
-			for x in range(len(self.map)):
-				for y in range(len(self.map[x])):
-					if self.map[x][y] == 0 and (x, y) not in forbidden_locations:
-						available_locations.append((x, y))
-
-			if len(available_locations) == 0:
+		if self.fruit_location == None and self.rng.random() <= self.fruit_prob:
+			if len(self.fruit_cells) == 0:
 				self.fruit_location = None
 			else:
-				self.fruit_location = random.choice(available_locations)
+				self.fruit_location = self.fruit_cells.choice(self.rng)
 				# log spawn of fruit
-				self.log.append(f'f {self.fruit_location[0]} {self.fruit_location[1]}')
+				if self.log is not None:
+					self.log.record_fruit(*self.fruit_location)
 
 	def get_actions(self, player='m'):
-		if player not in self.possible_actions:
-			available_actions = list()
-			if 'm' in player:
-				candidate_actions = PAC_ACTIONS
-			else:
-				candidate_actions = GHOST_ACTIONS
-			current_location = self.players[player]
-			for action in candidate_actions:
-				x, y = current_location
-				x_shift, y_shift = PAC_ACTIONS[action]
-				if  0 <= x+x_shift < len(self.map) and 0 <= y+y_shift < len(self.map[x]) and self.map[x+x_shift][y+y_shift] == 0:
-					available_actions.append(action)
-			self.possible_actions[player] = available_actions
+		if 'm' in player:
+			return self.pac_action_table[self.players[player]]
+		return self.ghost_action_table[self.players[player]]
 
-		return self.possible_actions[player]
+	def observed_pills(self):
+		return SetView(self.pills)
 
 	def get_observations(self, actions, player='m'):
+		'''Returns a read-only StateView of the game for each candidate action of a player.'''
 		observations = list()
-		current_location = self.players[player]
-		fruit_copy = self.fruit_location
+		x, y = self.players[player]
+		pills = self.observed_pills()
 		for action in actions:
-			x, y = current_location
 			x_shift, y_shift = PAC_ACTIONS[action]
-			x, y = x+x_shift, y+y_shift
-			state = {'walls': self.map[:][:], 'pills':list(self.pills), 'fruit':fruit_copy, 'players':self.players.copy()}
-			state['players'][player] = (x, y)
-			observations.append(state)
-		return observations 
+			observations.append(StateView(self.map, pills, self.fruit_location, PlayersView(self.players, player, (x+x_shift, y+y_shift))))
+		return observations
 
 	def register_action(self, action, player='m'):
 		self.registered_actions[player] = action
 
+	@property
+	def rng(self):
+		'''The game's random generator. A generator shared with a snapshot or fork is copied on first use, so
+		   whoever draws first leaves the shared state untouched.'''
+		if self.rng_shared:
+			rng = random.Random(0) # seeding explicitly avoids reading os.urandom
+			rng.setstate(self.shared_rng.getstate())
+			self.shared_rng, self.rng_shared = rng, False
+		return self.shared_rng
+
+	@rng.setter
+	def rng(self, rng):
+		self.shared_rng, self.rng_shared = rng, False
+
+	def share_state(self):
+		'''Marks the pills, fruit cells and random generator as shared, so the game copies them before changing them.'''
+		self.pills_shared = self.fruit_cells_shared = self.rng_shared = True
+
+	def snapshot(self):
+		'''Captures the mutable state of the game (positions, pills, fruit, time, score, graveyard, pending actions
+		   and random state) for restore(). The map is shared and pills, fruit cells and the random generator are
+		   copied on write. The log is not captured.'''
+		self.share_state()
+		state = {key: getattr(self, key) for key in self.SNAPSHOT_STATE}
+		for key in self.COPIED_STATE:
+			state[key] = state[key].copy()
+		state['rng'] = self.shared_rng
+		return state
+
+	def restore(self, snapshot):
+		'''Returns the game to a state captured by snapshot(). A snapshot may be restored any number of times.'''
+		for key in self.SNAPSHOT_STATE:
+			setattr(self, key, snapshot[key])
+		for key in self.COPIED_STATE:
+			setattr(self, key, snapshot[key].copy())
+		self.shared_rng = snapshot['rng']
+		self.share_state()
+
+	def fork(self):
+		'''Returns an independent copy of the game for lookahead. The copy shares the map and static tables, shares
+		   pills, fruit cells and the random state until either game changes them, so it draws the same numbers the
+		   game would, and keeps no log.'''
+		self.share_state()
+		game = copy.copy(self)
+		for key in self.COPIED_STATE:
+			setattr(game, key, getattr(self, key).copy())
+		game.log_level = 'off'
+		game.log = None
+		game.allocate_buffers()
+		return game
+
 	def step(self):
 		self.time -= 1
-		old_locations = self.players.copy()
-		touched_pills = set()
+		players = self.players
+		old_locations = self.old_locations
+		old_locations.update(players)
+		touched_pills = self.touched_pills
+		touched_pills.clear()
 		touched_fruit = False
-		
+
 		# update player locations from registered actions
 		for player, action in self.registered_actions.items():
 			if player in self.graveyard:
 				continue # skip deceased pacs
-			assert action in self.get_actions(player=player), f'ERROR: INVALID ACTION ({action}) FOR PLAYER {player}'
-			x, y = self.players[player]
-			if 'm' in player:
-				x_shift, y_shift = PAC_ACTIONS[action]
-				self.players[player] = pac = (x+x_shift, y+y_shift)
-				if pac in self.pills:
-					touched_pills.add(pac)
+			if self.is_pac[player]:
+				moves = self.pac_moves[players[player]]
+				if self.validate:
+					assert action in moves, f'ERROR: INVALID ACTION ({action}) FOR PLAYER {player}'
+				players[player] = pac = moves[action]
+				if pac in self.pills and pac not in touched_pills:
+					touched_pills.append(pac)
 				touched_fruit = pac == self.fruit_location
 			else:
-				x_shift, y_shift = GHOST_ACTIONS[action]
-				self.players[player] = (x+x_shift, y+y_shift)
+				moves = self.ghost_moves[players[player]]
+				if self.validate:
+					assert action in moves, f'ERROR: INVALID ACTION ({action}) FOR PLAYER {player}'
+				players[player] = moves[action]
 		self.registered_actions.clear()
-		self.possible_actions.clear()
 
 		# detect collsions between pacs and ghosts
-		pacs = {player for player in self.players if 'm' in player}
-		ghosts = [player for player in self.players if player not in pacs]
-		for pac in pacs:
+		ghost_locations = self.ghost_locations
+		for i, ghost in enumerate(self.ghost_names):
+			ghost_locations[i] = players[ghost]
+		for pac in self.pac_names:
 			if pac in self.graveyard:
 				continue
 			# detect direct collision
-			if self.players[pac] in {self.players[ghost] for ghost in ghosts}:
+			location = players[pac]
+			if location in ghost_locations:
 				self.graveyard.add(pac)
 				continue
 			# detect collsion via trading locations
-			for ghost in ghosts:
-				if self.players[pac] == old_locations[ghost] and old_locations[pac] == self.players[ghost]:
+			for ghost in self.ghost_names:
+				if location == old_locations[ghost] and old_locations[pac] == players[ghost]:
 					self.graveyard.add(pac)
-		
-		if self.graveyard == pacs:
+
+		if len(self.graveyard) == len(self.pac_names):
 			self.gameover = True
 		else:
 			if touched_pills:
+				if self.pills_shared:
+					self.pills = set(self.pills)
+					self.pills_shared = False
 				for pill in touched_pills:
 					self.pills_consumed += 1
 					self.pills.remove(pill)
@@ -201,12 +609,314 @@ class GPacGame():
 				self.update_score()
 			elif self.time <= 0:
 				self.gameover = True
-			
+
+		# update cells available to fruit from pac movement
+		for pac in self.pac_names:
+			location, old_location = players[pac], old_locations[pac]
+			if location != old_location:
+				if self.fruit_cells_shared:
+					self.fruit_cells = self.fruit_cells.copy()
+					self.fruit_cells_shared = False
+				self.fruit_cells.discard(location)
+				if old_location not in self.pills:
+					for other in self.pac_names:
+						if players[other] == old_location:
+							break
+					else:
+						self.fruit_cells.add(old_location)
+
+		# update log
+		if self.log is not None:
+			for index, (x, y) in enumerate(players.values()):
+				self.log.record_player(index, x, y)
+		self.manage_fruit() # do things with fruit
+		if self.log is not None:
+			self.log.record_time(self.time, self.score)
+
+class PillView():
+	'''Read-only, set-like view of the pills of an ArrayGPacGame as (x, y) tuples.'''
+	def __init__(self, game):
+		self.game = game
+		self._locations = None
+
+	def invalidate(self):
+		self._locations = None
+
+	def __len__(self):
+		return self.game.num_pills
+
+	def __contains__(self, location):
+		x, y = location
+		game = self.game
+		return 0 <= x < game.width and 0 <= y < game.height and game.pill_grid[x*game.height+y] == 1
+
+	def __iter__(self):
+		if self._locations is None:
+			grid, height = self.game.pill_grid, self.game.height
+			locations = list()
+			cell = grid.find(1)
+			while cell != -1:
+				locations.append(divmod(cell, height))
+				cell = grid.find(1, cell+1)
+			self._locations = locations
+		return iter(self._locations)
+
+	def __or__(self, other):
+		return set(self) | set(other)
+
+	def __repr__(self):
+		return f'PillView({set(self)})'
+
+class ArrayGPacGame(GPacGame):
+	'''Array-backed variant of GPacGame. Walls and pills are held in flat bytearrays indexed by x*height+y and
+	   players are tracked as integer cell indices. The players dict, pills and fruit_location are kept as
+	   read-only mirrors so agents written against GPacGame work unchanged.'''
+	SNAPSHOT_STATE = ('players', 'cells', 'pill_grid', 'num_pills', 'fruit_cells', 'fruit_cell', 'fruit_location', 'pills_consumed', 'fruit_consumed', 'time', 'score', 'bonus', 'gameover', 'graveyard', 'registered_actions')
+	COPIED_STATE = ('players', 'cells', 'graveyard', 'registered_actions')
+	def __init__(self, game_map, pill_density=0.1, fruit_prob=0.2, fruit_score=10, time_multiplier=2, num_ghosts=3, num_pacs=1, pill_spawn = 'stochastic', log_level='memory', log_sink=None, validate=True, seed=None, analysis=None, **kwargs):
+		assert len(game_map) > 0 and min([len(col) for col in game_map]) > 0, "ERROR: MAP MUST BE 2 DIMENSIONAL"
+		self.map = game_map[:][:]
+		self.width = len(self.map)
+		self.height = max([len(col) for col in self.map])
+		# location-based analysis shared with agents
+		self.analysis = MapAnalysis(self.map) if analysis is None else analysis
+		# cells missing from ragged maps are treated as walls
+		self.wall_grid = bytearray(b'\x01'*(self.width*self.height))
+		for x in range(self.width):
+			for y in range(len(self.map[x])):
+				self.wall_grid[x*self.height+y] = self.map[x][y]
+		# static index of the map: open cells and the legal actions from every cell
+		self.open_cells = [cell for cell in range(len(self.wall_grid)) if self.wall_grid[cell] == 0]
+		self.shifts = {action: x_shift*self.height+y_shift for action, (x_shift, y_shift) in PAC_ACTIONS.items()}
+		self.locations = [divmod(cell, self.height) for cell in range(len(self.wall_grid))]
+		self.pac_action_table = list()
+		self.ghost_action_table = list()
+		self.pac_moves = list()
+		self.ghost_moves = list()
+		for cell, (x, y) in enumerate(self.locations):
+			actions = [action for action, (x_shift, y_shift) in PAC_ACTIONS.items() if 0 <= x+x_shift < self.width and 0 <= y+y_shift < self.height and self.wall_grid[cell+self.shifts[action]] == 0]
+			self.pac_action_table.append(actions)
+			self.ghost_action_table.append([action for action in actions if action in GHOST_ACTIONS])
+			# destination cell of every legal action
+			self.pac_moves.append({action: cell+self.shifts[action] for action in actions})
+			self.ghost_moves.append({action: cell+self.shifts[action] for action in self.ghost_action_table[-1]})
+		self.pill_grid = bytearray(len(self.wall_grid))
+		self.num_pills = 0
+		self.pills = PillView(self)
+
+		self.player_names = ['m']
+		for pac in range(num_pacs-1):
+			self.player_names.append(f'm{pac}')
+		for ghost in range(num_ghosts):
+			self.player_names.append(f'{ghost}')
+		self.player_index = {player: index for index, player in enumerate(self.player_names)}
+		self.walls = [(x, y) for x in range(len(self.map)) for y in range(len(self.map[x])) if self.map[x][y] == 1]
+		# player roles are fixed for the lifetime of the game
+		self.pac_indices = [index for index, player in enumerate(self.player_names) if 'm' in player]
+		self.ghost_indices = [index for index, player in enumerate(self.player_names) if 'm' not in player]
+		self.pac_names = tuple(self.player_names[index] for index in self.pac_indices)
+		self.ghost_names = tuple(self.player_names[index] for index in self.ghost_indices)
+		self.is_pac = {player: player in self.pac_names for player in self.player_names}
+		self.cells = [0 for _ in self.player_names]
+		self.players = {player: () for player in self.player_names}
+
+		self.pill_density = pill_density
+		self.fruit_prob = fruit_prob
+		self.fruit_score = fruit_score
+		self.time_multiplier = time_multiplier
+		self.pill_spawn = pill_spawn
+		assert log_level in LOG_LEVELS, f"ERROR: UNRECOGNIZED LOG LEVEL {log_level} BUT EXPECTED {LOG_LEVELS}"
+		self.log_level = log_level
+		self.log_sink = log_sink
+		self.validate = validate
+		self.rng = game_rng(seed)
+		self.pill_rng = None # separate generator for pill placement, self.rng if None
+		self.allocate_buffers()
+		self.reset()
+
+	def location(self, cell):
+		return self.locations[cell]
+
+	def allocate_buffers(self):
+		self.old_cells = self.cells.copy()
+		self.ghost_cells = [0 for _ in self.ghost_indices]
+		self.touched_pills = list()
+
+	def observed_pills(self):
+		return self.pills
+
+	def restore(self, snapshot):
+		super().restore(snapshot)
+		self.pills.invalidate()
+
+	def fork(self):
+		game = super().fork()
+		game.pills = PillView(game)
+		return game
+
+	def reset(self):
+		# spawn players
+		pac_spawn = len(self.map[0])-1
+		ghost_spawn = (len(self.map)-1)*self.height
+		for index in range(len(self.cells)):
+			self.cells[index] = pac_spawn if index in self.pac_indices else ghost_spawn
+			self.players[self.player_names[index]] = self.location(self.cells[index])
+		self.pills_consumed = 0
+		self.pill_grid = bytearray(len(self.wall_grid))
+		self.pills_shared = False
+		self.pills.invalidate()
+
+		placement_strategies = {'stochastic', 'linear', 'manhattan'}
+		assert self.pill_spawn in placement_strategies, f"ERROR: UNRECOGNIZED PILL SPAWN STRATEGY {self.pill_spawn} BUT EXPECTED {placement_strategies}"
+		forbidden_cells = set(self.cells)
+		available_cells = [cell for cell in self.open_cells if cell not in forbidden_cells]
+		# generate pill placement
+		rng = self.rng if self.pill_rng is None else self.pill_rng
+		if self.pill_spawn.casefold() == 'stochastic':
+			for cell in available_cells:
+				if rng.random() <= self.pill_density:
+					self.pill_grid[cell] = 1
+			if self.pill_grid.find(1) == -1: # failsafe logic to guarantee pill placement
+				assert len(available_cells) > 0, "ERROR: NO VALID PILL LOCATIONS"
+				self.pill_grid[rng.choice(available_cells)] = 1
+		elif self.pill_spawn.casefold() == 'linear' or self.pill_spawn.casefold() == 'manhattan':
+			assert len(available_cells) > 0, "ERROR: NO VALID PILL LOCATIONS"
+			pill_freq = max(1,int(round(1/self.pill_density)))
+			if self.pill_spawn.casefold() == 'manhattan':
+				available_cells = sorted(available_cells, key=lambda cell: sum(self.location(cell)))
+			for i in range(0, len(available_cells), pill_freq):
+				self.pill_grid[available_cells[i]] = 1
+		self.num_pills = self.pill_grid.count(1)
+
+		# cells where fruit may spawn, kept up to date as pills are eaten and pacs move
+		pac_cells = {self.cells[index] for index in self.pac_indices}
+		self.fruit_cells = CellPool(cell for cell in self.open_cells if self.pill_grid[cell] == 0 and cell not in pac_cells)
+		self.fruit_cells_shared = False
+		self.fruit_consumed = 0
+		self.fruit_cell = -1
+		self.fruit_location = None
+		self.time = int(self.width*self.height*self.time_multiplier)
+		self.score = 0
+		self.bonus = 0
+		self.gameover = False
+		self.graveyard = set()
+		self.registered_actions = dict()
+
+		self.start_log()
+
+	def update_score(self):
+		self.score = int(100*self.pills_consumed/(self.pills_consumed+self.num_pills)) + self.bonus
+
+	def manage_fruit(self):
+		# check if fruit already exists and whether or not one should spawn this turn
+		if self.fruit_cell == -1 and self.rng.random() <= self.fruit_prob:
+			if len(self.fruit_cells) > 0:
+				self.fruit_cell = self.fruit_cells.choice(self.rng)
+				self.fruit_location = self.location(self.fruit_cell)
+				# log spawn of fruit
+				if self.log is not None:
+					self.log.record_fruit(*self.fruit_location)
+
+	def get_actions(self, player='m'):
+		if 'm' in player:
+			return self.pac_action_table[self.cells[self.player_index[player]]]
+		return self.ghost_action_table[self.cells[self.player_index[player]]]
+
+	def step(self):
+		self.time -= 1
+		cells = self.cells
+		old_cells = self.old_cells
+		old_cells[:] = cells
+		touched_pills = self.touched_pills
+		touched_pills.clear()
+		touched_fruit = False
+
+		# update player locations from registered actions
+		for player, action in self.registered_actions.items():
+			if player in self.graveyard:
+				continue # skip deceased pacs
+			index = self.player_index[player]
+			if self.is_pac[player]:
+				moves = self.pac_moves[cells[index]]
+				if self.validate:
+					assert action in moves, f'ERROR: INVALID ACTION ({action}) FOR PLAYER {player}'
+				cells[index] = cell = moves[action]
+				if self.pill_grid[cell] == 1 and cell not in touched_pills:
+					touched_pills.append(cell)
+				touched_fruit = cell == self.fruit_cell
+			else:
+				moves = self.ghost_moves[cells[index]]
+				if self.validate:
+					assert action in moves, f'ERROR: INVALID ACTION ({action}) FOR PLAYER {player}'
+				cells[index] = cell = moves[action]
+			self.players[player] = self.locations[cell]
+		self.registered_actions.clear()
+
+		# detect collsions between pacs and ghosts
+		ghost_cells = self.ghost_cells
+		for i, ghost in enumerate(self.ghost_indices):
+			ghost_cells[i] = cells[ghost]
+		for pac in self.pac_indices:
+			player = self.player_names[pac]
+			if player in self.graveyard:
+				continue
+			# detect direct collision
+			if cells[pac] in ghost_cells:
+				self.graveyard.add(player)
+				continue
+			# detect collsion via trading locations
+			for ghost in self.ghost_indices:
+				if cells[pac] == old_cells[ghost] and old_cells[pac] == cells[ghost]:
+					self.graveyard.add(player)
+
+		if len(self.graveyard) == len(self.pac_indices):
+			self.gameover = True
+		else:
+			if touched_pills:
+				if self.pills_shared:
+					self.pill_grid = bytearray(self.pill_grid)
+					self.pills_shared = False
+				for cell in touched_pills:
+					self.pills_consumed += 1
+					self.pill_grid[cell] = 0
+				self.num_pills -= len(touched_pills)
+				self.pills.invalidate()
+				self.update_score()
+			if touched_fruit:
+				self.fruit_consumed += 1
+				self.fruit_cell = -1
+				self.fruit_location = None
+				self.bonus += self.fruit_score
+				self.update_score()
+			if self.num_pills == 0:
+				self.gameover = True
+				self.bonus += int(100*self.time/int(self.width*self.height*self.time_multiplier))
+				self.update_score()
+			elif self.time <= 0:
+				self.gameover = True
+
+		# update cells available to fruit from pac movement
+		for pac in self.pac_indices:
+			cell, old_cell = cells[pac], old_cells[pac]
+			if cell != old_cell:
+				if self.fruit_cells_shared:
+					self.fruit_cells = self.fruit_cells.copy()
+					self.fruit_cells_shared = False
+				self.fruit_cells.discard(cell)
+				if self.pill_grid[old_cell] == 0:
+					for other in self.pac_indices:
+						if cells[other] == old_cell:
+							break
+					else:
+						self.fruit_cells.add(old_cell)
+
 		# update log
-		for player, location in self.players.items():
-			self.log.append(f'{player} {location[0]} {location[1]}')
+		if self.log is not None:
+			for index, (x, y) in enumerate(self.players.values()):
+				self.log.record_player(index, x, y)
 		self.manage_fruit() # do things with fruit
-		self.log.append(f't {self.time} {self.score}')
+		if self.log is not None:
+			self.log.record_time(self.time, self.score)
 
 # test game with random agents if you run this file
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+'''Island model EA with one process per island.
+
+Each island is a generational EA with its own configuration, e.g. its own parent and survival selection, that
+evolves and evaluates its population independently. Every migration_interval generations the best individuals of
+each island migrate along a ring or to randomly chosen islands and join the destination population through its
+survival selection. Islands only synchronize at migrations, so K islands keep K cores busy.'''
+import multiprocessing
+import random
+import time
+
+import fitness
+from baseEvolution import baseEvolutionPopulation, evolve_generation
+
+def best_individuals(population, n):
+	return sorted(population, key=lambda individual: individual.fitness, reverse=True)[:n]
+
+def run_island(connection, ea_class, ea_kwargs, fitness_kwargs, seed):
+	'''Island process. Answers every ('evolve', generations, immigrants, migrants) message with its emigrants,
+	   statistics and best individual, and a ('stop',) message with its final population.'''
+	if seed is not None:
+		random.seed(seed)
+	start = time.perf_counter()
+	ea = ea_class(**ea_kwargs)
+	fitness.evaluate_population(ea.population, fitness_kwargs, incremental=getattr(ea, 'incremental_repair', False))
+	ea.evaluations = len(ea.population)
+	compute_seconds = time.perf_counter()-start
+	while True:
+		message = connection.recv()
+		if message[0] == 'stop':
+			connection.send(ea.population)
+			return
+		_, generations, immigrants, migrants = message
+		start = time.perf_counter()
+		if immigrants:
+			ea.population += immigrants
+			ea.survival()
+		for _ in range(generations):
+			evolve_generation(ea, fitness_kwargs)
+		compute_seconds += time.perf_counter()-start
+		fitnesses = [individual.fitness for individual in ea.population]
+		statistics = {'evaluations': ea.evaluations, 'compute_seconds': compute_seconds, 'best': max(fitnesses), 'mean': sum(fitnesses)/len(fitnesses)}
+		connection.send((best_individuals(ea.population, migrants), statistics, best_individuals(ea.population, 1)[0]))
+
+class islandModelEvolution():
+	'''Runs one island per entry of island_configs, each a dict of keyword arguments for ea_class as in
+	   `ea_class(**config['EA_configs'], **config)`. Every migration_interval generations the migrants best
+	   individuals of each island are sent to the next island of a ring, or to another island chosen at random
+	   with the 'random' topology. With a seed, island i and the random topology are seeded from it so a run is
+	   reproducible.'''
+	def __init__(self, island_configs, fitness_kwargs, migration_interval=5, migrants=2, topology='ring', ea_class=baseEvolutionPopulation, seed=None):
+		assert topology in {'ring', 'random'}, f'ERROR: UNKNOWN TOPOLOGY {topology}'
+		self.migration_interval = migration_interval
+		self.migrants = migrants
+		self.topology = topology
+		self.rng = random.Random(seed)
+		self.fitness_kwargs = dict(fitness_kwargs, return_log=False)
+		self.statistics = [None for _ in island_configs]
+		self.bests = [None for _ in island_configs]
+		self.migration_seconds = 0.0
+		self.wall_seconds = 0.0
+		self.populations = None
+		self.connections = list()
+		self.processes = list()
+		for i, ea_kwargs in enumerate(island_configs):
+			connection, island_connection = multiprocessing.Pipe()
+			process = multiprocessing.Process(target=run_island, args=(island_connection, ea_class, ea_kwargs, self.fitness_kwargs, None if seed is None else seed+i), daemon=True)
+			process.start()
+			island_connection.close() # so a crashed island shows up as EOFError instead of a hang
+			self.connections.append(connection)
+			self.processes.append(process)
+		self.emigrants = [list() for _ in island_configs]
+
+	def destinations(self):
+		'''Returns the island each island sends its migrants to.'''
+		islands = len(self.connections)
+		if islands == 1:
+			return [0]
+		if self.topology == 'ring':
+			return [(i+1)%islands for i in range(islands)]
+		return [self.rng.choice([j for j in range(islands) if j != i]) for i in range(islands)]
+
+	def run(self, generations):
+		'''Evolves every island for generations more generations with a migration every migration_interval
+		   generations. Returns the best individual found on any island.'''
+		start = time.perf_counter()
+		while generations > 0:
+			epoch = min(generations, self.migration_interval)
+			immigrants = [list() for _ in self.connections]
+			if len(self.connections) > 1:
+				for i, destination in enumerate(self.destinations()):
+					immigrants[destination] += self.emigrants[i]
+			epoch_start = time.perf_counter()
+			compute = [statistics['compute_seconds'] if statistics else 0.0 for statistics in self.statistics]
+			try:
+				for connection, arrivals in zip(self.connections, immigrants):
+					connection.send(('evolve', epoch, arrivals, self.migrants))
+				for i, connection in enumerate(self.connections):
+					self.emigrants[i], self.statistics[i], self.bests[i] = connection.recv()
+			except (OSError, EOFError) as error:
+				raise RuntimeError('ERROR: AN ISLAND PROCESS EXITED, SEE ITS TRACEBACK ABOVE') from error
+			# the epoch took as long as its slowest island plus the cost of moving migrants and statistics
+			slowest = max(statistics['compute_seconds']-before for statistics, before in zip(self.statistics, compute))
+			self.migration_seconds += max(0.0, time.perf_counter()-epoch_start-slowest)
+			generations -= epoch
+		self.wall_seconds += time.perf_counter()-start
+		return max(self.bests, key=lambda individual: individual.fitness)
+
+	def report(self):
+		'''Returns the evaluations, compute time, throughput and best and mean fitness of every island, together with
+		   the total wall time of run() and the part of it spent migrating and synchronizing.'''
+		islands = list()
+		for statistics in self.statistics:
+			island = dict(statistics)
+			island['evaluations_per_second'] = statistics['evaluations']/statistics['compute_seconds'] if statistics['compute_seconds'] else 0.0
+			islands.append(island)
+		return {'islands': islands, 'wall_seconds': self.wall_seconds, 'migration_seconds': self.migration_seconds}
+
+	def close(self):
+		'''Stops the islands and keeps their final populations in self.populations.'''
+		if self.processes:
+			try:
+				for connection in self.connections:
+					connection.send(('stop',))
+				self.populations = [connection.recv() for connection in self.connections]
+			except (OSError, EOFError):
+				for process in self.processes:
+					process.terminate()
+			for process in self.processes:
+				process.join()
+			self.processes = list()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
@@ -0,0 +1,212 @@
+'''Population stored as one (size, length) uint8 gene matrix with one fitness per row.
+
+Recombination and mutation of a whole generation are a handful of NumPy operations on the matrix instead of one
+object per child. matrixIndividual objects are views of single rows that behave like binaryGenotype individuals,
+so selection functions, evaluate_population and per-individual code keep working unchanged.'''
+import random
+
+import numpy as np
+
+def make_generator():
+	'''Returns a NumPy generator drawn from the global random module, so seeding random seeds the batch operators.'''
+	return np.random.default_rng(random.getrandbits(64))
+
+def distinct_pairs(rng, n, high):
+	'''Returns n sorted pairs (low, high) of distinct integers from range(high+1).'''
+	first = rng.integers(0, high+1, n)
+	second = rng.integers(0, high, n)
+	second += second >= first
+	return np.minimum(first, second), np.maximum(first, second)
+
+def random_bits(rng, shape):
+	'''Returns a uint8 array of the given shape filled with fair random bits.'''
+	size = int(np.prod(shape))
+	return np.unpackbits(np.frombuffer(rng.bytes(-(-size//8)), dtype=np.uint8), count=size).reshape(shape)
+
+def crossover_masks(rng, n, length, method, **kwargs):
+	'''Returns an (n, length) uint8 array that is 1 where a child takes its locus from its first parent.'''
+	assert method.casefold() in {'uniform', '1-point crossover', 'multi-dimensional'}
+	if method.casefold() == 'uniform':
+		return random_bits(rng, (n, length))
+	loci = np.arange(length, dtype=np.min_scalar_type(length))
+	if method.casefold() == '1-point crossover':
+		points = rng.integers(1, length, n).astype(loci.dtype)
+		return (loci < points[:, None]).view(np.uint8)
+	# a random rectangle of the 2D map comes from the first parent
+	height, width = kwargs['height'], kwargs['width']
+	top, bottom = distinct_pairs(rng, n, height)
+	left, right = distinct_pairs(rng, n, width)
+	rows, columns = np.divmod(loci, width)
+	return ((rows >= top[:, None]) & (rows < bottom[:, None]) & (columns >= left[:, None]) & (columns < right[:, None])).view(np.uint8)
+
+def mutation_masks(rng, n, length, mutation_rate=None):
+	'''Returns an (n, length) uint8 array that is 1 at the loci to flip, each with probability mutation_rate. The
+	   number of flips is drawn first and only their positions are sampled. By default the rate is 1/length and rows
+	   that would flip nothing flip one uniformly chosen locus, as binaryGenotype.mutate does.'''
+	rate = 1/length if mutation_rate is None else min(max(mutation_rate, 0.0), 1.0)
+	flips = np.zeros(n*length, dtype=np.uint8)
+	flips[rng.choice(n*length, rng.binomial(n*length, rate), replace=False, shuffle=False)] = 1
+	flips = flips.reshape(n, length)
+	if mutation_rate is None:
+		unchanged = np.flatnonzero(~flips.any(axis=1))
+		flips[unchanged, rng.integers(0, length, len(unchanged))] = 1
+	return flips
+
+class matrixIndividual():
+	'''View of one row of a populationMatrix with the attributes and operators of a binaryGenotype individual.'''
+	__slots__ = ('population', 'index')
+
+	def __init__(self, population, index):
+		self.population = population
+		self.index = index
+
+	@property
+	def gene(self):
+		return self.population.genes[self.index]
+
+	@gene.setter
+	def gene(self, gene):
+		self.population.genes[self.index] = gene
+
+	@property
+	def fitness(self):
+		fitness = self.population.fitnesses[self.index]
+		return None if np.isnan(fitness) else fitness.item()
+
+	@fitness.setter
+	def fitness(self, fitness):
+		self.population.fitnesses[self.index] = np.nan if fitness is None else fitness
+
+	@property
+	def log(self):
+		return self.population.logs[self.index]
+
+	@log.setter
+	def log(self, log):
+		self.population.logs[self.index] = log
+
+	@property
+	def connectivity(self):
+		return self.population.connectivities[self.index]
+
+	@connectivity.setter
+	def connectivity(self, connectivity):
+		self.population.connectivities[self.index] = connectivity
+
+	@property
+	def games(self):
+		return self.population.games[self.index]
+
+	@games.setter
+	def games(self, games):
+		self.population.games[self.index] = games
+
+	def __eq__(self, other):
+		return isinstance(other, matrixIndividual) and self.population is other.population and self.index == other.index
+
+	def __hash__(self):
+		return hash((id(self.population), self.index))
+
+	def __reduce__(self):
+		# pickle the row alone rather than the whole population it belongs to
+		return populationMatrix.__getitem__, (self.population.take([self.index]), 0)
+
+	def recombine(self, mate, method, **kwargs):
+		pair = populationMatrix(np.stack((self.gene, mate.gene)), connectivities=(self.connectivity, mate.connectivity))
+		return pair.recombine([0], [1], method, **kwargs)[0]
+
+	def mutate(self, **kwargs):
+		copy = populationMatrix(self.gene[None, :].copy(), connectivities=(self.connectivity,))
+		copy.mutate(1.0, **kwargs)
+		return copy[0]
+
+	@classmethod
+	def initialization(cls, mu, length):
+		return populationMatrix.initialization(mu, length)
+
+class populationMatrix():
+	'''Sequence of matrixIndividual views over a (size, length) uint8 gene matrix, a float fitness array (NaN
+	   where unevaluated), an int game count array, a list of logs and a list of the fitness.MapConnectivity of
+	   each row's map or of its nearest ancestor's (None if unknown), as binaryGenotype keeps.'''
+	def __init__(self, genes, fitnesses=None, games=None, logs=None, connectivities=None):
+		self.genes = np.ascontiguousarray(genes, dtype=np.uint8)
+		size = len(self.genes)
+		self.fitnesses = np.full(size, np.nan) if fitnesses is None else np.asarray(fitnesses, dtype=np.float64)
+		self.games = np.zeros(size, dtype=np.int64) if games is None else np.asarray(games, dtype=np.int64)
+		self.logs = [None for _ in range(size)] if logs is None else list(logs)
+		self.connectivities = [None for _ in range(size)] if connectivities is None else list(connectivities)
+
+	@classmethod
+	def initialization(cls, mu, length):
+		return cls(make_generator().integers(0, 2, (mu, length), dtype=np.uint8))
+
+	def __len__(self):
+		return len(self.genes)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [matrixIndividual(self, i) for i in range(len(self))[index]]
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError('population index out of range')
+		return matrixIndividual(self, index)
+
+	def __iter__(self):
+		return (matrixIndividual(self, i) for i in range(len(self)))
+
+	def take(self, indices):
+		'''Returns a new population of the given rows, in order and with repeats.'''
+		indices = np.asarray(indices, dtype=np.intp)
+		return populationMatrix(self.genes[indices], self.fitnesses[indices], self.games[indices], [self.logs[i] for i in indices.tolist()],
+								[self.connectivities[i] for i in indices.tolist()])
+
+	def indices(self, individuals):
+		'''Returns the row indices of views of this population.'''
+		return np.fromiter((individual.index for individual in individuals), dtype=np.intp, count=len(individuals))
+
+	@classmethod
+	def gather(cls, individuals):
+		'''Builds a population from views that may belong to different populations.'''
+		if isinstance(individuals, populationMatrix):
+			return individuals
+		sources = {id(individual.population): individual.population for individual in individuals}
+		if len(sources) == 1:
+			source, = sources.values()
+			return source.take(source.indices(individuals))
+		return cls.concatenate([individual.population.take([individual.index]) for individual in individuals])
+
+	@classmethod
+	def concatenate(cls, populations):
+		populations = list(populations)
+		return cls(np.concatenate([population.genes for population in populations]), np.concatenate([population.fitnesses for population in populations]),
+				   np.concatenate([population.games for population in populations]), [log for population in populations for log in population.logs],
+				   [connectivity for population in populations for connectivity in population.connectivities])
+
+	def __add__(self, other):
+		return populationMatrix.concatenate((self, populationMatrix.gather(other)))
+
+	def recombine(self, mothers, fathers, method, **kwargs):
+		'''Returns the population of children of each (mothers[i], fathers[i]) pair of row indices, recombined with
+		   the method and kwargs binaryGenotype.recombine takes. Each child inherits the connectivity of the parent
+		   it differs from least.'''
+		mothers, fathers = np.asarray(mothers, dtype=np.intp), np.asarray(fathers, dtype=np.intp)
+		masks = crossover_masks(make_generator(), len(mothers), self.genes.shape[1], method, **kwargs)
+		differences = self.genes[mothers] ^ self.genes[fathers]
+		# loci are 0 or 1, so this picks the mother's locus where the mask is 1
+		children = populationMatrix(self.genes[fathers] ^ (differences & masks))
+		# a child differs from its mother where the parents differ outside the mask
+		from_mother = np.count_nonzero(differences & (masks ^ 1), axis=1)
+		nearest = np.where(2*from_mother <= np.count_nonzero(differences, axis=1), mothers, fathers)
+		children.connectivities = [self.connectivities[i] for i in nearest.tolist()]
+		return children
+
+	def mutate(self, rate, mutation_rate=None, **kwargs):
+		'''Mutates each row in place with probability rate, flipping loci as binaryGenotype.mutate does with the
+		   per-locus mutation_rate. Mutated rows keep their connectivity, now their parent's. Returns the indices of
+		   the mutated rows.'''
+		rng = make_generator()
+		rows = np.flatnonzero(rng.random(len(self)) < rate)
+		self.genes[rows] ^= mutation_masks(rng, len(rows), self.genes.shape[1], mutation_rate)
+		self.fitnesses[rows] = np.nan
+		return rows
@@ -0,0 +1,207 @@
+'''Fitness evaluation spread over machines with a small TCP protocol.
+
+An EvaluationServer runs next to the EA and hands out batches of genes, together with the fitness kwargs, to any
+number of workers started with `python remoteEvaluation.py HOST PORT` on other machines. Workers reconnect when
+the connection drops and the server puts the batches of workers that die or time out back in the queue, so every
+gene is evaluated exactly once per call whatever happens to individual workers. An exception raised by the
+evaluation itself is sent back instead and re-raised by the server, since every worker would fail the same way.
+Messages are length-prefixed
+pickles, so only run the protocol between trusted machines.'''
+import argparse
+import pickle
+import queue
+import socket
+import struct
+import threading
+import time
+import traceback
+
+import fitness
+
+HEADER = struct.Struct('!Q')
+
+def send_message(connection, message):
+	data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+	connection.sendall(HEADER.pack(len(data))+data)
+
+def receive_exactly(connection, size):
+	data = bytearray()
+	while len(data) < size:
+		chunk = connection.recv(size-len(data))
+		if not chunk:
+			raise EOFError('connection closed')
+		data += chunk
+	return bytes(data)
+
+def receive_message(connection):
+	size, = HEADER.unpack(receive_exactly(connection, HEADER.size))
+	return pickle.loads(receive_exactly(connection, size))
+
+class RemoteTraceback(Exception):
+	'''Traceback of an exception raised on a worker, attached as the cause of the exception map() re-raises.'''
+	def __str__(self):
+		return self.args[0]
+
+def error_message(error):
+	'''Returns the message reporting an evaluation error, replacing an exception that cannot be pickled.'''
+	try:
+		pickle.dumps(error)
+	except Exception:
+		error = RuntimeError(repr(error))
+	return ('error', error, traceback.format_exc())
+
+class EvaluationServer():
+	'''Serves evaluation batches to remote workers. map() blocks until every gene has a result and may be called
+	   repeatedly; workers may join or leave at any time. A batch that is not answered within timeout seconds (if
+	   given) is resubmitted and its worker dropped.'''
+	def __init__(self, host='localhost', port=0, batch_size=4, timeout=None):
+		self.batch_size = batch_size
+		self.timeout = timeout
+		self.listener = socket.create_server((host, port))
+		self.host, self.port = self.listener.getsockname()[:2]
+		self.tasks = queue.Queue()
+		self.lock = threading.Lock() # one map() at a time
+		self.finished = threading.Condition()
+		self.closed = threading.Event()
+		self.workers = 0
+		self.resubmitted = 0
+		self.calls = 0 # tasks are tagged with their map() call so leftovers of a failed call are dropped
+		self.current = (0, None, None)
+		self.error = None
+		threading.Thread(target=self.accept, daemon=True).start()
+
+	def accept(self):
+		while not self.closed.is_set():
+			try:
+				connection, _ = self.listener.accept()
+			except OSError:
+				return # listener closed
+			threading.Thread(target=self.serve, args=(connection,), daemon=True).start()
+
+	def serve(self, connection):
+		'''Feeds batches to one worker until the server closes or the worker fails.'''
+		connection.settimeout(self.timeout)
+		with self.finished:
+			self.workers += 1
+		try:
+			while True:
+				tasks = self.next_batch()
+				if tasks is None:
+					send_message(connection, ('stop',))
+					return
+				with self.finished:
+					call, fitness_kwargs, results = self.current
+				batch = [(index, gene) for task_call, index, gene in tasks if task_call == call]
+				if not batch:
+					continue
+				try:
+					send_message(connection, ('evaluate', fitness_kwargs, batch))
+					answer = receive_message(connection)
+				except (OSError, EOFError, pickle.UnpicklingError):
+					# the worker died or hung, so its batch goes back in the queue
+					for index, gene in batch:
+						self.tasks.put((call, index, gene))
+					with self.finished:
+						self.resubmitted += len(batch)
+					return
+				with self.finished:
+					if self.current[0] != call:
+						continue
+					if answer[0] == 'error':
+						self.error = answer[1:]
+					else:
+						for index, result in answer[1]:
+							results[index] = result
+						self.remaining -= len(answer[1])
+					self.finished.notify_all()
+		except OSError:
+			pass
+		finally:
+			with self.finished:
+				self.workers -= 1
+			connection.close()
+
+	def next_batch(self):
+		'''Waits for work and returns up to batch_size (index, gene) tasks, or None once the server is closed.'''
+		while not self.closed.is_set():
+			try:
+				batch = [self.tasks.get(timeout=0.1)]
+			except queue.Empty:
+				continue
+			while len(batch) < self.batch_size:
+				try:
+					batch.append(self.tasks.get_nowait())
+				except queue.Empty:
+					break
+			return batch
+		return None
+
+	def map(self, fitness_kwargs, genes):
+		'''Evaluates genes with fitness.evaluate_gene on the connected workers.
+
+		   Returns a list with the (fitness, log, games) result of every gene in order. If evaluating a gene raises
+		   on a worker, the exception is re-raised here with the worker's traceback as its cause and the rest of
+		   the call is abandoned.'''
+		with self.lock:
+			results = [None for _ in genes]
+			with self.finished:
+				self.calls += 1
+				self.current = (self.calls, fitness_kwargs, results)
+				self.remaining = len(genes)
+				self.error = None
+			for index, gene in enumerate(genes):
+				self.tasks.put((self.calls, index, gene))
+			with self.finished:
+				while self.remaining > 0 and self.error is None:
+					if self.closed.is_set():
+						raise RuntimeError('ERROR: SERVER CLOSED DURING EVALUATION')
+					self.finished.wait(0.1)
+				if self.error is not None:
+					error, remote_traceback = self.error
+					self.current = (0, None, None)
+					raise error from RemoteTraceback(remote_traceback)
+			return results
+
+	def close(self):
+		'''Stops accepting workers and tells connected workers to exit.'''
+		self.closed.set()
+		self.listener.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+def run_worker(host, port, retry_delay=1.0, retries=None):
+	'''Evaluates batches from the server at host:port until it says stop. Lost or refused connections are retried
+	   every retry_delay seconds, giving up after retries consecutive failures (never if None).'''
+	failures = 0
+	while True:
+		try:
+			with socket.create_connection((host, port)) as connection:
+				failures = 0
+				while True:
+					message = receive_message(connection)
+					if message[0] == 'stop':
+						return
+					_, fitness_kwargs, batch = message
+					try:
+						answer = ('results', [(index, fitness.evaluate_gene(fitness_kwargs, gene)) for index, gene in batch])
+					except Exception as error:
+						answer = error_message(error)
+					send_message(connection, answer)
+		except (OSError, EOFError):
+			failures += 1
+			if retries is not None and failures > retries:
+				raise
+			time.sleep(retry_delay)
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Run a remote fitness evaluation worker.')
+	parser.add_argument('host')
+	parser.add_argument('port', type=int)
+	parser.add_argument('--retry-delay', type=float, default=1.0)
+	parser.add_argument('--retries', type=int, default=None)
+	args = parser.parse_args()
+	run_worker(args.host, args.port, args.retry_delay, args.retries)
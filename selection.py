@@ -1,30 +1,131 @@
+import numpy as np
+
+from populationMatrix import make_generator, matrixIndividual, populationMatrix
+
+# Selection functions work on a list of individuals (or a populationMatrix) and
+# return the selected individuals. Each has an *_indices counterpart that works
+# on an array of fitnesses and returns an array of selected indices, which
+# costs a few NumPy operations however large the population is.
+
+def fitness_array(population):
+	'''returns the fitnesses of a population as a float array, with NaN for unevaluated individuals'''
+	if isinstance(population, populationMatrix):
+		return population.fitnesses
+	return np.array([individual.fitness for individual in population], dtype=np.float64)
+
+def pick(population, indices):
+	'''returns the individuals of a population at an array of indices'''
+	if isinstance(population, populationMatrix):
+		return [matrixIndividual(population, i) for i in indices.tolist()]
+	return [population[i] for i in indices.tolist()]
+
+def proportional_weights(fitnesses):
+	'''returns the fitnesses as selection weights, with their sum. Positive fitnesses are used as they are; otherwise
+	   they are shifted so every weight is positive and the worst individual can still be selected, by subtracting
+	   1.5 times a negative minimum (leaving it half its magnitude) or adding 1 to a minimum of 0'''
+	lowest = fitnesses.min()
+	weights = fitnesses if lowest > 0 else fitnesses-lowest+(0.5*abs(lowest) or 1.0)
+	return weights, weights.sum()
+
+def random_subsets(rng, n, size, k):
+	'''returns an (n, k) array whose rows are uniformly random k-subsets of range(size), drawn with Floyd's
+	   algorithm one column at a time'''
+	chosen = np.empty((n, k), dtype=np.intp)
+	for column, j in enumerate(range(size-k, size)):
+		draws = rng.integers(0, j+1, n)
+		taken = (chosen[:, :column] == draws[:, None]).any(axis=1)
+		chosen[:, column] = np.where(taken, j, draws)
+	return chosen
+
+def tournament_winners(fitnesses, contestants):
+	'''returns the fittest contestant of each row'''
+	return contestants[np.arange(len(contestants)), fitnesses[contestants].argmax(axis=1)]
+
 # Parent selection functions---------------------------------------------------
+def uniform_random_selection_indices(fitnesses, n, **kwargs):
+	return make_generator().integers(0, len(fitnesses), n)
+
 def uniform_random_selection(population, n, **kwargs):
-	# TODO: select n individuals uniform randomly
-	pass
+	return pick(population, uniform_random_selection_indices(fitness_array(population), n))
+
+def k_tournament_with_replacement_indices(fitnesses, n, k, **kwargs):
+	if not 1 <= k <= len(fitnesses):
+		raise ValueError(f'ERROR: TOURNAMENT SIZE {k} DOES NOT FIT A POPULATION OF {len(fitnesses)}')
+	return tournament_winners(fitnesses, random_subsets(make_generator(), n, len(fitnesses), k))
 
-def k_tournament_with_replacement(population, n, **kwargs):
-	# TODO: perform n k-tournaments with replacement to select n individuals
-	pass
+def k_tournament_with_replacement(population, n, k, **kwargs):
+	return pick(population, k_tournament_with_replacement_indices(fitness_array(population), n, k))
+
+def fitness_proportionate_selection_indices(fitnesses, n, **kwargs):
+	weights, total = proportional_weights(fitnesses)
+	spins = make_generator().random(n)*total
+	return np.minimum(np.cumsum(weights).searchsorted(spins, side='right'), len(fitnesses)-1)
 
 def fitness_proportionate_selection(population, n, **kwargs):
-	# TODO: select n individuals using fitness proportionate selection
-	pass
+	return pick(population, fitness_proportionate_selection_indices(fitness_array(population), n))
 
 
 # Survival selection functions-------------------------------------------------
+def truncation_indices(fitnesses, n, **kwargs):
+	best = np.argpartition(-fitnesses, n-1)[:n] if n < len(fitnesses) else np.arange(len(fitnesses))
+	return best[np.argsort(-fitnesses[best], kind='stable')]
+
 def truncation(population, n, **kwargs):
-	# TODO: perform truncation selection to select n individuals
-	pass
+	return pick(population, truncation_indices(fitness_array(population), n))
 
-def k_tournament_without_replacement(population, n, **kwargs):
-	# TODO: perform n k-tournaments without replacement to select n individuals
-	#		Note: an individual should never be cloned from surviving twice!
-	pass
+def k_tournament_without_replacement_indices(fitnesses, n, k, **kwargs):
+	'''Runs n k-tournaments in turn, each among k distinct individuals that have not won yet. Tournaments are drawn
+	   in batches and the leading run of tournaments that include no earlier winner of the batch is kept, which
+	   gives exactly the distribution of drawing them one at a time.'''
+	if not 1 <= k <= len(fitnesses)-n+1:
+		raise ValueError(f'ERROR: {n} TOURNAMENTS OF SIZE {k} DO NOT FIT A POPULATION OF {len(fitnesses)}')
+	rng = make_generator()
+	pool = np.arange(len(fitnesses)) # individuals that have not won are pool[:size]
+	size = len(fitnesses)
+	winners = np.empty(n, dtype=np.intp)
+	selected = 0
+	batch = int(np.sqrt(size))+8 # about the number of tournaments before the first conflict
+	while selected < n:
+		positions = random_subsets(rng, min(batch, n-selected), size, k)
+		contestants = pool[positions]
+		rows = np.arange(len(contestants))
+		best = fitnesses[contestants].argmax(axis=1)
+		batch_winners = contestants[rows, best]
+		# keep the tournaments before the first one with a contestant that won an earlier tournament of the batch
+		individuals, first_win = np.unique(batch_winners, return_index=True)
+		found = np.minimum(individuals.searchsorted(contestants), len(individuals)-1)
+		earlier = (individuals[found] == contestants) & (first_win[found] < rows[:, None])
+		conflicts = np.flatnonzero(earlier.any(axis=1))
+		kept = conflicts[0] if len(conflicts) else len(contestants)
+		winners[selected:selected+kept] = batch_winners[:kept]
+		selected += kept
+		# drop the kept winners from the pool by moving surviving individuals from its tail into their places
+		holes = positions[rows[:kept], best[:kept]]
+		size -= kept
+		vacated = np.ones(kept, dtype=bool)
+		vacated[holes[holes >= size]-size] = False
+		pool[holes[holes < size]] = pool[size+np.flatnonzero(vacated)]
+		batch = 2*kept+8
+	return winners
+
+def k_tournament_without_replacement(population, n, k, **kwargs):
+	return pick(population, k_tournament_without_replacement_indices(fitness_array(population), n, k))
 
 # Yellow deliverable parent selection function---------------------------------
+def stochastic_universal_sampling_indices(fitnesses, n, **kwargs):
+	weights, total = proportional_weights(fitnesses)
+	pointers = (make_generator().random()+np.arange(n))*(total/n)
+	return np.minimum(np.cumsum(weights).searchsorted(pointers, side='right'), len(fitnesses)-1)
+
 def stochastic_universal_sampling(population, n, **kwargs):
-	# Recall that yellow deliverables are required for students in the grad
-	# section but bonus for those in the undergrad section.
-	# TODO: select n individuals using stochastic universal sampling
-	pass
+	return pick(population, stochastic_universal_sampling_indices(fitness_array(population), n))
+
+# the index counterpart of each selection function
+index_selections = {
+	uniform_random_selection: uniform_random_selection_indices,
+	k_tournament_with_replacement: k_tournament_with_replacement_indices,
+	fitness_proportionate_selection: fitness_proportionate_selection_indices,
+	truncation: truncation_indices,
+	k_tournament_without_replacement: k_tournament_without_replacement_indices,
+	stochastic_universal_sampling: stochastic_universal_sampling_indices,
+}
@@ -7,12 +7,14 @@ import random
 
 
 class shortestPathPillAgent():
-	def __init__(self):
+	def __init__(self, rng=None):
+		'''rng: random number generator used to break ties between paths, or a seed for one (see gpac.make_rng).'''
 		self.pre_planned_actions = deque()
+		self.rng = gpac.make_rng(rng)
 
 	def select_action(self, game):
 		if len(self.pre_planned_actions) == 0:
-			self.pre_planned_actions = path_to_pill_a_star('m', game)
+			self.pre_planned_actions = path_to_pill_a_star('m', game, rng=self.rng)
 
 		return self.pre_planned_actions.popleft()
 
@@ -22,21 +24,24 @@ class shortestPathFruitAgent(shortestPathPillAgent):
 			self.pre_planned_actions = path_to_fruit_a_star('m', game)
 		return super().select_action(game)
 
-def path_to_pill(player, game):
+def path_to_pill(player, game, rng=random):
 	'''Search for the shortest path to the nearest pill using BFGS'''
 	if len(game.pills) == 0:
 		return ['hold']
 	visited = set()
 	frontier = deque()
 	frontier.append((game.players[player], deque()))
-	possible_actions = list(gpac.GHOST_ACTIONS.items())
+	possible_actions = list(gpac.GHOST_ACTIONS)
+	moves = game.analysis.ghost_moves
 	while frontier:
 		base_loc, base_actions = frontier.popleft()
-		for action, shift in random.sample(possible_actions, len(possible_actions)):
+		for action in rng.sample(possible_actions, len(possible_actions)):
+			if action not in moves[base_loc]:
+				continue
 			actions = base_actions.copy()
 			actions.append(action)
-			x, y = base_loc[0]+shift[0], base_loc[1]+shift[1]
-			if 0 <= x < len(game.map) and 0 <= y < len(game.map[x]) and game.map[x][y]==0 and (x,y) not in visited:
+			x, y = moves[base_loc][action]
+			if (x,y) not in visited:
 				if (x,y) in game.pills:
 					return actions
 				else:
@@ -44,21 +49,24 @@ def path_to_pill(player, game):
 					visited.add((x,y))
 	return ['hold'] # failsafe case
 
-def path_to_fruit(player, game):
+def path_to_fruit(player, game, rng=random):
 	'''Search for the shortest path to the fruit using BFGS'''	
 	if game.fruit_location == None:
 		return ['hold']
 	visited = set()
 	frontier = deque()
 	frontier.append((game.players[player], deque()))
-	possible_actions = list(gpac.GHOST_ACTIONS.items())
+	possible_actions = list(gpac.GHOST_ACTIONS)
+	moves = game.analysis.ghost_moves
 	while frontier:
 		base_loc, base_actions = frontier.popleft()
-		for action, shift in random.sample(possible_actions, len(possible_actions)):
+		for action in rng.sample(possible_actions, len(possible_actions)):
+			if action not in moves[base_loc]:
+				continue
 			actions = base_actions.copy()
 			actions.append(action)
-			x, y = base_loc[0]+shift[0], base_loc[1]+shift[1]
-			if 0 <= x < len(game.map) and 0 <= y < len(game.map[x]) and game.map[x][y]==0 and (x,y) not in visited:
+			x, y = moves[base_loc][action]
+			if (x,y) not in visited:
 				if (x,y) == game.fruit_location:
 					return actions
 				else:
@@ -70,21 +78,24 @@ def path_to_fruit(player, game):
 # Sean's code past here
 class RandomGhostAgent:
 	"""A ghost that acts randomly."""
-	def __init__(self):
-		pass
+	def __init__(self, rng=None):
+		"""rng: random number generator for the ghost's moves, or a seed for one (see gpac.make_rng)."""
+		self.rng = gpac.make_rng(rng)
 
 	def select_action(self, game: gpac.GPacGame, player: str) -> str:
 		"""player: the string identifier for this agent in the GPac game."""
-		return random.choice(game.get_actions(player))
+		return self.rng.choice(game.get_actions(player))
 
 
 class ChasingGhostAgent:
 	"""A ghost that efficiently follows Pac-man, with minor randomness to prevent ghosts from bunching up too much.
 	TODO: Does not work for multiple Pac-mans."""
-	def __init__(self, path_staleness_ratio=5, random_wander_chance=0.25):
+	def __init__(self, path_staleness_ratio=5, random_wander_chance=0.25, rng=None):
 		"""path_staleness_ratio: With a path_staleness_ratio of 5, Pac-man can be distance 1 away from the path target
 			for each 5 distance of remaining path before the path must be recalculated.
-		random_wander_chance: Probability of the ghost making a random move when it has no path, to break up ghosts."""
+		random_wander_chance: Probability of the ghost making a random move when it has no path, to break up ghosts.
+		rng: Random number generator for wandering, or a seed for one (see gpac.make_rng)."""
+		self.rng = gpac.make_rng(rng)
 
 		self.path_staleness_ratio = path_staleness_ratio
 		self.random_wander_chance = random_wander_chance
@@ -94,10 +105,10 @@ class ChasingGhostAgent:
 	def select_action(self, game: gpac.GPacGame, player: str) -> str:
 		"""player: the string identifier for this agent in the GPac game."""
 		if self.path_target is None or len(self.pre_planned_actions) == 0 or self.path_staleness_check(game):
-			if random.random() < self.random_wander_chance:
+			if self.rng.random() < self.random_wander_chance:
 				self.path_target = None
 				self.pre_planned_actions = None
-				return random.choice(game.get_actions(player))
+				return self.rng.choice(game.get_actions(player))
 			else:
 				self.pre_planned_actions = path_to_pacman(player, game)
 				self.path_target = game.players['m']
@@ -119,12 +130,13 @@ class ChasingGhostAgent:
 class AvoidingPacmanAgent(shortestPathFruitAgent):
 	"""A Pac-man agent that will avoid being within a certain radius of ghosts."""
 
-	def __init__(self, avoidance_radius=3, maximum_path_age=10, fruit_factor=4):
+	def __init__(self, avoidance_radius=3, maximum_path_age=10, fruit_factor=4, rng=None):
 		"""avoidance_radius: The distance where Pac-man will consider itself too close to a ghost.
 		maximum_path_age: The maximum time a path can be followed before it's recalculated
-		fruit_factor: The extra length that Pac-man will travel to collect fruit."""
+		fruit_factor: The extra length that Pac-man will travel to collect fruit.
+		rng: Random number generator used to break ties between paths, or a seed for one (see gpac.make_rng)."""
 
-		super().__init__()
+		super().__init__(rng)
 		self.avoidance_radius = avoidance_radius
 		self.maximum_path_age = maximum_path_age
 		self.fruit_factor = fruit_factor
@@ -139,7 +151,7 @@ class AvoidingPacmanAgent(shortestPathFruitAgent):
 			self.pre_planned_actions = deque()
 		if game.fruit_location is not None and len(self.pre_planned_actions) == 0:
 			fruit_path = path_to_fruit_a_star('m', game, ghost_proximity_cost_function)
-			pill_path = path_to_pill_a_star('m', game, ghost_proximity_cost_function)
+			pill_path = path_to_pill_a_star('m', game, ghost_proximity_cost_function, self.rng)
 			if fruit_path[0] == 'hold':
 				self.pre_planned_actions = pill_path
 			elif pill_path[0] == 'hold':
@@ -150,7 +162,7 @@ class AvoidingPacmanAgent(shortestPathFruitAgent):
 				self.pre_planned_actions = pill_path
 			self.path_timestamp = game.time
 		elif len(self.pre_planned_actions) == 0:
-			self.pre_planned_actions = path_to_pill_a_star('m', game, ghost_proximity_cost_function)
+			self.pre_planned_actions = path_to_pill_a_star('m', game, ghost_proximity_cost_function, self.rng)
 			self.path_timestamp = game.time
 		return self.pre_planned_actions.popleft()
 
@@ -206,8 +218,15 @@ class ExtremePathCostException(Exception):
 def path_to_points(start: Tuple[int, int], ends: Sequence[Tuple[int, int]], game: gpac.GPacGame,
 				   cost_function=identity_cost_function) -> deque:
 	"""Calculates a path to the nearest end point of a set using A*.
-	Tends to outperform BFS out to at least 30 endpoints."""
-	possible_actions = list(gpac.GHOST_ACTIONS.items())
+	Tends to outperform BFS out to at least 30 endpoints.
+	Unweighted paths are read from the cached distance tables of the game's MapAnalysis instead."""
+	analysis = game.analysis
+	if cost_function is identity_cost_function:
+		end = analysis.nearest(start, [end for end in ends if end != start]) # like A*, never target the start
+		if end is None:
+			raise ExtremePathCostException("No path to target!")
+		return analysis.path(start, end)
+	neighbors = analysis.neighbors
 	frontier = [(nearest_manhattan_distance(start, ends), start)]  # Min-heap sorted by estimated distance to end (F in A*)
 	path_distance = {start: 0}  # G in A*
 	path_previous = dict()  # Previous node on path
@@ -218,9 +237,8 @@ def path_to_points(start: Tuple[int, int], ends: Sequence[Tuple[int, int]], game
 			raise ExtremePathCostException("No safe path to target!")
 
 		removed_current = False
-		for action, direction in possible_actions:
-			neighbor = current[0] + direction[0], current[1] + direction[1]
-			if neighbor not in path_distance and is_open(neighbor, game):
+		for action, neighbor in neighbors[current]:
+			if neighbor not in path_distance:
 				path_previous[neighbor] = current, action
 
 				if neighbor in ends:  # Shortest path found!
@@ -250,10 +268,10 @@ def path_to_point(start: Tuple[int, int], end: Tuple[int, int], game: gpac.GPacG
 	return path_to_points(start, (end,), game, cost_function)
 
 
-def path_to_pill_a_star(player: str, game: gpac.GPacGame, cost_function=identity_cost_function) -> deque:
+def path_to_pill_a_star(player: str, game: gpac.GPacGame, cost_function=identity_cost_function, rng=random) -> deque:
 	"""Search for the shortest path to the nearest pill using A*."""
 	if len(game.pills) > 30:
-		return path_to_pill(player, game)  # Too many pills, might be better to use BFS
+		return path_to_pill(player, game, rng)  # Too many pills, might be better to use BFS
 
 	try:
 		return path_to_points(game.players[player], game.pills, game, cost_function)
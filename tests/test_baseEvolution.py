@@ -37,4 +37,35 @@ class TestChildGeneration:
 			copies = copy.deepcopy(ea.population)
 			children = ea.generate_children()
 			for i in range(len(copies)):
-				assert same_object(ea.population[i], copies[i])
\ No newline at end of file
+				assert same_object(ea.population[i], copies[i])
+
+class TestAsyncSteadyState:
+	def make_ea(self, mu, workers, **kwargs):
+		fitness_kwargs = {'height': 6, 'width': 7, 'samples': 1, 'pill_spawn': 'linear', 'pill_density': 0.2, 'return_log': False}
+		return evo.asyncSteadyStateEvolution(bitString, mu, 1, 0.5, random_parents, best_survivors, initialization_kwargs={'length': 42}, fitness_kwargs=fitness_kwargs, workers=workers, **kwargs)
+
+	#the evaluation budget is spent exactly and the population keeps its size
+	@pytest.mark.parametrize('workers', [1, 2, None])
+	def test_budget(self, workers):
+		ea = self.make_ea(5, workers)
+		population = ea.run(30)
+		assert ea.evaluations == 30
+		assert len(population) == 5
+		assert all(individual.fitness is not None for individual in population)
+
+	#survivors never get worse under elitist survival
+	def test_elitist(self):
+		ea = self.make_ea(4, 2)
+		ea.run(4)
+		best = max(individual.fitness for individual in ea.population)
+		ea.run(20)
+		assert ea.evaluations == 20
+		assert max(individual.fitness for individual in ea.population) >= best
+
+	#with incremental repair children are evaluated from their labeled maps
+	@pytest.mark.parametrize('workers', [1, 2])
+	def test_incremental_repair(self, workers):
+		ea = self.make_ea(5, workers, incremental_repair=True)
+		population = ea.run(20)
+		assert ea.evaluations == 20
+		assert all(individual.fitness is not None and individual.connectivity is not None for individual in population)
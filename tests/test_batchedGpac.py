@@ -0,0 +1,105 @@
+import random, pytest, os, sys, inspect
+import numpy as np
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+import gpac
+import batchedGpac as bg
+from fitness import repair_map, translate_gene, batch_repair_and_test_maps
+
+height = 20
+width = 35
+num_maps = 8
+
+def random_maps(seed, count=num_maps):
+	rng = random.Random(seed)
+	return [repair_map(translate_gene([1 if rng.random() < 0.3 else 0 for _ in range(height*width)], height, width))[0] for _ in range(count)]
+
+def scripted_choice(game_index, time, player, num_actions):
+	'''deterministic stand-in for a random agent so both simulators can be driven identically'''
+	return random.Random(game_index*1000003+int(time)*31+player).randrange(num_actions)
+
+class TestBatchedGame:
+	#lockstep games follow the same rules as GPacGame when driven by the same actions
+	@pytest.mark.parametrize('pill_spawn', ['linear', 'manhattan'])
+	def test_matches_gpac(self, pill_spawn):
+		maps = random_maps(pill_spawn == 'linear')
+		expected = list()
+		for game_index, game_map in enumerate(maps):
+			game = gpac.GPacGame(game_map, pill_spawn=pill_spawn, pill_density=0.05, fruit_prob=0, num_pacs=2)
+			while not game.gameover:
+				for i, player in enumerate(game.players):
+					actions = game.get_actions(player)
+					game.register_action(actions[scripted_choice(game_index, game.time, i, len(actions))], player)
+				game.step()
+			expected.append((game.score, game.time))
+
+		batch = bg.BatchedGPacGame(maps, pill_spawn=pill_spawn, pill_density=0.05, fruit_prob=0, num_pacs=2)
+		while not batch.gameover.all():
+			legal = batch.legal_actions()
+			actions = np.zeros(legal.shape[:2], dtype=np.int64)
+			for game_index in range(batch.num_games):
+				for i in range(legal.shape[1]):
+					indices = np.flatnonzero(legal[game_index, i])
+					actions[game_index, i] = indices[scripted_choice(game_index, batch.time[game_index], i, len(indices))]
+			batch.step(actions)
+		assert [(int(score), int(time)) for score, time in zip(batch.score, batch.time)] == expected
+
+	#fruit only spawns on open cells without pills or pacs
+	def test_fruit_placement(self):
+		batch = bg.BatchedGPacGame(random_maps(0), fruit_prob=1, seed=0)
+		spawned = 0
+		while not batch.gameover.all():
+			actions = np.concatenate((bg.random_pac_actions(batch, batch.rng), bg.random_ghost_actions(batch, batch.rng)), axis=1)
+			batch.step(actions)
+			for game_index in np.flatnonzero(batch.fruit >= 0):
+				fruit = batch.fruit[game_index]
+				assert not batch.walls[game_index, fruit]
+				assert not batch.pills[game_index, fruit]
+				spawned += 1
+		assert spawned > 0
+
+	def test_invalid_action(self):
+		batch = bg.BatchedGPacGame(random_maps(0)[0], num_games=3)
+		actions = np.full((3, 4), bg.HOLD)
+		with pytest.raises(AssertionError):
+			batch.step(actions)
+
+	#flooded distances agree with breadth-first search
+	def test_flood_distances(self):
+		maps = random_maps(1, 3)
+		walls = np.array(maps, dtype=bool).reshape(len(maps), -1)
+		sources = np.zeros_like(walls)
+		sources[0, height-1] = True
+		sources[1, (width-1)*height] = True
+		sources[2, [height-1, (width-1)*height]] = True
+		distances = bg.flood_distances(sources, walls, width, height)
+		for game_map, source, distance in zip(maps, sources, distances):
+			expected = gpac.MapAnalysis(game_map).distances_to([divmod(cell, height) for cell in np.flatnonzero(source)])
+			assert distance.tolist() == [bg.UNREACHABLE if d == gpac.MapAnalysis.UNREACHABLE else d for d in expected]
+
+	#chasing ghosts step along a shortest maze path to pac-man rather than by Manhattan distance
+	def test_chasing_ghosts(self):
+		# pac-man spawns at (0, 4) behind a wall with a gap at (2, 0), so from (3, 3) moving up is nearer by
+		# Manhattan distance but the shortest path leads down
+		game_map = [[0 for _ in range(5)] for _ in range(5)]
+		for y in range(1, 5):
+			game_map[2][y] = 1
+		batch = bg.BatchedGPacGame(game_map, num_games=50, num_ghosts=1, pill_density=0.2, seed=0)
+		batch.positions[:, 1] = 3*5+3
+		actions = bg.chasing_ghost_actions(batch, batch.rng, random_wander_chance=0)
+		assert (actions[:, 0] == bg.ACTIONS.index('down')).all()
+		assert bg.distance_to_pac(batch)[0, 3*5+3] == gpac.MapAnalysis(game_map).distance((3, 3), (0, 4))
+
+	def test_seeded_fitness(self):
+		rng = random.Random(0)
+		genes = [[1 if rng.random() < 0.3 else 0 for _ in range(height*width)] for _ in range(4)]
+		first = batch_repair_and_test_maps(genes, height, width, samples=3, seed=1, pill_spawn='linear', pill_density=0.05)
+		second = batch_repair_and_test_maps(genes, height, width, samples=3, seed=1, pill_spawn='linear', pill_density=0.05)
+		assert first == second
+		assert len(first) == len(genes)
+		assert all(fitness <= 0 for fitness in first)
+		# staticAgents names are not batched policies
+		for agent_type in ('pill', 'fruit', 'avoid'):
+			with pytest.raises(ValueError, match='greedy_pill'):
+				batch_repair_and_test_maps(genes, height, width, agent_type=agent_type)
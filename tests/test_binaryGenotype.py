@@ -182,4 +182,52 @@ class TestMutation:
 				# diff += distance(parents[0].gene, child.gene)
 			# diff = diff / iterations
 			# assert diff / boardsize > rate - 0.05
-			# assert diff / boardsize < rate + 0.05
\ No newline at end of file
+			# assert diff / boardsize < rate + 0.05
+
+class TestPackedGene:
+	#the gene reads and writes like a list of loci
+	def test_list_behaviour(self):
+		for _ in range(iterations):
+			size = random.randint(2, boardsize * 5)
+			individual = random_pop(1, size)[0]
+			loci = individual.gene.copy()
+			assert list(individual.gene) == loci and individual.gene == loci and len(individual.gene) == size
+			i = random.randrange(size)
+			individual.gene[i] = 1 - loci[i]
+			loci[i] = 1 - loci[i]
+			assert individual.gene == loci
+			assert individual.gene[-1] == loci[-1]
+
+	#a pickled gene arrives as a plain list
+	def test_pickle(self):
+		import pickle
+		individual = random_pop(1, boardsize)[0]
+		gene = pickle.loads(pickle.dumps(individual.gene))
+		assert type(gene) is list and gene == individual.gene
+
+	def test_mutation_rate(self):
+		for _ in range(iterations):
+			size = random.randint(2, boardsize * 5)
+			parent = random_pop(1, size)[0]
+			assert distance(parent.mutate(mutation_rate=0).gene, parent.gene) == 0
+			assert distance(parent.mutate(mutation_rate=1).gene, parent.gene) == size
+
+	#children inherit the connectivity of the parent they differ from least
+	def test_connectivity(self):
+		ones, zeroes = all_ones(boardsize), all_zeroes(boardsize)
+		ones.connectivity, zeroes.connectivity = 'ones', 'zeroes'
+		for _ in range(iterations):
+			child = ones.recombine(zeroes, '1-point crossover')
+			assert child.connectivity == ('ones' if sum(child.gene) >= boardsize / 2 else 'zeroes')
+			assert child.mutate().connectivity == child.connectivity
+
+	#multi-dimensional recombination takes a rectangle of the map from the first parent
+	def test_multi_dimensional(self):
+		height, width = 10, 10
+		for _ in range(iterations):
+			ones, zeroes = all_ones(boardsize), all_zeroes(boardsize)
+			child = ones.recombine(zeroes, 'multi-dimensional', height=height, width=width)
+			cells = [(i // width, i % width) for i in range(boardsize) if child.gene[i] == 1]
+			rows, columns = {cell[0] for cell in cells}, {cell[1] for cell in cells}
+			assert len(cells) == len(rows) * len(columns) > 0
+			assert rows == set(range(min(rows), max(rows) + 1)) and columns == set(range(min(columns), max(columns) + 1))
@@ -0,0 +1,143 @@
+import pytest, os, sys, inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+import experiment
+from test_utils import bitString, random_parents, best_survivors, simpleEA
+from snakeeyes import readConfig
+
+config_text = '''[fitness_kwargs]
+height = 6
+width = 7
+samples = 1
+pill_spawn = linear
+pill_density = 0.2
+
+[EA_configs]
+mu = 6
+num_children = 4
+mutation_rate = 0.5
+individual_class = bitString
+parent_selection = random_parents
+survival_selection = best_survivors
+
+[initialization_kwargs]
+length = ${fitness_kwargs:height}*${fitness_kwargs:width}
+
+[parent_selection_kwargs]
+
+[recombination_kwargs]
+
+[mutation_kwargs]
+
+[survival_selection_kwargs]
+'''
+
+class Crash(Exception):
+	pass
+
+class crashingEA(simpleEA):
+	'''fails after a set number of generations to simulate an interrupted run'''
+	generations = 0
+
+	def generate_children(self):
+		if crashingEA.generations == 0:
+			raise Crash
+		crashingEA.generations -= 1
+		return super().generate_children()
+
+class crashingBitString(bitString):
+	'''fails after a set number of initializations to simulate an interrupted random search'''
+	chunks = 0
+
+	@classmethod
+	def initialization(cls, mu, length):
+		if crashingBitString.chunks == 0:
+			raise Crash
+		crashingBitString.chunks -= 1
+		return bitString.initialization(mu, length)
+
+namespace = {'bitString': bitString, 'random_parents': random_parents, 'best_survivors': best_survivors}
+
+@pytest.fixture
+def config_path(tmp_path):
+	path = tmp_path/'test_config.txt'
+	path.write_text(config_text)
+	return str(path)
+
+def read_config(path):
+	return readConfig(path, globalVars=namespace, localVars=dict())
+
+class TestExperiment:
+	#parallel runs stream their logs and reproduce serial runs with the same seeds
+	def test_runs(self, config_path, tmp_path):
+		serial = experiment.run_experiment(config_path, 3, 22, str(tmp_path/'serial'), workers=1, namespace=namespace, ea_class=simpleEA)
+		parallel = experiment.run_experiment(config_path, 3, 22, str(tmp_path/'parallel'), workers=2, namespace=namespace, ea_class=simpleEA)
+		assert parallel == serial
+		assert (tmp_path/'parallel'/'results.txt').read_text().split() == [str(best) for best in serial]
+		records = experiment.read_records(str(tmp_path/'parallel'/'run0.jsonl'))
+		assert [record['evaluations'] for record in records] == [6, 10, 14, 18, 22, 22]
+		assert records[-1]['final'] and records[-1]['best'] == serial[0]
+		assert not os.path.exists(tmp_path/'parallel'/'run0.pkl')
+
+	#an interrupted run resumes from its last checkpoint and finishes as if it had never stopped
+	def test_resume(self, config_path, tmp_path):
+		config = read_config(config_path)
+		os.makedirs(tmp_path/'expected')
+		expected = experiment.run_ea(config, 26, str(tmp_path/'expected'), 0, 5, ea_class=simpleEA)
+		output = str(tmp_path/'resumed')
+		os.makedirs(output)
+		crashingEA.generations = 2
+		with pytest.raises(Crash):
+			experiment.run_ea(config, 26, output, 0, 5, ea_class=crashingEA)
+		log_path, checkpoint_path = experiment.run_paths(output, 0)
+		assert os.path.exists(checkpoint_path)
+		# a record half written by the crashing generation is dropped on resume
+		with open(log_path, 'a') as f:
+			f.write('{"evaluations": 1')
+		# the checkpoint holds the crashing EA itself, so let it carry on
+		crashingEA.generations = 100
+		assert experiment.run_ea(config, 26, output, 0, 5, ea_class=crashingEA) == expected
+		assert experiment.read_records(log_path) == experiment.read_records(str(tmp_path/'expected'/'run0.jsonl'))
+		# finished runs are not repeated
+		crashingEA.generations = 0
+		assert experiment.run_experiment(config_path, 1, 26, output, workers=1, seed=5, namespace=namespace, ea_class=crashingEA) == [expected['best']]
+
+	#the steady-state driver runs in steps of num_children evaluations and resumes like a generational one
+	def test_steady_state(self, config_path, tmp_path):
+		config = read_config(config_path)
+		record = experiment.run_ea(config, 17, str(tmp_path), 0, 5, ea_class=experiment.EA_CLASSES['steady'])
+		records = experiment.read_records(str(tmp_path/'run0.jsonl'))
+		assert [record['evaluations'] for record in records] == [6, 10, 14, 17, 17]
+		assert record == records[-1]
+
+	#the template EA is rejected before any evaluation is spent
+	def test_template_rejected(self, config_path, tmp_path):
+		with pytest.raises(ValueError):
+			experiment.run_experiment(config_path, 1, 10, str(tmp_path), workers=1, namespace=namespace, ea_class=experiment.EA_CLASSES['base'])
+		assert not os.path.exists(tmp_path/'run0.jsonl')
+
+	def test_random_search(self, config_path, tmp_path):
+		bests = experiment.run_experiment(config_path, 2, 10, str(tmp_path), workers=2, random_search=True, namespace=namespace)
+		assert len(bests) == 2
+		records = experiment.read_records(str(tmp_path/'run1.jsonl'))
+		assert [record['evaluations'] for record in records] == [4, 8, 10, 10]
+		assert [record['best'] for record in records[:-1]] == sorted(record['best'] for record in records[:-1])
+		assert records[-1]['best'] == bests[1]
+		assert not os.path.exists(tmp_path/'run1.pkl')
+
+	#an interrupted random search resumes after its last finished chunk
+	def test_random_search_resume(self, config_path, tmp_path):
+		config = read_config(config_path)
+		os.makedirs(tmp_path/'expected')
+		expected = experiment.run_random_search(config, 14, str(tmp_path/'expected'), 0, 5)
+		output = str(tmp_path/'resumed')
+		os.makedirs(output)
+		crashingBitString.chunks = 2
+		with pytest.raises(Crash):
+			experiment.run_random_search(config, 14, output, 0, 5, individual_class=crashingBitString)
+		log_path, checkpoint_path = experiment.run_paths(output, 0)
+		assert [record['evaluations'] for record in experiment.read_records(log_path)] == [4, 8]
+		crashingBitString.chunks = 100
+		assert experiment.run_random_search(config, 14, output, 0, 5, individual_class=crashingBitString) == expected
+		assert experiment.read_records(log_path) == experiment.read_records(str(tmp_path/'expected'/'run0.jsonl'))
@@ -0,0 +1,367 @@
+import random, pytest, os, sys, inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+import fitness
+from fitness import repair_and_test_map, evaluate_population
+
+iterations = 10
+height = 20
+width = 35
+fitness_kwargs = {'height': height, 'width': width, 'samples': 2, 'pill_spawn': 'linear', 'pill_density': 0.05, 'seed': 3}
+
+class Individual():
+	def __init__(self, gene):
+		self.gene = gene
+		self.fitness = None
+
+def random_population(n, density=0.3):
+	return [Individual([1 if random.random() < density else 0 for _ in range(height*width)]) for _ in range(n)]
+
+class TestEvaluatePopulation:
+	#parallel evaluation assigns the same fitnesses and logs as serial evaluation
+	@pytest.mark.parametrize('workers, chunksize', [(2, None), (2, 1), (3, 4)])
+	def test_matches_serial(self, workers, chunksize):
+		population = random_population(8)
+		serial = evaluate_population(population, fitness_kwargs)
+		logs = [individual.log for individual in population]
+		assert serial == [repair_and_test_map(individual.gene, **fitness_kwargs)[0] for individual in population]
+		assert evaluate_population(population, fitness_kwargs, workers=workers, chunksize=chunksize) == serial
+		assert [individual.log for individual in population] == logs
+
+	def test_without_log(self):
+		population = random_population(4)
+		fitnesses = evaluate_population(population, dict(fitness_kwargs, return_log=False), workers=2)
+		assert fitnesses == [individual.fitness for individual in population]
+		assert all(individual.log is None for individual in population)
+
+	#pools stay warm across calls
+	def test_pool_reused(self):
+		evaluate_population(random_population(2), fitness_kwargs, workers=2)
+		pool = fitness.pools[2]
+		evaluate_population(random_population(2), fitness_kwargs, workers=2)
+		assert fitness.pools[2] is pool
+
+class TestFitnessCache:
+	#identical genes and genes repairing to the same map are simulated once
+	def test_hits(self):
+		population = random_population(4)
+		population.append(Individual(population[0].gene.copy()))
+		# the pac-man spawn is always repaired to open, so these genes share a map
+		spawn = (height-1)*width
+		population[1].gene[spawn] = 0
+		population.append(Individual(population[1].gene.copy()))
+		population[-1].gene[spawn] = 1
+		cache = fitness.FitnessCache()
+		fitnesses = evaluate_population(population, fitness_kwargs, cache=cache)
+		assert fitnesses == [repair_and_test_map(individual.gene, **fitness_kwargs)[0] for individual in population]
+		assert cache.stats()['misses'] == 4 and cache.stats()['hits'] == 2
+		assert evaluate_population(population, fitness_kwargs, cache=cache) == fitnesses
+		assert cache.stats()['hits'] == 8
+
+	#explicit defaults share a key with omitted ones and other settings do not
+	def test_key(self):
+		game_map = [[0, 0], [0, 0]]
+		cache = fitness.FitnessCache()
+		assert cache.key(game_map, fitness_kwargs) == cache.key(game_map, dict(fitness_kwargs, agent_type='pill', engine='array'))
+		assert cache.key(game_map, fitness_kwargs) != cache.key(game_map, dict(fitness_kwargs, seed=4))
+		assert cache.key(game_map, fitness_kwargs) != cache.key([[0, 1], [0, 0]], fitness_kwargs)
+
+	#int seeds share a key whatever their type and generator seeds are never cached
+	def test_generator_seed(self):
+		np = pytest.importorskip('numpy')
+		game_map = [[0, 0], [0, 0]]
+		cache = fitness.FitnessCache()
+		assert cache.key(game_map, dict(fitness_kwargs, seed=4)) == cache.key(game_map, dict(fitness_kwargs, seed=np.int64(4)))
+		with pytest.raises(ValueError):
+			cache.key(game_map, dict(fitness_kwargs, seed=random.Random(4)))
+		population = random_population(2)
+		evaluate_population(population, dict(fitness_kwargs, seed=random.Random(4)), cache=cache)
+		assert all(individual.fitness is not None for individual in population)
+		assert cache.stats()['size'] == 0 and cache.stats()['misses'] == 0
+
+	def test_lru_eviction(self):
+		cache = fitness.FitnessCache(maxsize=2)
+		for key in 'abc':
+			cache.put(key, (0, None))
+		assert cache.get('a') is None
+		assert cache.get('b') is not None
+		cache.put('d', (0, None))
+		assert cache.get('c') is None and cache.get('b') is not None
+
+	def test_persistent(self, tmp_path):
+		population = random_population(3)
+		with fitness.FitnessCache(path=str(tmp_path/'cache')) as cache:
+			fitnesses = evaluate_population(population, fitness_kwargs, cache=cache)
+		with fitness.FitnessCache(path=str(tmp_path/'cache')) as cache:
+			assert evaluate_population(population, fitness_kwargs, cache=cache) == fitnesses
+			assert cache.stats()['hits'] == 3 and cache.stats()['misses'] == 0
+
+def reference_nearest_points(region0, region1):
+	'''exhaustive search for the nearest pair with the tie-breaking of fitness.nearest_points'''
+	shortest = min(fitness.manhattan_distance(point0, point1) for point0 in region0 for point1 in region1)
+	point1 = min(point1 for point1 in region1 if any(fitness.manhattan_distance(point0, point1) == shortest for point0 in region0))
+	point0 = min(point0 for point0 in region0 if fitness.manhattan_distance(point0, point1) == shortest)
+	return point0, point1
+
+def reference_repair_map(maze):
+	'''list-based repair pipeline that repair_map must reproduce'''
+	pac_spawn, ghost_spawn = (0, len(maze[0])-1), (len(maze)-1, 0)
+	repairs = 0
+	for x, y in (pac_spawn, ghost_spawn):
+		if maze[x][y] == 1:
+			maze[x][y] = 0
+			repairs += 1
+	pac_reachable = fitness.reachable_cells(maze, pac_spawn)
+	if ghost_spawn not in pac_reachable:
+		(x0, y0), (x1, y1) = reference_nearest_points(pac_reachable, fitness.reachable_cells(maze, ghost_spawn))
+		tunnel = {(x, y) for x in range(min(x0, x1), max(x0, x1)+1) for y in (y0, y1)}
+		tunnel |= {(x, y) for x in (x0, x1) for y in range(min(y0, y1), max(y0, y1)+1)}
+		for x, y in tunnel:
+			repairs += maze[x][y]
+			maze[x][y] = 0
+	maze, access_repairs = fitness.repair_unreachable_cells(maze, pac_spawn)
+	return maze, repairs + access_repairs
+
+class TestRepair:
+	def test_translate_gene(self):
+		gene = random_population(1)[0].gene
+		maze = fitness.translate_gene(gene, height, width)
+		assert len(maze) == width and all(len(column) == height for column in maze)
+		assert all(maze[i%width][i//width] == gene[i] for i in range(len(gene)))
+		with pytest.raises(AssertionError):
+			fitness.translate_gene(gene[1:], height, width)
+
+	#the array pipeline matches the list pipeline in map and repair count, including maps needing a tunnel
+	@pytest.mark.parametrize('density', [0.1, 0.3, 0.5, 0.7])
+	def test_matches_reference(self, density):
+		for individual in random_population(20, density):
+			expected = reference_repair_map(fitness.translate_gene(individual.gene, height, width))
+			assert fitness.repair_map(fitness.translate_gene(individual.gene, height, width)) == expected
+			grid, repairs = fitness.repair_map_array(fitness.translate_gene_array(individual.gene, height, width))
+			assert (grid.tolist(), repairs) == expected
+
+	def test_label_components(self):
+		np = pytest.importorskip('numpy')
+		for individual in random_population(10):
+			maze = fitness.translate_gene(individual.gene, height, width)
+			labels = fitness.label_components(np.array(maze) == 0)
+			for x in range(width):
+				for y in range(height):
+					if maze[x][y] == 1:
+						assert labels[x, y] == -1
+					else:
+						reachable = fitness.reachable_cells(maze, (x, y))
+						assert {cell for cell in zip(*np.nonzero(labels == labels[x, y]))} == reachable
+						assert labels[x, y] == min(cell_x*height+cell_y for cell_x, cell_y in reachable)
+
+	def test_distance_transform(self):
+		np = pytest.importorskip('numpy')
+		rng = np.random.default_rng(0)
+		for shape in ((1, 1), (5, 1), (7, 9), (20, 35)):
+			region = rng.random(shape) < 0.1
+			region[0, 0] = True
+			points = list(zip(*np.nonzero(region)))
+			expected = [[min(fitness.manhattan_distance((x, y), point) for point in points) for y in range(shape[1])] for x in range(shape[0])]
+			assert fitness.distance_transform(region).tolist() == expected
+
+	def test_nearest_points(self):
+		np = pytest.importorskip('numpy')
+		rng = np.random.default_rng(1)
+		for _ in range(iterations):
+			cells = rng.random((15, 12))
+			region0, region1 = cells < 0.05, cells > 0.95
+			if region0.any() and region1.any():
+				expected = reference_nearest_points(set(zip(*map(list, np.nonzero(region0)))), set(zip(*map(list, np.nonzero(region1)))))
+				assert fitness.nearest_points(region0, region1) == expected
+
+	#incremental repair of a chain of mutants matches full repair, including maps needing a tunnel
+	@pytest.mark.parametrize('density', [0.1, 0.3, 0.5, 0.7])
+	def test_incremental(self, density):
+		np = pytest.importorskip('numpy')
+		rng = np.random.default_rng(int(density*10))
+		gene = (rng.random(height*width) < density).astype(np.uint8)
+		connectivity = fitness.MapConnectivity.from_grid(fitness.translate_gene_array(gene, height, width))
+		for _ in range(iterations*10):
+			gene = gene.copy()
+			flips = rng.integers(0, height*width, rng.integers(1, 6))
+			gene[flips] ^= 1
+			grid = fitness.translate_gene_array(gene, height, width)
+			connectivity = connectivity.update(grid)
+			# the same components as labeling from scratch, under other ids
+			expected = fitness.label_components(connectivity.grid == 0)
+			labels = connectivity.root_labels()
+			assert ((labels == -1) == (expected == -1)).all()
+			pairs = set(zip(expected[expected >= 0].tolist(), labels[labels >= 0].tolist()))
+			assert len(pairs) == len(set(expected[expected >= 0].tolist())) == len(set(labels[labels >= 0].tolist()))
+			repaired, repairs = connectivity.repair()
+			expected = reference_repair_map(grid.tolist())
+			assert (repaired.tolist(), repairs) == expected
+
+	#closing a cell only labels the box around it unless its component may have split beyond the box
+	def test_local_split(self, monkeypatch):
+		np = pytest.importorskip('numpy')
+		grid = np.zeros((200, 100), dtype=np.uint8)
+		connectivity = fitness.MapConnectivity.from_grid(grid)
+		labeled = list()
+		original = fitness.label_components
+		def counting_label_components(open_cells):
+			labeled.append(open_cells.size)
+			return original(open_cells)
+		monkeypatch.setattr(fitness, 'label_components', counting_label_components)
+		# walling in a single cell splits it off inside a small box
+		for x, y in ((49, 50), (51, 50), (50, 49)):
+			grid[x, y] = 1
+			connectivity = connectivity.update(grid)
+		grid[50, 51] = 1
+		connectivity = connectivity.update(grid)
+		monkeypatch.undo()
+		assert 0 < max(labeled) <= 9*9
+		labels = connectivity.root_labels()
+		assert labels[50, 50] != labels[0, 0] and labels[50, 50] >= 0
+		assert (connectivity.repair()[0] == fitness.repair_map_array(grid.copy())[0]).all()
+
+	#an unchanged map shares its parent's labels without sharing the alias table find() compresses
+	def test_unchanged_update(self):
+		np = pytest.importorskip('numpy')
+		grid = np.zeros((10, 10), dtype=np.uint8)
+		parent = fitness.MapConnectivity.from_grid(grid)
+		# three bands joined one after the other leave an alias chain for find() to compress
+		grid[3, :] = grid[6, :] = 1
+		parent = parent.update(grid)
+		for x in (6, 3):
+			grid[x, 5] = 0
+			parent = parent.update(grid)
+		aliases = dict(parent.aliases)
+		child = parent.update(grid)
+		assert child.labels is parent.labels
+		for label in np.unique(child.labels).tolist():
+			child.find(label)
+		assert child.aliases != aliases
+		assert parent.aliases == aliases
+
+	#evaluating with incremental labels maps from the inherited connectivity and gives the same results
+	def test_incremental_evaluation(self):
+		kwargs = dict(fitness_kwargs, return_repair_count=True)
+		population = random_population(3)
+		expected = [repair_and_test_map(individual.gene, **kwargs) for individual in population]
+		connectivities = fitness.map_connectivities(population, height, width)
+		assert [individual.connectivity for individual in population] == connectivities
+		assert [repair_and_test_map(connectivity, **kwargs) for connectivity in connectivities] == expected
+		mutant = Individual(population[0].gene.copy())
+		mutant.gene[5] ^= 1
+		mutant.connectivity = population[0].connectivity
+		fitnesses = evaluate_population(population+[mutant], fitness_kwargs, incremental=True, workers=2)
+		assert fitnesses == evaluate_population([Individual(individual.gene) for individual in population+[mutant]], fitness_kwargs)
+		assert mutant.connectivity is not population[0].connectivity
+		assert (mutant.connectivity.grid == fitness.MapConnectivity.from_grid(fitness.translate_gene_array(mutant.gene, height, width)).grid).all()
+
+	#separated halves of a large map are joined by the shortest possible tunnel
+	def test_large_map(self):
+		np = pytest.importorskip('numpy')
+		grid = np.zeros((400, 300), dtype=np.uint8)
+		grid[190:210, :] = 1
+		grid, repairs = fitness.repair_map_array(grid)
+		assert repairs == 20
+		assert fitness.label_components(grid == 0)[0, 299] == fitness.label_components(grid == 0)[399, 0]
+
+class TestRacing:
+	racing_kwargs = dict(fitness_kwargs, samples=4, pill_spawn='stochastic', pill_density=0.1)
+
+	#without a threshold exactly the configured number of games is played
+	def test_fixed_samples(self):
+		gene = random_population(1)[0].gene
+		fitness_value, log, games = repair_and_test_map(gene, **self.racing_kwargs, return_sample_count=True)
+		assert games == 4
+		assert repair_and_test_map(gene, **self.racing_kwargs) == (fitness_value, log)
+
+	#hopeless individuals stop after min_samples and clearly good ones after samples
+	def test_early_stop(self):
+		gene = random_population(1)[0].gene
+		assert repair_and_test_map(gene, **self.racing_kwargs, threshold=1000, return_sample_count=True)[-1] == 3
+		assert repair_and_test_map(gene, **self.racing_kwargs, threshold=-1000, return_sample_count=True)[-1] == 4
+
+	#close calls are resolved with extra games up to max_samples
+	def test_extra_games(self):
+		extended = 0
+		for individual in random_population(5):
+			# seeded games are replayed identically, so racing towards the 8 game mean needs extra games to decide
+			fitness_value = repair_and_test_map(individual.gene, **dict(self.racing_kwargs, samples=8))[0]
+			raced, _, games = repair_and_test_map(individual.gene, **self.racing_kwargs, threshold=fitness_value, max_samples=8, return_sample_count=True)
+			assert 3 <= games <= 8
+			if games == 8:
+				assert raced == fitness_value
+			extended += games > 4
+		assert extended > 0
+
+	def test_population_games(self):
+		population = random_population(4)
+		evaluate_population(population, dict(self.racing_kwargs, threshold=1000), workers=2)
+		assert all(individual.games == 3 for individual in population)
+		evaluate_population(population, self.racing_kwargs)
+		assert all(individual.games == 4 for individual in population)
+
+class TestCommonRandomNumbers:
+	crn_kwargs = dict(fitness_kwargs, samples=3, seeds=[5, 6, 7], pill_spawn='stochastic', pill_density=0.1)
+	del crn_kwargs['seed']
+
+	#every individual sees the same games whatever the global state and evaluation order
+	def test_reproducible(self):
+		population = random_population(4)
+		random.seed(0)
+		forward = evaluate_population(population, self.crn_kwargs)
+		random.seed(1)
+		backward = evaluate_population(population[::-1], self.crn_kwargs, workers=2)
+		assert forward == backward[::-1]
+
+	#pill placement only depends on the map and the seed of each game
+	def test_shared_pills(self):
+		gene = random_population(1)[0].gene
+		logs = list()
+		for agent_type in ('pill', 'avoid'):
+			log = repair_and_test_map(gene, **dict(self.crn_kwargs, agent_type=agent_type, samples=1))[1]
+			logs.append([line for line in log if line.startswith('p ')])
+		assert logs[0] == logs[1]
+
+	#games are seeded individually so fewer games replay the first seeds
+	def test_prefix(self):
+		gene = random_population(1)[0].gene
+		scores = [-repair_and_test_map(gene, **dict(self.crn_kwargs, samples=1, seeds=[seed]))[0] for seed in self.crn_kwargs['seeds']]
+		assert -repair_and_test_map(gene, **self.crn_kwargs)[0] == sum(scores)/len(scores)
+
+	def test_too_few_seeds(self):
+		with pytest.raises(AssertionError):
+			repair_and_test_map(random_population(1)[0].gene, **dict(self.crn_kwargs, samples=4))
+
+class TestSharedPopulation:
+	#workers reading genes from shared memory assign the same fitnesses and logs as serial evaluation
+	def test_matches_serial(self):
+		population = random_population(6)
+		serial = evaluate_population(population, fitness_kwargs)
+		logs = [individual.log for individual in population]
+		games = [individual.games for individual in population]
+		with fitness.SharedPopulation(height*width, 4) as shared:
+			assert evaluate_population(population, fitness_kwargs, workers=2, shared=shared) == serial
+			assert [individual.log for individual in population] == logs
+			assert [individual.games for individual in population] == games
+			# the block grew to fit the population and is reused by smaller ones
+			assert shared.capacity >= 6
+			name = shared.name
+			assert evaluate_population(population[:3], fitness_kwargs, workers=2, shared=shared) == serial[:3]
+			assert shared.name == name
+
+	def test_with_cache(self):
+		population = random_population(3)
+		population.append(Individual(population[0].gene.copy()))
+		cache = fitness.FitnessCache()
+		with fitness.SharedPopulation(height*width) as shared:
+			fitnesses = evaluate_population(population, dict(fitness_kwargs, return_log=False), workers=2, cache=cache, shared=shared)
+		assert fitnesses == [repair_and_test_map(individual.gene, **fitness_kwargs)[0] for individual in population]
+		assert cache.stats()['misses'] == 3
+
+	def test_close_unlinks(self):
+		shared = fitness.SharedPopulation(height*width, 2)
+		name = shared.name
+		shared.close()
+		with pytest.raises(FileNotFoundError):
+			fitness.shared_memory.SharedMemory(name=name)
@@ -0,0 +1,416 @@
+import random, pytest, os, sys, inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+import gpac, staticAgents
+from fitness import repair_and_test_map
+
+iterations = 10
+height = 20
+width = 35
+
+def random_gene(length, density=0.3):
+	return [1 if random.random() < density else 0 for _ in range(length)]
+
+def play_random(game):
+	while not game.gameover:
+		for player in game.players:
+			game.register_action(random.choice(game.get_actions(player)), player)
+		game.step()
+	if isinstance(game.log, gpac.GameLog):
+		return game.score, game.log.render()
+	return game.score, None
+
+def cross_map(size=21):
+	game_map = [[1 for __ in range(size)] for _ in range(size)]
+	for i in range(size):
+		game_map[0][i] = game_map[i][0] = game_map[size//2][i] = game_map[i][size//2] = game_map[size-1][i] = game_map[i][size-1] = 0
+	return game_map
+
+class TestArrayEngine:
+	#both engines play identical games from identical random states
+	@pytest.mark.parametrize('pill_spawn', ['stochastic', 'linear', 'manhattan'])
+	def test_matches_list_engine(self, pill_spawn):
+		for seed in range(iterations):
+			results = list()
+			for game_class in (gpac.GPacGame, gpac.ArrayGPacGame):
+				random.seed(seed)
+				game = game_class(cross_map(), pill_spawn=pill_spawn, num_pacs=2)
+				results.append(play_random(game))
+			assert results[0] == results[1]
+
+	#fitness evaluation is unaffected by the choice of engine
+	@pytest.mark.parametrize('agent_type, ghost_type', [('pill', 'wander'), ('fruit', 'chase'), ('avoid', 'chase')])
+	def test_fitness_matches(self, agent_type, ghost_type):
+		for seed in range(iterations//4):
+			gene = random_gene(height*width)
+			results = list()
+			for engine in ('list', 'array'):
+				random.seed(seed)
+				results.append(repair_and_test_map(gene, height, width, agent_type=agent_type, ghost_type=ghost_type, pill_spawn='linear', pill_density=0.05, engine=engine))
+			assert results[0] == results[1]
+
+	def test_unknown_engine(self):
+		with pytest.raises(ValueError):
+			repair_and_test_map(random_gene(height*width), height, width, engine='sparse')
+
+	def test_pill_view(self):
+		game = gpac.ArrayGPacGame(cross_map(), pill_spawn='linear')
+		assert len(game.pills) == len(set(game.pills))
+		for pill in game.pills:
+			assert pill in game.pills
+			assert game.map[pill[0]][pill[1]] == 0
+		assert (-1, 0) not in game.pills
+		assert (0, game.height) not in game.pills
+
+class TestStaticIndex:
+	#action tables agree with a direct bounds and wall check
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_action_tables(self, game_class):
+		game = game_class(cross_map())
+		for x in range(game.width):
+			for y in range(game.height):
+				expected = [action for action, (x_shift, y_shift) in gpac.PAC_ACTIONS.items() if 0 <= x+x_shift < game.width and 0 <= y+y_shift < game.height and game.map[x+x_shift][y+y_shift] == 0]
+				for player in game.players:
+					game.players[player] = (x, y)
+					if isinstance(game, gpac.ArrayGPacGame):
+						game.cells[game.player_index[player]] = x*game.height+y
+					if 'm' in player:
+						assert game.get_actions(player) == expected
+					else:
+						assert game.get_actions(player) == [action for action in expected if action != 'hold']
+
+	#the fruit spawn pool is always the open cells without pills or pacs
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_fruit_cells(self, game_class):
+		for seed in range(iterations):
+			random.seed(seed)
+			game = game_class(cross_map(), num_pacs=2)
+			while not game.gameover:
+				pacs = {location for player, location in game.players.items() if 'm' in player}
+				expected = {(x, y) for x in range(game.width) for y in range(game.height) if game.map[x][y] == 0 and (x, y) not in game.pills and (x, y) not in pacs}
+				assert {game.location(cell) if isinstance(cell, int) else cell for cell in game.fruit_cells} == expected
+				for player in game.players:
+					game.register_action(random.choice(game.get_actions(player)), player)
+				game.step()
+
+class TestGameLog:
+	#rendered log follows the world file layout
+	def test_world_file_format(self):
+		random.seed(0)
+		game = gpac.GPacGame(cross_map())
+		score, lines = play_random(game)
+		assert lines[:2] == [f'{game.width}', f'{game.height}']
+		num_players = len(game.players)
+		walls = [f'w {x} {y}' for x in range(game.width) for y in range(game.height) if game.map[x][y] == 1]
+		assert lines[2+num_players:2+num_players+len(walls)] == walls
+		assert lines[-1] == f't {game.time} {game.score}'
+		assert len(game.log) == len(lines)
+
+	def test_write(self, tmp_path):
+		random.seed(0)
+		game = gpac.ArrayGPacGame(cross_map())
+		play_random(game)
+		path = str(tmp_path / 'world.txt')
+		game.log.write(path)
+		with open(path) as f:
+			assert f.read().splitlines() == game.log.render()
+
+	#every reset starts a new log without touching earlier ones
+	def test_reset_keeps_old_log(self):
+		random.seed(0)
+		game = gpac.GPacGame(cross_map())
+		play_random(game)
+		old_log = game.log
+		old_lines = old_log.render()
+		game.reset()
+		assert game.log is not old_log
+		assert old_log == old_lines
+
+class TestLogLevels:
+	#logging has no influence on the game itself
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_levels_play_identical_games(self, game_class):
+		for seed in range(iterations):
+			random.seed(seed)
+			memory_game = game_class(cross_map())
+			memory_score, memory_lines = play_random(memory_game)
+
+			random.seed(seed)
+			off_game = game_class(cross_map(), log_level='off')
+			assert play_random(off_game) == (memory_score, None)
+			assert off_game.log is None
+
+			random.seed(seed)
+			streamed = list()
+			stream_game = game_class(cross_map(), log_level='stream', log_sink=streamed.append)
+			play_random(stream_game)
+			assert streamed == memory_lines
+			assert len(stream_game.log) == len(memory_lines)
+
+	def test_stream_to_file(self, tmp_path):
+		path = tmp_path / 'world.txt'
+		random.seed(0)
+		with open(path, 'w') as f:
+			game = gpac.GPacGame(cross_map(), log_level='stream', log_sink=f)
+			play_random(game)
+		random.seed(0)
+		memory_game = gpac.GPacGame(cross_map())
+		play_random(memory_game)
+		assert path.read_text().splitlines() == memory_game.log.render()
+
+	def test_unknown_level(self):
+		with pytest.raises(AssertionError):
+			gpac.GPacGame(cross_map(), log_level='verbose')
+
+	def test_fitness_without_log(self):
+		gene = random_gene(height*width)
+		random.seed(0)
+		fitness, log = repair_and_test_map(gene, height, width, return_log=False)
+		assert log is None
+		random.seed(0)
+		assert repair_and_test_map(gene, height, width)[0] == fitness
+
+class TestObservations:
+	#observations describe the hypothetical move without copying or changing the game
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_observation_contents(self, game_class):
+		random.seed(0)
+		game = game_class(cross_map())
+		for _ in range(20):
+			for player in game.players:
+				actions = game.get_actions(player)
+				players = dict(game.players)
+				observations = game.get_observations(actions, player)
+				assert len(observations) == len(actions)
+				for action, state in zip(actions, observations):
+					x_shift, y_shift = gpac.PAC_ACTIONS[action]
+					expected = dict(players)
+					expected[player] = (players[player][0]+x_shift, players[player][1]+y_shift)
+					assert dict(state['players']) == expected
+					assert state['walls'] is game.map
+					assert set(state['pills']) == set(game.pills)
+					assert state['fruit'] == game.fruit_location
+					assert set(state.keys()) == {'walls', 'pills', 'fruit', 'players'}
+				assert game.players == players
+				game.register_action(random.choice(actions), player)
+			game.step()
+
+	def test_read_only(self):
+		game = gpac.GPacGame(cross_map())
+		state = game.get_observations(['hold'])[0]
+		with pytest.raises(TypeError):
+			state['fruit'] = (0, 0)
+		with pytest.raises(TypeError):
+			state['players']['m'] = (0, 0)
+		with pytest.raises(AttributeError):
+			state['pills'].add((0, 0))
+		with pytest.raises(KeyError):
+			state['score']
+
+def game_state(game):
+	return (dict(game.players), set(game.pills), game.fruit_location, game.time, game.score, game.gameover, set(game.graveyard), sorted(game.fruit_cells))
+
+def play_turns(game, turns):
+	for _ in range(turns):
+		if game.gameover:
+			break
+		for player in game.players:
+			game.register_action(game.rng.choice(game.get_actions(player)), player)
+		game.step()
+
+class TestSnapshots:
+	#restoring a snapshot replays the same game from the same random state
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_restore_replays(self, game_class):
+		for seed in range(iterations):
+			random.seed(seed)
+			game = game_class(cross_map(), fruit_prob=0.5)
+			play_turns(game, 5)
+			snapshot = game.snapshot()
+			before = game_state(game)
+			play_turns(game, 1000)
+			after = game_state(game)
+			for _ in range(2):
+				game.restore(snapshot)
+				assert game_state(game) == before
+				play_turns(game, 1000)
+				assert game_state(game) == after
+
+	#forks share static data, diverge independently and match the original under the same random state
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_fork(self, game_class):
+		for seed in range(iterations):
+			random.seed(seed)
+			game = game_class(cross_map(), fruit_prob=0.5)
+			play_turns(game, 5)
+			before = game_state(game)
+			fork = game.fork()
+			assert fork.map is game.map
+			assert fork.log is None
+			play_turns(fork, 1000)
+			assert game_state(game) == before
+			assert len(game.pills) == len(before[1])
+			play_turns(game, 1000)
+			assert game_state(game) == game_state(fork)
+
+	#unseeded games draw from their own generator, so restoring a snapshot leaves the global random state alone
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_restore_keeps_global_state(self, game_class):
+		random.seed(0)
+		game = game_class(cross_map(), fruit_prob=0.5)
+		assert game.rng is not random
+		snapshot = game.snapshot()
+		random.random()
+		state = random.getstate()
+		play_turns(game, 10)
+		game.restore(snapshot)
+		game.fork()
+		assert random.getstate() == state
+
+	def test_pills_copied_on_write(self):
+		random.seed(0)
+		game = gpac.GPacGame(cross_map())
+		fork = game.fork()
+		assert fork.pills is game.pills
+		pills = set(game.pills)
+		play_turns(fork, 1000)
+		assert game.pills == pills
+
+	#forks and snapshots share fruit cells and the random generator until a game changes them
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_fork_copies_on_write(self, game_class):
+		random.seed(0)
+		game = game_class(cross_map(), fruit_prob=0.5)
+		play_turns(game, 5)
+		fruit_cells, rng_state = sorted(game.fruit_cells), game.rng.getstate()
+		fork = game.fork()
+		snapshot = game.snapshot()
+		assert fork.fruit_cells is game.fruit_cells and fork.shared_rng is game.shared_rng
+		play_turns(fork, 1000)
+		assert fork.fruit_cells is not game.fruit_cells and fork.shared_rng is not game.shared_rng
+		assert sorted(game.fruit_cells) == fruit_cells and game.rng.getstate() == rng_state
+		play_turns(game, 1000)
+		assert sorted(snapshot['fruit_cells']) == fruit_cells and snapshot['rng'].getstate() == rng_state
+
+class TestValidation:
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_invalid_action(self, game_class):
+		game = game_class(cross_map())
+		game.register_action('hold', '0') # ghosts can never hold
+		with pytest.raises(AssertionError):
+			game.step()
+
+	#skipping validation does not change games played with legal actions
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_unvalidated_games_match(self, game_class):
+		for seed in range(iterations):
+			results = list()
+			for validate in (True, False):
+				random.seed(seed)
+				results.append(play_random(game_class(cross_map(), num_pacs=2, validate=validate)))
+			assert results[0] == results[1]
+
+class TestSeeding:
+	#seeded games ignore the global random state
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_seeded_games_match(self, game_class):
+		for seed in range(iterations):
+			results = list()
+			for global_seed in (0, 1):
+				random.seed(global_seed)
+				game = game_class(cross_map(), seed=seed)
+				play_turns(game, 50)
+				results.append(game_state(game))
+			assert results[0] == results[1]
+
+	def test_seed_types(self):
+		np = pytest.importorskip('numpy')
+		for seed in (7, random.Random(7), np.random.default_rng(7)):
+			assert isinstance(gpac.make_rng(seed), random.Random)
+		assert gpac.make_rng(None) is random
+		games = [gpac.GPacGame(cross_map(), seed=np.random.default_rng(3)) for _ in range(2)]
+		assert games[0].pills == games[1].pills
+
+	#agents accept the same seeds as games and replay the same moves from them
+	@pytest.mark.parametrize('agent_class, ghost_class', [(staticAgents.shortestPathPillAgent, staticAgents.RandomGhostAgent),
+														  (staticAgents.AvoidingPacmanAgent, staticAgents.ChasingGhostAgent)])
+	def test_agent_seed_types(self, agent_class, ghost_class):
+		np = pytest.importorskip('numpy')
+		for make_seed in (lambda player: 5+len(player), lambda player: np.random.default_rng(5+len(player))):
+			results = list()
+			for global_seed in (0, 1):
+				random.seed(global_seed)
+				game = gpac.GPacGame(cross_map(), seed=3)
+				agent = agent_class(rng=make_seed('m'))
+				ghosts = {player: ghost_class(rng=make_seed(player)) for player in game.players if player != 'm'}
+				actions = list()
+				while not game.gameover:
+					actions.append(agent.select_action(game))
+					game.register_action(actions[-1])
+					for player, ghost in ghosts.items():
+						actions.append(ghost.select_action(game, player))
+						game.register_action(actions[-1], player)
+					game.step()
+				results.append((actions, game.score))
+			assert results[0] == results[1]
+
+	#seeded fitness evaluations are reproducible whatever else has drawn random numbers
+	@pytest.mark.parametrize('agent_type, ghost_type', [('pill', 'wander'), ('fruit', 'chase'), ('avoid', 'chase')])
+	def test_seeded_fitness(self, agent_type, ghost_type):
+		gene = random_gene(height*width)
+		results = list()
+		for global_seed in (0, 1):
+			random.seed(global_seed)
+			results.append(repair_and_test_map(gene, height, width, agent_type=agent_type, ghost_type=ghost_type, seed=11))
+		assert results[0][0] == results[1][0]
+		assert results[0][1] == results[1][1]
+
+class TestMapAnalysis:
+	#cached distances agree with a breadth-first search of the map
+	def test_distances(self):
+		game_map = cross_map()
+		analysis = gpac.MapAnalysis(game_map)
+		for start in analysis.open_cells[::7]:
+			distances = {start: 0}
+			frontier = [start]
+			while frontier:
+				location = frontier.pop(0)
+				for x_shift, y_shift in gpac.GHOST_ACTIONS.values():
+					x, y = location[0]+x_shift, location[1]+y_shift
+					if 0 <= x < len(game_map) and 0 <= y < len(game_map[x]) and game_map[x][y] == 0 and (x, y) not in distances:
+						distances[(x, y)] = distances[location]+1
+						frontier.append((x, y))
+			for x in range(len(game_map)):
+				for y in range(len(game_map[x])):
+					assert analysis.distance(start, (x, y)) == distances.get((x, y), gpac.MapAnalysis.UNREACHABLE)
+			assert analysis.distances(start) is analysis.distances(start)
+
+	#paths are shortest and legal whichever distance table they are read from
+	def test_paths(self):
+		analysis = gpac.MapAnalysis(cross_map())
+		cells = analysis.open_cells
+		for start, end in zip(cells, reversed(cells)):
+			for cached in (False, True):
+				if cached:
+					analysis.distances(end)
+				path = analysis.path(start, end)
+				assert len(path) == analysis.distance(start, end)
+				location = start
+				for action in path:
+					location = analysis.ghost_moves[location][action]
+				assert location == end
+		assert analysis.nearest((0, 0), [(20, 20), (10, 0), (0, 10)]) == (0, 10)
+		assert analysis.path((0, 0), (1, 1)) is None
+
+	#games share their analysis with agents and with other games on the same map
+	@pytest.mark.parametrize('game_class', [gpac.GPacGame, gpac.ArrayGPacGame])
+	def test_shared(self, game_class):
+		analysis = gpac.MapAnalysis(cross_map())
+		game = game_class(cross_map(), analysis=analysis)
+		assert game.analysis is analysis
+		assert game_class(cross_map()).analysis is not analysis
+		random.seed(0)
+		play_random(game)
+		fork = game.fork()
+		assert fork.analysis is analysis
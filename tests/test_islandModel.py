@@ -0,0 +1,68 @@
+import random, pytest, os, sys, inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+from islandModel import islandModelEvolution
+from test_utils import bitString, random_parents, best_survivors, simpleEA
+
+fitness_kwargs = {'height': 6, 'width': 7, 'samples': 1, 'pill_spawn': 'linear', 'pill_density': 0.2}
+
+def random_survivors(population, n, **kwargs):
+	return random.sample(population, n)
+
+def island_config(survival_selection=best_survivors):
+	return {'individual_class': bitString, 'mu': 6, 'num_children': 4, 'mutation_rate': 0.5, 'parent_selection': random_parents,
+			'survival_selection': survival_selection, 'initialization_kwargs': {'length': 42}}
+
+class TestIslandModel:
+	#islands keep their own configs and spend their own evaluations
+	def test_run(self):
+		configs = [island_config(), island_config(random_survivors), island_config()]
+		with islandModelEvolution(configs, fitness_kwargs, migration_interval=2, ea_class=simpleEA, seed=1) as islands:
+			best = islands.run(5)
+			report = islands.report()
+		assert [island['evaluations'] for island in report['islands']] == [6+5*4]*3
+		assert all(island['evaluations_per_second'] > 0 for island in report['islands'])
+		assert 0 <= report['migration_seconds'] <= report['wall_seconds']
+		assert best.fitness == max(island['best'] for island in report['islands'])
+		assert [len(population) for population in islands.populations] == [6]*3
+
+	#seeded runs are reproducible
+	def test_seeded(self):
+		genes = list()
+		for _ in range(2):
+			with islandModelEvolution([island_config(), island_config()], fitness_kwargs, migration_interval=2, topology='random', ea_class=simpleEA, seed=4) as islands:
+				islands.run(4)
+			genes.append([[individual.gene for individual in population] for population in islands.populations])
+		assert genes[0] == genes[1]
+
+	#with elitist survival an island is never worse than the island that sent it migrants
+	def test_ring_migration(self):
+		with islandModelEvolution([island_config() for _ in range(3)], fitness_kwargs, migration_interval=1, migrants=1, ea_class=simpleEA, seed=2) as islands:
+			islands.run(1)
+			before = [island['best'] for island in islands.report()['islands']]
+			islands.run(1)
+			after = [island['best'] for island in islands.report()['islands']]
+		assert all(after[(i+1)%3] >= before[i] for i in range(3))
+
+	#islands that send no migrants still report the best individual
+	def test_no_migrants(self):
+		with islandModelEvolution([island_config(), island_config()], fitness_kwargs, migrants=0, ea_class=simpleEA, seed=3) as islands:
+			best = islands.run(3)
+			report = islands.report()
+		assert best.fitness == max(island['best'] for island in report['islands'])
+
+	@pytest.mark.parametrize('topology', ['ring', 'random'])
+	def test_destinations(self, topology):
+		with islandModelEvolution([island_config() for _ in range(4)], fitness_kwargs, topology=topology, ea_class=simpleEA) as islands:
+			for _ in range(10):
+				destinations = islands.destinations()
+				assert all(destination != i for i, destination in enumerate(destinations))
+			if topology == 'ring':
+				assert destinations == [1, 2, 3, 0]
+
+	#a failing island raises instead of hanging the driver
+	def test_island_failure(self):
+		with islandModelEvolution([island_config(), island_config()], fitness_kwargs, ea_class=object) as islands:
+			with pytest.raises(RuntimeError):
+				islands.run(1)
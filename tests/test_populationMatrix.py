@@ -0,0 +1,126 @@
+import pytest, os, sys, inspect, pickle
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+import numpy as np
+from test_utils import get_cross_points, distance, random_parents, best_survivors
+from populationMatrix import populationMatrix
+import baseEvolution as evo
+import fitness
+
+iterations = 50
+boardsize = 100
+
+def ones_and_zeroes(n, length=boardsize):
+	return populationMatrix(np.concatenate((np.ones((n, length)), np.zeros((n, length)))))
+
+class TestViews:
+	#views read and write the rows and fitnesses of their population
+	def test_attributes(self):
+		population = populationMatrix.initialization(5, boardsize)
+		individual = population[2]
+		assert individual.fitness is None
+		individual.fitness = -12.5
+		assert population.fitnesses[2] == -12.5 and population[2].fitness == -12.5
+		individual.gene[0] = 1 - individual.gene[0]
+		assert population.genes[2, 0] == individual.gene[0]
+		assert population[2] == individual and population[1] != individual
+		assert len({individual for individual in population} | {population[0]}) == 5
+
+	#single-individual operators match binaryGenotype's
+	def test_operators(self):
+		population = ones_and_zeroes(1)
+		genes = population.genes.copy()
+		for _ in range(iterations):
+			child = population[0].recombine(population[1], '1-point crossover')
+			assert len(get_cross_points(child.gene)) == 1
+			mutant = child.mutate()
+			assert distance(mutant.gene, child.gene) > 0
+		assert (population.genes == genes).all()
+
+	#a pickled view carries only its own row
+	def test_pickle(self):
+		population = populationMatrix.initialization(50, boardsize)
+		population[7].fitness = 3
+		copy = pickle.loads(pickle.dumps(population[7]))
+		assert len(copy.population) == 1 and copy.fitness == 3
+		assert (copy.gene == population[7].gene).all()
+
+class TestBatchOperators:
+	@pytest.mark.parametrize('method', ['uniform', '1-point crossover', 'multi-dimensional'])
+	def test_recombine(self, method):
+		population = ones_and_zeroes(iterations)
+		mothers = np.arange(iterations)
+		children = population.recombine(mothers, mothers+iterations, method, height=10, width=10)
+		assert children.genes.shape == (iterations, boardsize)
+		assert all(child.fitness is None for child in children)
+		for child in children:
+			if method == '1-point crossover':
+				assert len(get_cross_points(child.gene)) == 1 and child.gene[0] == 1
+			elif method == 'multi-dimensional':
+				rows, columns = np.nonzero(child.gene.reshape(10, 10))
+				assert len(rows) == len(set(rows)) * len(set(columns)) > 0
+
+	#every locus of the 1-point crossover range is used
+	def test_crossover_points(self):
+		population = ones_and_zeroes(1)
+		children = population.recombine(np.zeros(20000, dtype=int), np.ones(20000, dtype=int), '1-point crossover')
+		points = children.genes.sum(axis=1)
+		assert points.min() == 1 and points.max() == boardsize - 1
+
+	def test_mutate(self):
+		population = populationMatrix.initialization(200, boardsize)
+		genes = population.genes.copy()
+		assert len(population.mutate(0.0)) == 0 and (population.genes == genes).all()
+		rows = population.mutate(1.0)
+		assert len(rows) == 200 and ((population.genes != genes).sum(axis=1) > 0).all()
+		population.mutate(1.0, mutation_rate=1)
+		assert ((population.genes != genes).sum(axis=1) >= boardsize - ((population.genes == genes).sum(axis=1))).all()
+		rows = population.mutate(0.5)
+		assert 50 < len(rows) < 150
+
+	#children inherit the connectivity of the parent they differ from least, and take and add keep it
+	def test_connectivity(self):
+		population = ones_and_zeroes(1)
+		population.connectivities = ['ones', 'zeroes']
+		children = population.recombine(np.zeros(200, dtype=int), np.ones(200, dtype=int), '1-point crossover')
+		for child in children:
+			assert child.connectivity == ('ones' if child.gene.sum() >= boardsize / 2 else 'zeroes')
+		assert (children.take([3]) + children[:1]).connectivities == [children[3].connectivity, children[0].connectivity]
+		assert population[0].mutate().connectivity == 'ones'
+
+	def test_take_and_add(self):
+		population = populationMatrix.initialization(6, boardsize)
+		population.fitnesses[:] = np.arange(6)
+		taken = population.take([5, 1, 1])
+		assert [individual.fitness for individual in taken] == [5, 1, 1]
+		combined = taken + population[:2]
+		assert [individual.fitness for individual in combined] == [5, 1, 1, 0, 1]
+		assert (combined.genes[3] == population.genes[0]).all()
+
+class TestMatrixEvolution:
+	#the vectorized EA runs through the notebook's generation loop
+	def test_generations(self):
+		fitness_kwargs = {'height': 6, 'width': 7, 'samples': 1, 'pill_spawn': 'linear', 'pill_density': 0.2, 'return_log': False}
+		ea = evo.matrixEvolutionPopulation(None, 8, 6, 0.5, random_parents, best_survivors, initialization_kwargs={'length': 42}, recombination_kwargs={'method': 'uniform'})
+		fitness.evaluate_population(ea.population, fitness_kwargs)
+		ea.evaluations = len(ea.population)
+		best = max(individual.fitness for individual in ea.population)
+		for _ in range(4):
+			evo.evolve_generation(ea, fitness_kwargs)
+			assert isinstance(ea.population, populationMatrix) and len(ea.population) == 8
+			assert not np.isnan(ea.population.fitnesses).any()
+		assert ea.evaluations == 8 + 4 * 6
+		assert max(individual.fitness for individual in ea.population) >= best
+
+	#with incremental repair every row keeps the labeled map it was evaluated with
+	def test_incremental_repair(self):
+		fitness_kwargs = {'height': 6, 'width': 7, 'samples': 1, 'pill_spawn': 'linear', 'pill_density': 0.2, 'return_log': False}
+		ea = evo.matrixEvolutionPopulation(None, 8, 6, 0.5, random_parents, best_survivors, initialization_kwargs={'length': 42}, recombination_kwargs={'method': 'uniform'}, incremental_repair=True)
+		fitness.evaluate_population(ea.population, fitness_kwargs, incremental=True)
+		ea.evaluations = len(ea.population)
+		for _ in range(3):
+			evo.evolve_generation(ea, fitness_kwargs)
+		for individual in ea.population:
+			grid = fitness.translate_gene_array(individual.gene, 6, 7)
+			assert (individual.connectivity.grid == fitness.MapConnectivity.from_grid(grid).grid).all()
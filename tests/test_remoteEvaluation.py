@@ -0,0 +1,114 @@
+import random, pytest, os, sys, inspect, socket, threading, multiprocessing
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+import fitness
+from fitness import evaluate_population
+from remoteEvaluation import EvaluationServer, run_worker, send_message, receive_message
+
+height = 20
+width = 35
+fitness_kwargs = {'height': height, 'width': width, 'samples': 2, 'pill_spawn': 'linear', 'pill_density': 0.05, 'seed': 3}
+
+class Individual():
+	def __init__(self, gene):
+		self.gene = gene
+		self.fitness = None
+
+def random_population(n, density=0.3):
+	return [Individual([1 if random.random() < density else 0 for _ in range(height*width)]) for _ in range(n)]
+
+def start_workers(server, n, **kwargs):
+	workers = [multiprocessing.Process(target=run_worker, args=(server.host, server.port), kwargs=kwargs, daemon=True) for _ in range(n)]
+	for worker in workers:
+		worker.start()
+	return workers
+
+def stop_workers(server, workers):
+	server.close()
+	for worker in workers:
+		worker.join(10)
+		assert worker.exitcode == 0
+
+class TestEvaluationServer:
+	#remote evaluation assigns the same fitnesses and logs as serial evaluation
+	def test_matches_serial(self):
+		population = random_population(9)
+		serial = evaluate_population(population, fitness_kwargs)
+		logs = [individual.log for individual in population]
+		server = EvaluationServer(batch_size=2)
+		workers = start_workers(server, 3)
+		try:
+			assert evaluate_population(population, fitness_kwargs, server=server) == serial
+			assert [individual.log for individual in population] == logs
+			# the server stays usable for later generations
+			assert evaluate_population(population[:4], fitness_kwargs, server=server) == serial[:4]
+		finally:
+			stop_workers(server, workers)
+
+	#a worker that disconnects mid-batch has its batch resubmitted to the others
+	def test_resubmission(self):
+		population = random_population(6)
+		serial = evaluate_population(population, fitness_kwargs)
+		server = EvaluationServer(batch_size=3)
+		def deserter():
+			with socket.create_connection((server.host, server.port)) as connection:
+				receive_message(connection)
+		deserting = threading.Thread(target=deserter, daemon=True)
+		deserting.start()
+		result = list()
+		thread = threading.Thread(target=lambda: result.append(evaluate_population(population, fitness_kwargs, server=server)))
+		thread.start()
+		# the deserter must be gone before forking, or the worker would inherit its socket
+		deserting.join(10)
+		assert not deserting.is_alive()
+		workers = start_workers(server, 1)
+		try:
+			thread.join(60)
+			assert result == [serial]
+			assert server.resubmitted == 3
+		finally:
+			stop_workers(server, workers)
+
+	#an exception raised by the evaluation is re-raised by the server instead of killing every worker in turn
+	def test_evaluation_error(self):
+		population = random_population(4)
+		serial = evaluate_population(population, fitness_kwargs)
+		server = EvaluationServer(batch_size=2)
+		workers = start_workers(server, 2)
+		try:
+			with pytest.raises(AssertionError, match='EXPECTED GENOTYPE OF LENGTH'):
+				server.map(fitness_kwargs, [[0]*10]*6)
+			assert all(worker.is_alive() for worker in workers)
+			assert evaluate_population(population, fitness_kwargs, server=server) == serial
+		finally:
+			stop_workers(server, workers)
+
+	#a worker started before the server keeps retrying until it can connect
+	def test_worker_reconnects(self):
+		with socket.create_server(('localhost', 0)) as probe:
+			port = probe.getsockname()[1]
+		worker = multiprocessing.Process(target=run_worker, args=('localhost', port), kwargs={'retry_delay': 0.1}, daemon=True)
+		worker.start()
+		server = EvaluationServer(port=port)
+		population = random_population(2)
+		serial = evaluate_population(population, fitness_kwargs)
+		try:
+			assert evaluate_population(population, fitness_kwargs, server=server) == serial
+		finally:
+			stop_workers(server, [worker])
+
+	def test_worker_gives_up(self):
+		with socket.create_server(('localhost', 0)) as probe:
+			port = probe.getsockname()[1]
+		with pytest.raises(OSError):
+			run_worker('localhost', port, retry_delay=0, retries=2)
+
+	def test_messages_round_trip(self):
+		left, right = socket.socketpair()
+		with left, right:
+			send_message(left, ('evaluate', fitness_kwargs, [(0, [1, 0])]))
+			assert receive_message(right) == ('evaluate', fitness_kwargs, [(0, [1, 0])])
+			left.close()
+			with pytest.raises(EOFError):
+				receive_message(right)
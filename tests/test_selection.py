@@ -4,6 +4,8 @@ currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentfram
 parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir)
 import selection as sel
+import numpy as np
+from populationMatrix import populationMatrix
 
 boardsize = 100
 popsize = 100
@@ -415,4 +417,53 @@ class TestTruncation:
 			outsize = random.randint(1, popsize)
 			selection = sel.truncation(pop, outsize)
 			for i in range(popsize):
-				assert same_object(pop[i], copies[i])
\ No newline at end of file
+				assert same_object(pop[i], copies[i])
+
+class TestIndexSelection:
+	#index counterparts handle populations far larger than the object tests use
+	def test_large_population(self):
+		fitnesses = np.random.default_rng(1).normal(size=100000)
+		order = np.argsort(fitnesses)
+		assert (np.sort(sel.truncation_indices(fitnesses, 1000)) == np.sort(order[-1000:])).all()
+		winners = sel.k_tournament_without_replacement_indices(fitnesses, 50000, 3)
+		assert len(np.unique(winners)) == 50000
+		assert not np.isin(order[:2], winners).any()
+		winners = sel.k_tournament_with_replacement_indices(fitnesses, 100000, 3)
+		assert not np.isin(order[:2], winners).any()
+		for method in [sel.uniform_random_selection_indices, sel.fitness_proportionate_selection_indices, sel.stochastic_universal_sampling_indices]:
+			indices = method(fitnesses, 100000)
+			assert len(indices) == 100000 and indices.min() >= 0 and indices.max() < 100000
+
+	#stochastic universal sampling selects everyone within one of their expected count
+	def test_sus_spread(self):
+		for _ in range(iterations):
+			fitnesses = np.random.default_rng().uniform(-1000, 1000, popsize)
+			n = random.randint(1, popsize * 3)
+			weights = fitnesses - 1.5 * fitnesses.min()
+			expected = weights / weights.sum() * n
+			counts = np.bincount(sel.stochastic_universal_sampling_indices(fitnesses, n), minlength=popsize)
+			assert (np.abs(counts - expected) < 1 + 1e-9).all()
+
+	#proportional selection can pick the worst individual, so two individuals are not selected deterministically
+	def test_worst_selectable(self):
+		for fitnesses in [np.array([-10.0, -5.0]), np.array([0.0, 3.0]), np.array([2.0, 4.0])]:
+			for method in [sel.fitness_proportionate_selection_indices, sel.stochastic_universal_sampling_indices]:
+				assert 0 < np.count_nonzero(method(fitnesses, 1000) == 0) < 1000
+
+	#positive fitnesses are selected in proportion to the fitnesses themselves
+	def test_positive_proportions(self):
+		fitnesses = np.array([10.0, 20.0, 30.0])
+		weights, total = sel.proportional_weights(fitnesses)
+		assert (weights / total == fitnesses / fitnesses.sum()).all()
+		counts = np.bincount(sel.stochastic_universal_sampling_indices(fitnesses, 600), minlength=3)
+		assert (np.abs(counts - [100, 200, 300]) <= 1).all()
+		counts = np.bincount(sel.fitness_proportionate_selection_indices(fitnesses, 60000), minlength=3)
+		assert (np.abs(counts / 60000 - [1/6, 1/3, 1/2]) < 0.01).all()
+
+	#selection functions accept matrix populations and return views of their rows
+	def test_population_matrix(self):
+		population = populationMatrix.initialization(popsize, boardsize)
+		population.fitnesses[:] = np.arange(popsize)
+		survivors = sel.truncation(population, 10)
+		assert [individual.fitness for individual in survivors] == list(range(popsize - 1, popsize - 11, -1))
+		assert all(individual.population is population for individual in sel.k_tournament_with_replacement(population, 20, k=3))
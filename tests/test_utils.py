@@ -3,6 +3,7 @@ currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentfram
 parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir)
 from binaryGenotype import binaryGenotype
+from baseEvolution import baseEvolutionPopulation
 
 def random_pop(n, boardsize):
 	return binaryGenotype.initialization(n, length=boardsize)
@@ -51,4 +52,39 @@ def distance(genes1, genes2):
 	for i in range(len(genes1)):
 		if genes1[i] != genes2[i]:
 			diff += 1
-	return diff
\ No newline at end of file
+	return diff
+
+class bitString():
+	'''minimal individual used to exercise EA drivers and runners independently of binaryGenotype'''
+	def __init__(self, gene=None):
+		self.fitness = None
+		self.gene = gene
+
+	def recombine(self, mate, **kwargs):
+		return bitString([random.choice(pair) for pair in zip(self.gene, mate.gene)])
+
+	def mutate(self, **kwargs):
+		gene = self.gene.copy()
+		gene[random.randrange(len(gene))] ^= 1
+		return bitString(gene)
+
+	@classmethod
+	def initialization(cls, mu, length):
+		return [cls([random.randint(0, 1) for _ in range(length)]) for _ in range(mu)]
+
+def random_parents(population, n, **kwargs):
+	return random.choices(population, k=n)
+
+def best_survivors(population, n, **kwargs):
+	return sorted(population, key=lambda individual: individual.fitness, reverse=True)[:n]
+
+class simpleEA(baseEvolutionPopulation):
+	def generate_children(self):
+		children = list()
+		parents = self.parent_selection(self.population, 2*self.num_children, **self.parent_selection_kwargs)
+		for mother, father in zip(parents[::2], parents[1::2]):
+			child = mother.recombine(father, **self.recombination_kwargs)
+			if random.random() < self.mutation_rate:
+				child = child.mutate(**self.mutation_kwargs)
+			children.append(child)
+		return children